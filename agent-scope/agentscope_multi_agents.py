@@ -5,15 +5,47 @@
 
 import asyncio
 import os
+import sys
 
 import agentscope
 from agentscope.agent import ReActAgent
 from agentscope.formatter import OpenAIChatFormatter
 from agentscope.memory import InMemoryMemory
-from agentscope.message import Msg
+from agentscope.message import Msg, TextBlock
 from agentscope.model import OpenAIChatModel
 from agentscope.tool import Toolkit, ToolResponse
 
+# 添加项目根目录到路径，以便导入共享模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import answer_cache, snapshot_versions
+from circuit_breaker import CLOSED, model_breaker
+from compressor_fleet import compressor_fleet
+from degraded_mode import answer_degraded
+from direct_return import direct_return_tool_names, returns_handoff_directly
+from dispatch_control import dispatch_control
+from inspection_log import inspection_log
+from llm_http import SDK_MAX_RETRIES, create_http_client
+from model_config import SPECIALIST_AGENTS, AgentModelConfig, describe_model_configs, load_model_configs
+from profiling import turn_profiler
+from prompt_layout import stable_tools
+from query_planner import query_planner
+from react_budget import (
+    STOP_DIRECT_RETURN,
+    STOP_MAX_ITERS,
+    STOP_TOKEN_BUDGET,
+    ReActTurnMetrics,
+    current_react_turn,
+    load_budget,
+    react_metrics,
+)
+from realtime_status import realtime_status
+from rul_estimator import rul_estimator
+from sensor_ingestion import sensor_ingestion
+from speculation import current_speculation, hold_side_effects, speculative_label, speculative_router
+from token_usage import usage_tracker
+from tool_budget import FETCH_TOOL, tool_budget
+
 # ==================== 颜色定义 ====================
 
 class Colors:
@@ -25,25 +57,27 @@ class Colors:
 
 # ==================== 模型定义 ====================
 
-BASE_URL = os.getenv("OPENAI_BASE_URL") or ""
-API_KEY = os.getenv("OPENAI_API_KEY") or ""
-MODEL_NAME = os.getenv("OPENAI_MODEL_NAME") or ""
-
-if not BASE_URL or not API_KEY or not MODEL_NAME:
-    raise ValueError(
-        "Please set OPENAI_BASE_URL, OPENAI_API_KEY, OPENAI_MODEL_NAME via env var or code."
-    )
+# 各智能体的模型配置（路由与专业智能体可分别指定，见 model_config.py）
+MODEL_CONFIGS = load_model_configs()
 
 # 初始化 agentscope
 agentscope.init(project="air_compressor_station")
 
-# 创建模型
-model = OpenAIChatModel(
-    model_name=MODEL_NAME,
-    api_key=API_KEY,
-    client_kwargs={"base_url": BASE_URL},
-    stream=False,
-)
+
+def create_model(agent_name: str, config: AgentModelConfig | None = None,
+                 label: str | None = None, shared_limiter: bool = True) -> OpenAIChatModel:
+    """按智能体的模型配置创建模型，HTTP 客户端以智能体名称（或指定 label）标记以便分别统计用量和耗时"""
+    config = config or MODEL_CONFIGS[agent_name]
+    return OpenAIChatModel(
+        model_name=config.model_name,
+        api_key=config.api_key,
+        client_kwargs={
+            "base_url": config.base_url,
+            "http_client": create_http_client(label or agent_name, shared_limiter),
+            "max_retries": SDK_MAX_RETRIES,
+        },
+        stream=False,
+    )
 
 # 创建格式化器
 formatter = OpenAIChatFormatter()
@@ -54,30 +88,97 @@ main_agent_memory = InMemoryMemory()
 
 # ==================== 工具定义 ====================
 
-def create_tool_response(content: str) -> ToolResponse:
-    """创建工具响应的辅助函数"""
-    return ToolResponse(content=[{"type": "text", "text": content}])
+BUDGET_EXHAUSTED_TEXT = "本轮推理已达到 token 预算上限，请缩小问题范围后重试"
+
+
+def create_tool_response(content: str, final_answer: bool = False) -> ToolResponse:
+    """创建工具响应的辅助函数
+
+    Args:
+        content: 工具输出文本
+        final_answer: 输出已完整回答问题时为 True，智能体将直接以其作为回复，不再调用模型
+    """
+    return ToolResponse(
+        content=[{"type": "text", "text": content}],
+        metadata={"final_answer": True} if final_answer else None,
+    )
+
+
+def mark_final_answer(tool_call, response: ToolResponse) -> None:
+    """工具后处理：记录声明已完整回答问题的工具调用，供当前 ReAct 回复提前结束"""
+    metrics = current_react_turn.get()
+    if metrics is not None and response.metadata and response.metadata.get("final_answer"):
+        metrics.final_tool_calls.add(tool_call["id"])
+
+
+def budget_tool_response(tool_call, response: ToolResponse) -> ToolResponse:
+    """工具后处理：文本输出按工具预算压缩后再交给模型，并记录声明已完整回答问题的工具调用"""
+    mark_final_answer(tool_call, response)
+    text = "\n".join(block["text"] for block in response.content if block.get("type") == "text")
+    compacted = tool_budget.apply(tool_call["name"], text)
+    if compacted is not text:
+        response.content = [TextBlock(type="text", text=compacted)] + [
+            block for block in response.content if block.get("type") != "text"
+        ]
+    return response
+
+
+def fetch_tool_output(ref: str, page: int = 1) -> ToolResponse:
+    """按引用分页获取被压缩的工具完整输出，ref 为压缩说明中给出的引用，page 从 1 开始"""
+    return create_tool_response(tool_budget.fetch(ref, page))
+
+
+class SpecialistToolkit(Toolkit):
+    """专业智能体的工具集
+
+    旁路存储中没有可取回的输出时不向模型提供 fetch_tool_output（每次推理前重新获取工具定义）；
+    投机运行中有副作用的工具等待投机结果被采用后再执行
+    """
+
+    def get_json_schemas(self) -> list[dict]:
+        schemas = super().get_json_schemas()
+        if tool_budget.has_outputs:
+            return schemas
+        return [schema for schema in schemas if schema["function"]["name"] != FETCH_TOOL]
+
+    async def call_tool_function(self, tool_call):
+        await hold_side_effects(tool_call["name"])
+        return await super().call_tool_function(tool_call)
+
+
+def create_toolkit(*tools, budgeted: bool = True) -> Toolkit:
+    """按固定顺序注册工具，保证每轮请求的工具定义逐字节一致
+
+    budgeted 为 True 时（专业智能体）工具输出按预算压缩，开启预算时附带按需提供的 fetch_tool_output
+    """
+    toolkit = SpecialistToolkit() if budgeted else Toolkit()
+    if budgeted and tool_budget.enabled:
+        tools = (*tools, fetch_tool_output)
+    postprocess = budget_tool_response if budgeted else mark_final_answer
+    for tool in stable_tools(tools):
+        toolkit.register_tool_function(tool, postprocess_func=postprocess)
+    return toolkit
 
 
 # 空压站智能调度智能体工具
 def start_compressor(compressor_id: str) -> ToolResponse:
     """启动指定编号的空压机"""
-    return create_tool_response(f"空压机 {compressor_id} 已启动")
+    return create_tool_response(compressor_fleet.start(compressor_id).text)
 
 
 def stop_compressor(compressor_id: str) -> ToolResponse:
     """停止指定编号的空压机"""
-    return create_tool_response(f"空压机 {compressor_id} 已停止")
+    return create_tool_response(compressor_fleet.stop(compressor_id).text)
 
 
 def adjust_load(compressor_id: str, load_percentage: int) -> ToolResponse:
     """调整空压机负荷百分比（0-100）"""
-    return create_tool_response(f"空压机 {compressor_id} 负荷已调整至 {load_percentage}%")
+    return create_tool_response(compressor_fleet.adjust_load(compressor_id, load_percentage).text)
 
 
 def get_air_demand() -> ToolResponse:
     """获取当前用气需求"""
-    return create_tool_response("当前用气需求：1200 m³/min，压力要求：0.7 MPa")
+    return create_tool_response(compressor_fleet.describe_demand(), final_answer=True)
 
 
 # 空压机设备维修助手工具
@@ -89,15 +190,9 @@ def diagnose_fault(equipment_id: str, symptom: str) -> ToolResponse:
 
 
 def get_repair_guide(fault_type: str) -> ToolResponse:
-    """获取维修指南"""
-    guides = {
-        "轴承磨损": "1. 停机断电 2. 拆卸轴承盖 3. 检查轴承状态 4. 更换轴承 5. 重新组装",
-        "温度过高": "1. 检查冷却器 2. 清理散热片 3. 检查润滑油位 4. 检查环境通风",
-        "振动异常": "1. 检查地脚螺栓 2. 检查转子平衡 3. 检查联轴器对中 4. 检查轴承间隙"
-    }
-    return create_tool_response(
-        guides.get(fault_type, f"未找到'{fault_type}'的维修指南，请联系技术支持")
-    )
+    """获取维修指南，fault_type 为故障类型或现象（如"排气温度高"），返回维修手册中最相关的几段"""
+    from repair_manuals import repair_manuals  # 依赖 numpy，首次调用时才导入
+    return create_tool_response(repair_manuals.describe_guide(fault_type))
 
 
 def order_spare_parts(part_name: str, quantity: int) -> ToolResponse:
@@ -108,60 +203,50 @@ def order_spare_parts(part_name: str, quantity: int) -> ToolResponse:
 # 空压站能耗分析智能体工具
 def analyze_energy_consumption(period: str) -> ToolResponse:
     """分析指定时段的能耗数据"""
-    return create_tool_response(
-        f"{period}能耗分析：总耗电量 15,680 kWh，平均负载率 78%，单位产气能耗 0.12 kWh/m³"
-    )
+    return create_tool_response(query_planner.describe_energy(period))
 
 
 def compare_energy_efficiency(compressor_ids: str) -> ToolResponse:
     """对比多台设备的能效"""
-    return create_tool_response(
-        f"设备 {compressor_ids} 能效对比：1号机 0.115 kWh/m³（最优），2号机 0.128 kWh/m³，3号机 0.132 kWh/m³"
-    )
+    return create_tool_response(query_planner.describe_efficiency(compressor_ids))
 
 
 def generate_energy_report() -> ToolResponse:
     """生成能耗分析报告"""
-    return create_tool_response(
-        "能耗分析报告：本月总能耗较上月降低5.2%，主要节能措施包括优化启停策略和负载分配"
-    )
+    return create_tool_response(query_planner.describe_energy_report())
 
 
 # 空压设备健康智能体工具
 def get_health_score(equipment_id: str) -> ToolResponse:
     """获取设备健康评分（0-100）"""
-    return create_tool_response(
-        f"设备 {equipment_id} 健康评分：85分，状态良好，建议关注轴承温度趋势"
-    )
+    from history_store import history_store  # 依赖 numpy，首次调用时才导入
+    return create_tool_response(history_store.describe_health(equipment_id), final_answer=True)
 
 
 def predict_maintenance(equipment_id: str) -> ToolResponse:
     """预测维护需求"""
-    return create_tool_response(
-        f"设备 {equipment_id} 预测性维护建议：预计15天后需要更换润滑油，30天后需要检查轴承"
-    )
+    return create_tool_response(rul_estimator.describe(equipment_id))
 
 
 def get_realtime_status(equipment_id: str) -> ToolResponse:
     """获取设备实时运行状态"""
-    return create_tool_response(
-        f"设备 {equipment_id} 实时状态：运行中，排气温度 95°C，排气压力 0.72 MPa，振动 2.3 mm/s，电流 85A"
-    )
+    return create_tool_response(realtime_status.describe(equipment_id), final_answer=True)
 
 
 # 空压站运营报告智能体工具
-def generate_daily_report() -> ToolResponse:
-    """生成日报"""
-    return create_tool_response(
-        "日报摘要：今日产气量 1,234,567 m³，设备平均负载率 82%，能耗成本 ¥45,678，无重大故障"
-    )
+def generate_daily_report(period: str = "") -> ToolResponse:
+    """生成日报，period 为报告时段（如"昨天"、"3月"），默认今天"""
+    return create_tool_response(query_planner.describe_report("daily", period))
 
 
-def generate_monthly_report() -> ToolResponse:
-    """生成月报"""
-    return create_tool_response(
-        "月报摘要：本月总产气量 36,789 m³，总能耗 523,456 kWh，设备可用率 98.5%，节能建议：优化2号机启停策略"
-    )
+def generate_monthly_report(period: str = "") -> ToolResponse:
+    """生成月报，period 为报告时段（如"昨天"、"3月"），默认本月"""
+    return create_tool_response(query_planner.describe_report("monthly", period))
+
+
+def get_abnormal_inspections(days: int = 7) -> ToolResponse:
+    """获取近若干天的异常巡检发现"""
+    return create_tool_response(inspection_log.describe_abnormal(days))
 
 
 def get_optimization_suggestions() -> ToolResponse:
@@ -174,33 +259,138 @@ def get_optimization_suggestions() -> ToolResponse:
 # 空压站设备巡检智能体工具
 def perform_visual_inspection(equipment_id: str) -> ToolResponse:
     """执行视觉巡检"""
-    return create_tool_response(
-        f"设备 {equipment_id} 视觉巡检结果：外观正常，无明显泄漏，仪表读数正常，发现轻微油渍需要清理"
-    )
+    from visual_inspection import visual_inspection  # 依赖 numpy，首次调用时才导入
+    return create_tool_response(visual_inspection.describe(equipment_id))
 
 
 def detect_anomaly(equipment_id: str) -> ToolResponse:
     """检测设备异常"""
-    return create_tool_response(
-        f"设备 {equipment_id} 异常检测：检测到轻微振动异常，建议重点关注，可能需要动平衡调整"
-    )
+    from anomaly_detector import anomaly_detector  # 依赖 numpy，首次调用时才导入
+    return create_tool_response(anomaly_detector.describe(equipment_id))
 
 
 def record_inspection_result(equipment_id: str, result: str) -> ToolResponse:
     """记录巡检结果"""
-    return create_tool_response(f"已记录设备 {equipment_id} 的巡检结果：{result}")
+    return create_tool_response(inspection_log.record(equipment_id, result))
+
+
+def query_inspection_records(equipment_id: str, limit: int = 10) -> ToolResponse:
+    """查询设备最近的巡检记录"""
+    return create_tool_response(inspection_log.describe_latest(equipment_id, limit))
 
 
 # ==================== 智能体定义 ====================
 
+class BudgetedReActAgent(ReActAgent):
+    """带预算、提前结束与循环指标的 ReActAgent
+
+    - 迭代次数与 token 预算按智能体配置（见 react_budget.py）
+    - 提前结束：本轮工具结果全部来自直接返回工具，或工具声明已完整回答问题时，以工具输出作为回复，不再调用模型
+    - token 预算用尽时不再调用模型，以已有的工具输出（或预算提示）作为回复
+    - 每轮回复的迭代次数、模型调用、工具调用与 token 用量记录在 last_turn 与全局 react_metrics 中
+
+    Args:
+        direct_return_tools: 直接返回的工具名，默认按 direct_return.py 的配置从 toolkit 中选取
+        usage_label: 模型请求的用量统计标签，用于计算 token 用量，默认为智能体名称
+    """
+
+    def __init__(self, *args, direct_return_tools=None, usage_label: str | None = None, **kwargs):
+        budget = load_budget(kwargs["name"])
+        kwargs.setdefault("max_iters", budget.max_iters)
+        super().__init__(*args, **kwargs)
+        self.budget = budget
+        if direct_return_tools is None:
+            direct_return_tools = direct_return_tool_names(self.toolkit.tools.values())
+        self.direct_return_tools = frozenset(direct_return_tools)
+        self.usage_label = usage_label or self.name
+        self.last_turn = None
+
+    async def reply(self, msg: Msg | list[Msg] | None = None, structured_model=None) -> Msg:
+        metrics = ReActTurnMetrics(self.name, self.budget)
+        token = current_react_turn.set(metrics)
+        try:
+            return await super().reply(msg, structured_model)
+        finally:
+            current_react_turn.reset(token)
+            self.last_turn = metrics
+            react_metrics.record(metrics)
+
+    async def _trailing_tool_results(self) -> list:
+        """记忆末尾（最近一次推理之后）的工具结果块"""
+        results = []
+        for msg in reversed(await self.memory.get_memory()):
+            if msg.role != "system" or not msg.has_content_blocks("tool_result"):
+                break
+            results.extend(msg.get_content_blocks("tool_result"))
+        results.reverse()
+        return results
+
+    @staticmethod
+    def _tool_output_text(results: list) -> str:
+        texts = []
+        for block in results:
+            output = block["output"]
+            if isinstance(output, str):
+                texts.append(output)
+            else:
+                texts.extend(item["text"] for item in output if item.get("type") == "text")
+        return "\n".join(texts)
+
+    def _answers_directly(self, block: dict, metrics: ReActTurnMetrics) -> bool:
+        return block["name"] in self.direct_return_tools or block["id"] in metrics.final_tool_calls
+
+    async def _local_reply(self, text: str, add_to_memory: bool = True) -> Msg:
+        """不调用模型生成回复；不含工具调用的回复消息会使 ReAct 循环直接结束"""
+        msg = Msg(self.name, [TextBlock(type="text", text=text)], "assistant")
+        await self.print(msg, True)
+        if add_to_memory:
+            await self.memory.add(msg)
+        return msg
+
+    async def _call_model(self, metrics: ReActTurnMetrics, call):
+        usage_before = usage_tracker.snapshot(self.usage_label)
+        msg = await call()
+        usage = usage_tracker.snapshot(self.usage_label).minus(usage_before)
+        metrics.model_calls += 1
+        metrics.input_tokens += usage.input_tokens
+        metrics.output_tokens += usage.output_tokens
+        return msg
+
+    async def _reasoning(self, tool_choice=None) -> Msg:
+        metrics = current_react_turn.get()
+        metrics.iterations += 1
+        results = await self._trailing_tool_results()
+        if results and all(self._answers_directly(block, metrics) for block in results):
+            metrics.stop_reason = STOP_DIRECT_RETURN
+            return await self._local_reply(self._tool_output_text(results))
+        if metrics.over_token_budget:
+            metrics.stop_reason = STOP_TOKEN_BUDGET
+            return await self._local_reply(self._tool_output_text(results) or BUDGET_EXHAUSTED_TEXT)
+
+        msg = await self._call_model(metrics, lambda: super(BudgetedReActAgent, self)._reasoning(tool_choice))
+        metrics.tool_calls += len(msg.get_content_blocks("tool_use"))
+        return msg
+
+    async def _summarizing(self) -> Msg:
+        # 迭代次数用尽：预算允许时由模型总结，否则直接返回已有的工具输出（由 reply 写入记忆）
+        metrics = current_react_turn.get()
+        if metrics.over_token_budget:
+            metrics.stop_reason = STOP_TOKEN_BUDGET
+            results = await self._trailing_tool_results()
+            return await self._local_reply(self._tool_output_text(results) or BUDGET_EXHAUSTED_TEXT, False)
+        metrics.stop_reason = STOP_MAX_ITERS
+        return await self._call_model(metrics, super()._summarizing)
+
+
 # 空压站智能调度智能体
-dispatch_toolkit = Toolkit()
-dispatch_toolkit.register_tool_function(start_compressor)
-dispatch_toolkit.register_tool_function(stop_compressor)
-dispatch_toolkit.register_tool_function(adjust_load)
-dispatch_toolkit.register_tool_function(get_air_demand)
+dispatch_toolkit = create_toolkit(
+    start_compressor,
+    stop_compressor,
+    adjust_load,
+    get_air_demand,
+)
 
-dispatch_agent = ReActAgent(
+dispatch_agent = BudgetedReActAgent(
     name="dispatch_agent",
     sys_prompt="""你是空压站智能调度智能体。你的职责是基于AI算法与工业机理模型，实现对空压机组的自主启停、负荷分配及运行优化。
 
@@ -212,20 +402,20 @@ dispatch_agent = ReActAgent(
 
 当用户询问关于设备调度、启停、负荷分配等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    model=model,
+    model=create_model("dispatch_agent"),
     formatter=formatter,
     toolkit=dispatch_toolkit,
     memory=sub_agent_memory,
-    max_iters=10,
 )
 
 # 空压机设备维修助手
-maintenance_toolkit = Toolkit()
-maintenance_toolkit.register_tool_function(diagnose_fault)
-maintenance_toolkit.register_tool_function(get_repair_guide)
-maintenance_toolkit.register_tool_function(order_spare_parts)
+maintenance_toolkit = create_toolkit(
+    diagnose_fault,
+    get_repair_guide,
+    order_spare_parts,
+)
 
-maintenance_agent = ReActAgent(
+maintenance_agent = BudgetedReActAgent(
     name="maintenance_agent",
     sys_prompt="""你是空压机设备维修助手。你的职责是对设备故障进行维修、排查。
 
@@ -236,20 +426,20 @@ maintenance_agent = ReActAgent(
 
 当用户询问关于设备故障、维修方法、备件等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    model=model,
+    model=create_model("maintenance_agent"),
     formatter=formatter,
     toolkit=maintenance_toolkit,
     memory=sub_agent_memory,
-    max_iters=10,
 )
 
 # 空压站能耗分析智能体
-energy_analysis_toolkit = Toolkit()
-energy_analysis_toolkit.register_tool_function(analyze_energy_consumption)
-energy_analysis_toolkit.register_tool_function(compare_energy_efficiency)
-energy_analysis_toolkit.register_tool_function(generate_energy_report)
+energy_analysis_toolkit = create_toolkit(
+    analyze_energy_consumption,
+    compare_energy_efficiency,
+    generate_energy_report,
+)
 
-energy_analysis_agent = ReActAgent(
+energy_analysis_agent = BudgetedReActAgent(
     name="energy_analysis_agent",
     sys_prompt="""你是空压站能耗分析智能体。你的职责是通过集成多源数据与智能算法，实现对空压站运行状态的实时监控与能耗精准分析。
 
@@ -261,20 +451,20 @@ energy_analysis_agent = ReActAgent(
 
 当用户询问关于能耗分析、能效对比、节能报告等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    model=model,
+    model=create_model("energy_analysis_agent"),
     formatter=formatter,
     toolkit=energy_analysis_toolkit,
     memory=sub_agent_memory,
-    max_iters=10,
 )
 
 # 空压设备健康智能体
-health_toolkit = Toolkit()
-health_toolkit.register_tool_function(get_health_score)
-health_toolkit.register_tool_function(predict_maintenance)
-health_toolkit.register_tool_function(get_realtime_status)
+health_toolkit = create_toolkit(
+    get_health_score,
+    predict_maintenance,
+    get_realtime_status,
+)
 
-health_agent = ReActAgent(
+health_agent = BudgetedReActAgent(
     name="health_agent",
     sys_prompt="""你是空压设备健康智能体。你的职责是融合物联网与AI技术，实时监测空压设备运行状态。
 
@@ -287,20 +477,21 @@ health_agent = ReActAgent(
 
 当用户询问关于设备健康状态、预测性维护、实时监测等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    model=model,
+    model=create_model("health_agent"),
     formatter=formatter,
     toolkit=health_toolkit,
     memory=sub_agent_memory,
-    max_iters=10,
 )
 
 # 空压站运营报告智能体
-report_toolkit = Toolkit()
-report_toolkit.register_tool_function(generate_daily_report)
-report_toolkit.register_tool_function(generate_monthly_report)
-report_toolkit.register_tool_function(get_optimization_suggestions)
+report_toolkit = create_toolkit(
+    generate_daily_report,
+    generate_monthly_report,
+    get_optimization_suggestions,
+    get_abnormal_inspections,
+)
 
-report_agent = ReActAgent(
+report_agent = BudgetedReActAgent(
     name="report_agent",
     sys_prompt="""你是空压站运营报告智能体。你的职责是融合多源数据与算法模型，自动分析空压站运行状态。
 
@@ -312,20 +503,21 @@ report_agent = ReActAgent(
 
 当用户询问关于运营报告、优化建议等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    model=model,
+    model=create_model("report_agent"),
     formatter=formatter,
     toolkit=report_toolkit,
     memory=sub_agent_memory,
-    max_iters=10,
 )
 
 # 空压站设备巡检智能体
-inspection_toolkit = Toolkit()
-inspection_toolkit.register_tool_function(perform_visual_inspection)
-inspection_toolkit.register_tool_function(detect_anomaly)
-inspection_toolkit.register_tool_function(record_inspection_result)
+inspection_toolkit = create_toolkit(
+    perform_visual_inspection,
+    detect_anomaly,
+    record_inspection_result,
+    query_inspection_records,
+)
 
-inspection_agent = ReActAgent(
+inspection_agent = BudgetedReActAgent(
     name="inspection_agent",
     sys_prompt="""你是空压站设备巡检智能体。你的职责是融合AI视觉识别与物联网技术，自动识别设备异常状态。
 
@@ -336,14 +528,68 @@ inspection_agent = ReActAgent(
 
 当用户询问关于设备巡检、异常检测等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    model=model,
+    model=create_model("inspection_agent"),
     formatter=formatter,
     toolkit=inspection_toolkit,
     memory=sub_agent_memory,
-    max_iters=10,
 )
 
 
+# ==================== 投机执行 ====================
+
+SUB_AGENTS = {
+    agent.name: agent
+    for agent in (dispatch_agent, maintenance_agent, energy_analysis_agent,
+                  health_agent, report_agent, inspection_agent)
+}
+
+_speculative_models = {}
+
+
+async def run_speculative(agent_name: str, question: str) -> tuple:
+    """以用户原始问题投机运行专业智能体
+
+    使用独立记忆（预载子智能体共享记忆）与单独标记的模型，未被采用时不污染共享记忆
+
+    Returns:
+        (回复消息, 本次运行新增的记忆消息)
+    """
+    source = SUB_AGENTS[agent_name]
+    model = _speculative_models.get(agent_name)
+    if model is None:
+        model = _speculative_models[agent_name] = create_model(agent_name, label=speculative_label(agent_name))
+    memory = InMemoryMemory()
+    history = await sub_agent_memory.get_memory()
+    await memory.add(history)
+    agent = BudgetedReActAgent(
+        name=agent_name,
+        sys_prompt=source.sys_prompt,
+        model=model,
+        formatter=formatter,
+        toolkit=source.toolkit,
+        memory=memory,
+        usage_label=speculative_label(agent_name),
+    )
+    agent.set_console_output_enabled(False)
+    res = await agent(Msg("user", question, "user"))
+    return res, (await memory.get_memory())[len(history):]
+
+
+async def call_sub_agent(agent: ReActAgent, task: str) -> ToolResponse:
+    """调用子智能体；本轮有投机任务时，与路由选择一致则直接采用投机结果，否则取消投机任务"""
+    speculation = current_speculation.get()
+    if speculation is not None and speculation.matches(agent.name):
+        res, messages = await speculation.adopt()
+        await sub_agent_memory.add(messages)
+    else:
+        if speculation is not None:
+            await speculation.discard()
+        res = await agent(Msg("user", task, "user"))
+    return ToolResponse(
+        content=res.get_content_blocks("text"),
+    )
+
+
 # ==================== 主调度智能体的转发工具 ====================
 
 async def handoff_to_dispatch_agent(task: str) -> ToolResponse:
@@ -352,10 +598,7 @@ async def handoff_to_dispatch_agent(task: str) -> ToolResponse:
     Args:
         task (str): 子智能体要完成的任务描述。
     """
-    res = await dispatch_agent(Msg("user", task, "user"))
-    return ToolResponse(
-        content=res.get_content_blocks("text"),
-    )
+    return await call_sub_agent(dispatch_agent, task)
 
 
 async def handoff_to_maintenance_agent(task: str) -> ToolResponse:
@@ -364,10 +607,7 @@ async def handoff_to_maintenance_agent(task: str) -> ToolResponse:
     Args:
         task (str): 子智能体要完成的任务描述。
     """
-    res = await maintenance_agent(Msg("user", task, "user"))
-    return ToolResponse(
-        content=res.get_content_blocks("text"),
-    )
+    return await call_sub_agent(maintenance_agent, task)
 
 
 async def handoff_to_energy_analysis_agent(task: str) -> ToolResponse:
@@ -376,10 +616,7 @@ async def handoff_to_energy_analysis_agent(task: str) -> ToolResponse:
     Args:
         task (str): 子智能体要完成的任务描述。
     """
-    res = await energy_analysis_agent(Msg("user", task, "user"))
-    return ToolResponse(
-        content=res.get_content_blocks("text"),
-    )
+    return await call_sub_agent(energy_analysis_agent, task)
 
 
 async def handoff_to_health_agent(task: str) -> ToolResponse:
@@ -388,10 +625,7 @@ async def handoff_to_health_agent(task: str) -> ToolResponse:
     Args:
         task (str): 子智能体要完成的任务描述。
     """
-    res = await health_agent(Msg("user", task, "user"))
-    return ToolResponse(
-        content=res.get_content_blocks("text"),
-    )
+    return await call_sub_agent(health_agent, task)
 
 
 async def handoff_to_report_agent(task: str) -> ToolResponse:
@@ -400,10 +634,7 @@ async def handoff_to_report_agent(task: str) -> ToolResponse:
     Args:
         task (str): 子智能体要完成的任务描述。
     """
-    res = await report_agent(Msg("user", task, "user"))
-    return ToolResponse(
-        content=res.get_content_blocks("text"),
-    )
+    return await call_sub_agent(report_agent, task)
 
 
 async def handoff_to_inspection_agent(task: str) -> ToolResponse:
@@ -412,24 +643,21 @@ async def handoff_to_inspection_agent(task: str) -> ToolResponse:
     Args:
         task (str): 子智能体要完成的任务描述。
     """
-    res = await inspection_agent(Msg("user", task, "user"))
-    return ToolResponse(
-        content=res.get_content_blocks("text"),
-    )
+    return await call_sub_agent(inspection_agent, task)
 
 
 # 主调度智能体（路由智能体）
-main_toolkit = Toolkit()
-main_toolkit.register_tool_function(handoff_to_dispatch_agent)
-main_toolkit.register_tool_function(handoff_to_maintenance_agent)
-main_toolkit.register_tool_function(handoff_to_energy_analysis_agent)
-main_toolkit.register_tool_function(handoff_to_health_agent)
-main_toolkit.register_tool_function(handoff_to_report_agent)
-main_toolkit.register_tool_function(handoff_to_inspection_agent)
-
-main_agent = ReActAgent(
-    name="main_agent",
-    sys_prompt="""你是空压站主调度智能体，负责理解用户需求并将任务分发给相应的专业智能体。
+main_toolkit = create_toolkit(
+    handoff_to_dispatch_agent,
+    handoff_to_maintenance_agent,
+    handoff_to_energy_analysis_agent,
+    handoff_to_health_agent,
+    handoff_to_report_agent,
+    handoff_to_inspection_agent,
+    budgeted=False,
+)
+
+MAIN_AGENT_SYS_PROMPT = """你是空压站主调度智能体，负责理解用户需求并将任务分发给相应的专业智能体。
 
 你有6个专业智能体可以协调：
 
@@ -441,13 +669,139 @@ main_agent = ReActAgent(
 6. 空压站设备巡检智能体 - 负责：视觉巡检、异常检测、巡检记录
 
 根据用户的问题内容，使用相应的转发工具将任务移交给最合适的专业智能体处理。
-如果问题涉及多个领域，可以协调多个智能体共同处理。""",
-    model=model,
-    formatter=formatter,
-    toolkit=main_toolkit,
-    memory=main_agent_memory,
-    max_iters=10,
-)
+如果问题涉及多个领域，可以协调多个智能体共同处理。"""
+
+
+def create_main_agent(config: AgentModelConfig | None = None,
+                      memory: InMemoryMemory | None = None) -> ReActAgent:
+    """创建主调度智能体，可指定路由模型配置（用于对比不同路由模型）"""
+    return BudgetedReActAgent(
+        name="main_agent",
+        sys_prompt=MAIN_AGENT_SYS_PROMPT,
+        model=create_model("main_agent", config),
+        formatter=formatter,
+        toolkit=main_toolkit,
+        memory=memory or main_agent_memory,
+        direct_return_tools=[f"handoff_to_{name}" for name in SPECIALIST_AGENTS if returns_handoff_directly(name)],
+    )
+
+
+main_agent = create_main_agent()
+
+
+# ==================== 降级模式 ====================
+
+def read_only_tool_text(func):
+    """包装只读工具供降级模式直接调用，返回工具输出文本"""
+    def run(**kwargs) -> str:
+        return "\n".join(block["text"] for block in func(**kwargs).content if block.get("type") == "text")
+    return run
+
+
+DEGRADED_TOOLS = {
+    func.__name__: read_only_tool_text(func)
+    for func in (get_health_score, get_realtime_status, generate_daily_report, generate_monthly_report)
+}
+
+
+async def record_local_turn(user_input: str, agent_name: str | None, content: str,
+                            router: ReActAgent = main_agent, user_recorded: bool = False) -> Msg:
+    """将本地生成的回复（降级模式、答案缓存命中）写入路由记忆与子智能体共享记忆，返回回复消息"""
+    user_msg = Msg(name="user", content=user_input, role="user")
+    reply = Msg(name=agent_name or router.name, content=content, role="assistant")
+    await router.memory.add([reply] if user_recorded else [user_msg, reply])
+    if agent_name is not None and agent_name != router.name:
+        await sub_agent_memory.add([user_msg, reply])
+    return reply
+
+
+async def run_degraded_turn(user_input: str, router: ReActAgent = main_agent,
+                            user_recorded: bool = False) -> Msg:
+    """熔断期间的一轮对话：本地关键词路由，只读工具按模板回复，不调用模型
+
+    Args:
+        user_recorded: 用户消息是否已由路由智能体写入记忆（模型调用中途失败时）
+    """
+    agent_name, content = await answer_degraded(user_input, DEGRADED_TOOLS)
+    return await record_local_turn(user_input, agent_name, content, router, user_recorded)
+
+
+# ==================== 答案缓存 ====================
+
+def called_tools(messages: list) -> list:
+    """消息中的工具调用名（含转发工具）"""
+    return [block["name"] for msg in messages for block in msg.get_content_blocks("tool_use")]
+
+
+async def store_answer(user_input: str, reply: Msg, router: ReActAgent, router_before: int, sub_before: int,
+                       versions: dict):
+    """按本轮新增的记忆消息确定回复的智能体与调用的工具，写入答案缓存"""
+    router_messages = (await router.memory.get_memory())[router_before:]
+    sub_messages = (await sub_agent_memory.get_memory())[sub_before:]
+    agent_name = next((msg.name for msg in reversed(sub_messages) if msg.name not in ("user", "system")),
+                      router.name)
+    answer_cache.store(user_input, agent_name, reply.get_text_content() or "",
+                       called_tools(router_messages + sub_messages), versions)
+
+
+async def run_turn(user_input: str, router: ReActAgent = main_agent, use_cache: bool = True) -> Msg:
+    """运行一轮对话；开启投机执行时预测的专业智能体与路由并行运行，由转发工具决定采用或取消
+
+    答案缓存命中时直接返回缓存回复（use_cache=False 时不查找也不写入，如路由准确率测试）；
+    模型服务熔断时改走降级模式，本轮模型调用失败且熔断器已断开时同样降级回复
+    """
+    hit = answer_cache.lookup(user_input) if use_cache else None
+    if hit is not None:
+        return await record_local_turn(user_input, hit.agent_name, hit.answer, router)
+    if not model_breaker.accepts_turns():
+        return await run_degraded_turn(user_input, router)
+    versions = snapshot_versions()
+    router_before = len(await router.memory.get_memory())
+    sub_before = len(await sub_agent_memory.get_memory())
+    speculation = speculative_router.start(
+        user_input, lambda agent_name: run_speculative(agent_name, user_input)
+    )
+    token = current_speculation.set(speculation)
+    try:
+        reply = await router(Msg(name="user", content=user_input, role="user"))
+    except Exception:
+        if model_breaker.state == CLOSED:
+            raise
+        return await run_degraded_turn(user_input, router, user_recorded=True)
+    finally:
+        current_speculation.reset(token)
+        if speculation is not None:
+            await speculation.discard()
+    if use_cache and answer_cache.enabled:
+        await store_answer(user_input, reply, router, router_before, sub_before, versions)
+    return reply
+
+
+# ==================== 调度控制回路 ====================
+
+_control_model = None
+
+
+async def escalate_to_dispatch_agent(prompt: str) -> str:
+    """调度控制回路的升级处理：在控制线程中运行调度智能体
+
+    使用独立记忆与单独标记的模型（首次升级时在控制线程中创建，不经过主事件循环的全局限流器），不写入子智能体共享记忆
+    """
+    global _control_model
+    if _control_model is None:
+        _control_model = create_model("dispatch_agent", label="dispatch_control", shared_limiter=False)
+    agent = BudgetedReActAgent(
+        name="dispatch_agent",
+        sys_prompt=dispatch_agent.sys_prompt,
+        model=_control_model,
+        formatter=formatter,
+        toolkit=dispatch_toolkit,
+        memory=InMemoryMemory(),
+        usage_label="dispatch_control",
+    )
+    agent.set_console_output_enabled(False)
+    res = await agent(Msg("user", prompt, "user"))
+    return res.get_text_content()
 
 
 # ==================== 主程序 ====================
@@ -470,8 +824,15 @@ async def main():
     print(f"{Colors.YELLOW}[AgentScope]{Colors.RESET}")
     print()
     print("模型信息：")
-    print(f"{BASE_URL=}, {MODEL_NAME=}")
+    for line in describe_model_configs(MODEL_CONFIGS):
+        print(line)
     print()
+    if sensor_ingestion.start():
+        print(f"数据接入：{', '.join(source.name for source in sensor_ingestion.sources)}")
+        print()
+    if dispatch_control.start(escalate_to_dispatch_agent):
+        print(f"调度控制回路：每 {dispatch_control.config.interval:g} 秒自动调度，异常时升级给调度智能体")
+        print()
     print("可用功能：")
     print("  1. 设备调度 - 启停空压机、调整负荷、用气需求")
     print("  2. 故障维修 - 故障诊断、维修指南、备件订购")
@@ -491,6 +852,12 @@ async def main():
             # 检查退出命令
             if user_input.lower() in ['quit', 'exit', '退出', 'q']:
                 print()
+                summary = react_metrics.summary()
+                if summary:
+                    print("ReAct 循环指标：")
+                    for line in summary:
+                        print(line)
+                    print()
                 print("感谢使用空压站多智能体系统，再见！")
                 break
 
@@ -501,8 +868,8 @@ async def main():
             print()
 
             # 调用主智能体
-            msg = Msg(name="user", content=user_input, role="user")
-            response = await main_agent(msg)
+            with turn_profiler.turn("agentscope") as profile:
+                response = await run_turn(user_input)
 
             # 提取智能体名称
             agent_name = await get_joined_agent_name()
@@ -518,6 +885,9 @@ async def main():
                   f"{Colors.YELLOW}[{agent_name}]{Colors.RESET}"
                   f"{Colors.BLUE}: {content}{Colors.RESET}", flush=True)
             print(flush=True)
+            if profile is not None:
+                print(profile.describe())
+                print()
 
         except KeyboardInterrupt:
             print()
@@ -531,4 +901,17 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    with turn_profiler.suite("agentscope-interactive"):
+        asyncio.run(main())
+    if dispatch_control.running:
+        dispatch_control.stop()
+        print(dispatch_control.describe())
+    if sensor_ingestion.running:
+        sensor_ingestion.stop()
+        print(sensor_ingestion.describe())
+    if answer_cache.enabled:
+        print(answer_cache.describe())
+    if tool_budget.stats.compacted:
+        print(tool_budget.stats.describe())
+    for line in turn_profiler.summary():
+        print(line)
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""
+空压站全站流式异常检测器
+对所有空压机的所有传感器通道做 EWMA/z-score 统计检测与多通道阈值规则判定
+每批样本以 NumPy 数组 (设备数, 通道数) 整体向量化处理，状态保存在紧凑数组中
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from equipment import normalize_equipment_id
+
+# ==================== 通道与规则定义 ====================
+
+@dataclass(frozen=True)
+class ChannelSpec:
+    """传感器通道定义，low/high 为硬阈值（None 表示不设限）"""
+    name: str
+    label: str
+    unit: str
+    low: float | None = None
+    high: float | None = None
+
+
+DEFAULT_CHANNELS = (
+    ChannelSpec("exhaust_temperature", "排气温度", "°C", None, 105.0),
+    ChannelSpec("exhaust_pressure", "排气压力", "MPa", 0.55, 0.85),
+    ChannelSpec("vibration", "振动", "mm/s", None, 4.5),
+    ChannelSpec("current", "电流", "A", None, 110.0),
+    ChannelSpec("oil_temperature", "油温", "°C", None, 95.0),
+    ChannelSpec("oil_pressure", "油压", "MPa", 0.2, None),
+    ChannelSpec("oil_quality", "润滑油品质", "%", 60.0, None),
+    ChannelSpec("inlet_temperature", "进气温度", "°C", None, 45.0),
+    ChannelSpec("inlet_filter_dp", "进气滤压差", "kPa", None, 5.0),
+    ChannelSpec("oil_filter_dp", "油滤压差", "kPa", None, 150.0),
+    ChannelSpec("separator_dp", "油分压差", "kPa", None, 100.0),
+    ChannelSpec("cooler_outlet_temperature", "冷却器出口温度", "°C", None, 50.0),
+    ChannelSpec("motor_winding_temperature", "电机绕组温度", "°C", None, 130.0),
+    ChannelSpec("motor_bearing_temperature", "电机轴承温度", "°C", None, 90.0),
+    ChannelSpec("airend_bearing_temperature", "主机轴承温度", "°C", None, 95.0),
+    ChannelSpec("power", "功率", "kW", None, 260.0),
+    ChannelSpec("flow", "排气量", "m³/min", 0.0, None),
+    ChannelSpec("speed", "转速", "rpm", None, 3200.0),
+    ChannelSpec("dew_point", "压力露点", "°C", None, 10.0),
+    ChannelSpec("load_ratio", "负载率", "%", 0.0, 100.0),
+)
+
+
+@dataclass(frozen=True)
+class MultiChannelRule:
+    """多通道联合规则：所有条件同时满足时判定异常，条件为 (通道名, ">" 或 "<", 阈值)"""
+    name: str
+    conditions: tuple
+
+
+DEFAULT_RULES = (
+    MultiChannelRule("高温低油压", (("exhaust_temperature", ">", 100.0), ("oil_pressure", "<", 0.25))),
+    MultiChannelRule("振动伴随轴承升温", (("vibration", ">", 3.5), ("airend_bearing_temperature", ">", 85.0))),
+    MultiChannelRule("滤芯堵塞", (("inlet_filter_dp", ">", 4.0), ("flow", "<", 15.0))),
+)
+
+EWMA_ALPHA = 0.02           # EWMA 均值/方差平滑系数
+Z_THRESHOLD = 4.0           # 单通道统计偏离阈值
+Z_WARN = 2.5                # 多通道联合偏离的单通道阈值
+Z_WARN_CHANNELS = 3         # 同一设备超过 Z_WARN 的通道数达到该值即判定联合偏离
+WARMUP_SAMPLES = 30         # 统计检测的预热样本数
+PERSISTENCE = 3             # 连续满足/解除该次数后才置位/清除异常（迟滞）
+MIN_STD = 1e-3              # 标准差下限，防止常值通道除零
+MAX_CACHED_BATCH_LAYOUTS = 64   # 缓存的设备序列 -> 行号映射数量上限
+
+# 单通道异常类型，与状态数组的第三维对应
+KIND_NAMES = ("统计偏离", "越限")
+
+
+@dataclass
+class Anomaly:
+    """当前处于激活状态的异常"""
+    equipment_id: str
+    kind: str
+    channel: str
+    value: float
+    z_score: float
+    since: float
+
+    def describe(self) -> str:
+        if self.kind == "联合规则":
+            return f"{self.channel}（联合规则）"
+        return f"{self.channel} {self.value:.2f} {self.kind}（z={self.z_score:+.1f}）"
+
+
+# ==================== 检测器 ====================
+
+class FleetAnomalyDetector:
+    """全站向量化流式异常检测器
+
+    状态数组形状均为 (设备容量, 通道数)：EWMA 均值/方差为 float32，样本计数、
+    迟滞计数为 int16/int32，激活标志为 bool。新设备出现时按倍数扩容
+    """
+
+    def __init__(self, channels=DEFAULT_CHANNELS, rules=DEFAULT_RULES, capacity: int = 128):
+        self.channels = tuple(channels)
+        self.rules = tuple(rules)
+        self._channel_index = {spec.name: i for i, spec in enumerate(self.channels)}
+        n_channels = len(self.channels)
+
+        self._low = np.array([-np.inf if s.low is None else s.low for s in self.channels], dtype=np.float32)
+        self._high = np.array([np.inf if s.high is None else s.high for s in self.channels], dtype=np.float32)
+        self._rule_channels = [
+            (np.array([self._channel_index[c] for c, _, _ in rule.conditions]),
+             np.array([op == ">" for _, op, _ in rule.conditions]),
+             np.array([v for _, _, v in rule.conditions], dtype=np.float32))
+            for rule in self.rules
+        ]
+
+        self._ids = []
+        self._rows = {}
+        self._batch_rows = {}
+        self._mean = np.zeros((capacity, n_channels), dtype=np.float32)
+        self._var = np.zeros((capacity, n_channels), dtype=np.float32)
+        self._count = np.zeros((capacity, n_channels), dtype=np.int32)
+        self._last = np.full((capacity, n_channels), np.nan, dtype=np.float32)
+        self._z = np.zeros((capacity, n_channels), dtype=np.float32)
+        # 单通道异常：(设备, 通道, 类型)；联合异常：(设备, 规则数 + 1)，最后一列为多通道 z 偏离
+        self._streak = np.zeros((capacity, n_channels, len(KIND_NAMES)), dtype=np.int16)
+        self._active = np.zeros((capacity, n_channels, len(KIND_NAMES)), dtype=bool)
+        self._since = np.zeros((capacity, n_channels, len(KIND_NAMES)), dtype=np.float64)
+        self._rule_streak = np.zeros((capacity, len(self.rules) + 1), dtype=np.int16)
+        self._rule_active = np.zeros((capacity, len(self.rules) + 1), dtype=bool)
+        self._rule_since = np.zeros((capacity, len(self.rules) + 1), dtype=np.float64)
+
+        self.batches = 0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    # -------------------- 设备行管理 --------------------
+
+    def _grow(self, needed: int):
+        capacity = self._mean.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name in ("_mean", "_var", "_count", "_last", "_z", "_streak", "_active", "_since",
+                     "_rule_streak", "_rule_active", "_rule_since"):
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            if name == "_last":
+                new.fill(np.nan)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def _rows_for(self, equipment_ids) -> np.ndarray:
+        """将设备编号序列映射为状态数组行号，相同的设备序列只计算一次"""
+        key = tuple(equipment_ids)
+        rows = self._batch_rows.get(key)
+        if rows is not None:
+            return rows
+        indices = []
+        for raw in key:
+            equipment_id = normalize_equipment_id(raw)
+            row = self._rows.get(equipment_id)
+            if row is None:
+                row = self._rows[equipment_id] = len(self._ids)
+                self._ids.append(equipment_id)
+            indices.append(row)
+        self._grow(len(self._ids))
+        rows = np.array(indices, dtype=np.intp)
+        if len(self._batch_rows) >= MAX_CACHED_BATCH_LAYOUTS:
+            self._batch_rows.clear()
+        self._batch_rows[key] = rows
+        return rows
+
+    # -------------------- 批量处理 --------------------
+
+    def process_batch(self, equipment_ids, values, timestamp: float | None = None):
+        """处理一批样本
+
+        Args:
+            equipment_ids: 设备编号序列，长度为 N
+            values: 形状 (N, 通道数) 的数组，缺失值用 NaN 表示
+            timestamp: 批次时间戳，默认当前时间
+        """
+        values = np.asarray(values, dtype=np.float32)
+        if values.ndim != 2 or values.shape[1] != len(self.channels):
+            raise ValueError(f"values 形状应为 (N, {len(self.channels)})，实际为 {values.shape}")
+        now = time.time() if timestamp is None else timestamp
+
+        with self._lock:
+            rows = self._rows_for(equipment_ids)
+            if len(rows) != values.shape[0]:
+                raise ValueError("equipment_ids 与 values 行数不一致")
+            self._process(rows, values, now)
+            self.batches += 1
+            self.samples += values.shape[0]
+
+    def _process(self, rows: np.ndarray, x: np.ndarray, now: float):
+        mean = self._mean[rows]
+        var = self._var[rows]
+        count = self._count[rows]
+        valid = np.isfinite(x)
+
+        # z-score 基于更新前的统计量
+        std = np.maximum(np.sqrt(var), MIN_STD)
+        z = np.where(valid, (x - mean) / std, 0.0).astype(np.float32)
+        warm = count >= WARMUP_SAMPLES
+        z_hit = warm & (np.abs(z) > Z_THRESHOLD)
+        limit_hit = valid & ((x < self._low) | (x > self._high))
+
+        # 统计量只吸收正常样本，避免异常值污染基线；预热期全部吸收
+        absorb = valid & ~z_hit
+        first = absorb & (count == 0)
+        delta = np.where(absorb, x - mean, 0.0)
+        new_mean = mean + EWMA_ALPHA * delta
+        new_var = np.where(absorb, (1.0 - EWMA_ALPHA) * (var + EWMA_ALPHA * delta * delta), var)
+        new_mean = np.where(first, x, new_mean)
+        new_var = np.where(first, 0.0, new_var)
+
+        self._mean[rows] = new_mean
+        self._var[rows] = new_var
+        self._count[rows] = count + absorb
+        self._last[rows] = np.where(valid, x, self._last[rows])
+        self._z[rows] = z
+
+        # 单通道异常迟滞
+        hits = np.stack([z_hit, limit_hit], axis=-1)
+        self._apply_persistence(self._streak, self._active, self._since, rows, hits, now)
+
+        # 多通道联合规则
+        rule_hits = np.empty((len(rows), len(self.rules) + 1), dtype=bool)
+        for i, (channel_idx, greater, thresholds) in enumerate(self._rule_channels):
+            cols = x[:, channel_idx]
+            cond = np.where(greater, cols > thresholds, cols < thresholds)
+            rule_hits[:, i] = cond.all(axis=1)
+        rule_hits[:, -1] = (warm & (np.abs(z) > Z_WARN)).sum(axis=1) >= Z_WARN_CHANNELS
+        self._apply_persistence(self._rule_streak, self._rule_active, self._rule_since, rows, rule_hits, now)
+
+    @staticmethod
+    def _apply_persistence(streak, active, since, rows, hits, now):
+        """连续命中累加正计数、连续未命中累加负计数，达到 PERSISTENCE 时切换激活状态"""
+        s = streak[rows]
+        s = np.where(hits, np.maximum(s, 0) + 1, np.minimum(s, 0) - 1)
+        np.clip(s, -PERSISTENCE, PERSISTENCE, out=s)
+        a = active[rows]
+        rising = ~a & (s >= PERSISTENCE)
+        falling = a & (s <= -PERSISTENCE)
+        since[rows] = np.where(rising, now, since[rows])
+        streak[rows] = s
+        active[rows] = (a | rising) & ~falling
+
+    # -------------------- 查询 --------------------
+
+    def current_anomalies(self, equipment_id: str | None = None) -> list:
+        """当前激活的异常集合，可按设备过滤"""
+        with self._lock:
+            n = len(self._ids)
+            if equipment_id is None:
+                row_filter = None
+            else:
+                row = self._rows.get(normalize_equipment_id(equipment_id))
+                if row is None:
+                    return []
+                row_filter = row
+
+            anomalies = []
+            for row, channel, kind in zip(*np.nonzero(self._active[:n])):
+                if row_filter is not None and row != row_filter:
+                    continue
+                spec = self.channels[channel]
+                anomalies.append(Anomaly(
+                    self._ids[row], KIND_NAMES[kind], spec.label,
+                    float(self._last[row, channel]), float(self._z[row, channel]),
+                    float(self._since[row, channel, kind]),
+                ))
+            for row, rule in zip(*np.nonzero(self._rule_active[:n])):
+                if row_filter is not None and row != row_filter:
+                    continue
+                name = self.rules[rule].name if rule < len(self.rules) else "多通道统计偏离"
+                anomalies.append(Anomaly(
+                    self._ids[row], "联合规则", name, float("nan"), float("nan"),
+                    float(self._rule_since[row, rule]),
+                ))
+            return anomalies
+
+    def has_equipment(self, equipment_id: str) -> bool:
+        with self._lock:
+            return normalize_equipment_id(equipment_id) in self._rows
+
+    def describe(self, equipment_id: str) -> str:
+        """detect_anomaly 工具的返回文本"""
+        if not self.has_equipment(equipment_id):
+            return f"设备 {equipment_id} 暂无传感器数据，无法进行异常检测，请确认设备编号或数据接入状态"
+        anomalies = self.current_anomalies(equipment_id)
+        if not anomalies:
+            return f"设备 {equipment_id} 异常检测：{len(self.channels)} 个通道均未发现异常"
+        details = "；".join(a.describe() for a in anomalies)
+        return f"设备 {equipment_id} 异常检测：检测到 {len(anomalies)} 项异常：{details}，建议重点关注"
+
+
+# 全局检测器实例，供三种实现的工具共享
+anomaly_detector = FleetAnomalyDetector()
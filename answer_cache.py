@@ -0,0 +1,312 @@
+"""
+重复问题答案缓存
+操作员反复提问的问题（"温度过高怎么维修"、"生成节能分析报告"）命中缓存时直接返回上次的回复，
+跳过 路由 → 专业智能体 → 工具 → 总结 的完整链路，不调用模型
+
+1. 键：路由到的智能体 + 规范化问题（全半角、大小写、空白与标点、礼貌用语、中文数字统一）
+2. 相似匹配（可选）：问题的字符二元组向量余弦相似度达到阈值，且数字（设备编号、日期）完全一致、
+   本地关键词路由（keyword_router）有把握地预测到同一个智能体时命中
+3. 容量（LRU）与有效期（TTL）限制；跨过零点的条目作废（"今天"、"昨天"含义已变）
+4. 数据失效：写入时记下本轮调用的工具所读数据源的版本，查找时版本变化即作废
+5. 不缓存：调用了有副作用或读取瞬时数据的工具（启停、调负荷、订购、记录巡检、实时状态、视觉巡检、
+   异常检测、用气需求）的轮次，未调用工具的轮次（澄清、拒绝），依赖上文的追问，以及降级模式的回复
+
+默认关闭，设置 ANSWER_CACHE=1 开启；ANSWER_CACHE_SIZE（默认 256）、ANSWER_CACHE_TTL（秒，默认 600）、
+ANSWER_CACHE_SIMILARITY（相似度阈值，如 0.85，默认 0 只做规范化后的精确匹配）
+数据接入管道运行时能耗、报告、健康类回复随新数据作废，维修指南、故障诊断等静态知识类回复不受影响
+"""
+
+import math
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+from equipment import chinese_to_int
+from inspection_log import inspection_log
+from keyword_router import predict_agent
+from report_rollups import report_rollups
+from rul_estimator import rul_estimator
+
+# ==================== 配置 ====================
+
+ROUTE_CONFIDENCE = 0.6          # 相似匹配要求的本地关键词路由置信度
+
+
+@dataclass(frozen=True)
+class AnswerCacheConfig:
+    """答案缓存配置"""
+    enabled: bool = False
+    max_entries: int = 256
+    ttl_seconds: float = 600.0
+    similarity: float = 0.0         # 相似匹配阈值，0 表示只做精确匹配
+
+    @classmethod
+    def from_env(cls) -> "AnswerCacheConfig":
+        return cls(
+            enabled=os.getenv("ANSWER_CACHE") == "1",
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE") or cls.max_entries),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL") or cls.ttl_seconds),
+            similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY") or cls.similarity),
+        )
+
+
+# ==================== 数据源版本 ====================
+
+def _history_version() -> int:
+    # history_store 依赖 numpy，未导入时不可能有写入
+    module = sys.modules.get("history_store")
+    return module.history_store.rows_written if module is not None else 0
+
+
+# 数据源 -> 当前版本，数据写入时版本变化
+DATA_SOURCES = {
+    "rollups": lambda: report_rollups.version,
+    "history": _history_version,
+    "rul": lambda: rul_estimator.version,
+    "inspections": lambda: inspection_log.version,
+}
+
+# 可缓存的工具 -> 读取的数据源；不在表中的工具（有副作用或读取瞬时数据）所在轮次不缓存
+CACHEABLE_TOOLS = {
+    "diagnose_fault": (),
+    "get_repair_guide": (),
+    "get_optimization_suggestions": (),
+    "analyze_energy_consumption": ("rollups", "history"),
+    "compare_energy_efficiency": ("rollups", "history"),
+    "generate_energy_report": ("rollups", "history"),
+    "generate_daily_report": ("rollups", "history"),
+    "generate_monthly_report": ("rollups", "history"),
+    "get_health_score": ("history",),
+    "predict_maintenance": ("rul",),
+    "get_abnormal_inspections": ("inspections",),
+    "query_inspection_records": ("inspections",),
+    # 取回的被压缩输出可能来自任一数据源
+    "fetch_tool_output": tuple(DATA_SOURCES),
+}
+
+# 智能体间移交在各实现中同样以工具调用出现，不计入本轮调用的工具
+HANDOFF_PREFIXES = ("transfer_to_", "handoff_to_")
+
+
+def snapshot_versions() -> dict:
+    """全部数据源的当前版本，在一轮开始时记录"""
+    return {source: version() for source, version in DATA_SOURCES.items()}
+
+
+def data_versions(tool_names, versions: dict) -> dict | None:
+    """本轮调用的工具所读数据源在 versions 中的版本；含不可缓存的工具或未调用工具时返回 None"""
+    sources, called = set(), False
+    for name in tool_names:
+        if name.startswith(HANDOFF_PREFIXES):
+            continue
+        if name not in CACHEABLE_TOOLS:
+            return None
+        sources.update(CACHEABLE_TOOLS[name])
+        called = True
+    if not called:
+        # 未调用工具的回复（澄清追问"请提供设备编号"、拒绝执行启停）不是基于数据的答案，不缓存
+        return None
+    return {source: versions[source] for source in sorted(sources)}
+
+
+# ==================== 问题规范化 ====================
+
+_CHINESE_NUMBER = re.compile(r"[零一二两三四五六七八九十]+(?=[号台个天月日周年])")
+_LEADING_FILLERS = ("请问", "请你", "请帮我", "麻烦你", "麻烦", "帮我", "帮忙", "请")
+_TRAILING_FILLERS = ("一下", "谢谢", "吗", "呢", "吧", "啊", "呀")
+# 依赖上文的追问，回复随对话历史变化
+_CONTEXT_MARKERS = ("刚才", "上面", "上述", "前面", "继续", "那台", "这台", "那个", "它")
+
+
+def normalize_question(question: str) -> str:
+    """规范化问题文本：NFKC、小写、去除空白与标点、去掉首尾礼貌用语、中文数字转阿拉伯数字"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = "".join(char for char in text if unicodedata.category(char)[0] not in "PZSC")
+    text = _CHINESE_NUMBER.sub(lambda match: str(chinese_to_int(match.group())), text)
+    stripped = True
+    while stripped:
+        stripped = False
+        for filler in _LEADING_FILLERS:
+            if text.startswith(filler) and len(text) > len(filler):
+                text, stripped = text[len(filler):], True
+        for filler in _TRAILING_FILLERS:
+            if text.endswith(filler) and len(text) > len(filler):
+                text, stripped = text[:-len(filler)], True
+    return text
+
+
+def depends_on_context(question: str) -> bool:
+    return any(marker in question for marker in _CONTEXT_MARKERS)
+
+
+def _bigrams(text: str) -> Counter:
+    return Counter(text[index:index + 2] for index in range(len(text) - 1)) if len(text) > 1 else Counter(text)
+
+
+def _cosine(a: Counter, b: Counter, norm_a: float, norm_b: float) -> float:
+    if not norm_a or not norm_b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(count * b[gram] for gram, count in a.items() if gram in b) / (norm_a * norm_b)
+
+
+# ==================== 缓存条目 ====================
+
+@dataclass
+class CacheEntry:
+    agent_name: str
+    question: str                   # 规范化问题
+    answer: str
+    stored_at: float
+    day: str                        # 写入时的本地日期
+    versions: dict                  # 数据源 -> 写入时的版本
+    digits: tuple = ()
+    vector: Counter = field(default_factory=Counter)
+    norm: float = 0.0
+    hits: int = 0
+
+
+@dataclass(frozen=True)
+class CacheHit:
+    """命中结果：路由到的智能体与回复"""
+    agent_name: str
+    answer: str
+    similarity: float = 1.0
+
+
+# ==================== 答案缓存 ====================
+
+class AnswerCache:
+    """有界 LRU + TTL 的答案缓存，三种实现的 run_turn 共用"""
+
+    def __init__(self, config: AnswerCacheConfig):
+        self.config = config
+        self._entries = OrderedDict()       # (agent_name, 规范化问题) -> CacheEntry
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidated = 0                # 过期或数据变化而作废的条目
+        self.evicted = 0
+        self.stored = 0
+        self.skipped = 0                    # 不可缓存的轮次
+        self.lookup_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def _valid(self, entry: CacheEntry, now: float) -> bool:
+        return (now - entry.stored_at <= self.config.ttl_seconds
+                and entry.day == time.strftime("%Y-%m-%d", time.localtime(now))
+                and all(DATA_SOURCES[source]() == version for source, version in entry.versions.items()))
+
+    def _find(self, question: str, now: float) -> tuple:
+        """在锁内查找，返回 (CacheEntry 或 None, 相似度)；顺带清理作废的条目"""
+        for key in [key for key, entry in self._entries.items() if not self._valid(entry, now)]:
+            del self._entries[key]
+            self.invalidated += 1
+
+        predicted, confidence = predict_agent(question)
+        if (predicted, question) in self._entries:
+            return self._entries[(predicted, question)], 1.0
+        exact = [entry for (_, text), entry in self._entries.items() if text == question]
+        if exact:
+            # 同一问题曾被路由到多个智能体且与本地预测都不一致时不采用
+            return (exact[0], 1.0) if len(exact) == 1 else (None, 0.0)
+        if not self.config.similarity or predicted is None or confidence < ROUTE_CONFIDENCE:
+            return None, 0.0
+
+        vector = _bigrams(question)
+        norm = math.sqrt(sum(count * count for count in vector.values()))
+        digits = tuple(re.findall(r"\d+", question))
+        best, best_score = None, self.config.similarity
+        for (agent_name, _), entry in self._entries.items():
+            if agent_name != predicted or entry.digits != digits:
+                continue
+            score = _cosine(vector, entry.vector, norm, entry.norm)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best, best_score if best is not None else 0.0
+
+    def lookup(self, question: str, now: float | None = None) -> CacheHit | None:
+        """查找问题的缓存回复，未开启、未命中或问题依赖上文时返回 None"""
+        if not self.enabled or depends_on_context(question):
+            return None
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        normalized = normalize_question(question)
+        with self._lock:
+            self.lookups += 1
+            entry, similarity = self._find(normalized, now)
+            if entry is None:
+                self.misses += 1
+                self.lookup_seconds += time.perf_counter() - started
+                return None
+            self._entries.move_to_end((entry.agent_name, entry.question))
+            entry.hits += 1
+            self.hits += 1
+            self.similar_hits += similarity < 1.0
+            self.lookup_seconds += time.perf_counter() - started
+            return CacheHit(entry.agent_name, entry.answer, similarity)
+
+    def store(self, question: str, agent_name: str | None, answer: str, tool_names, versions: dict,
+              now: float | None = None) -> bool:
+        """写入一轮模型回复，返回是否已缓存
+
+        Args:
+            tool_names: 本轮调用的工具名（含移交），决定是否可缓存与依赖的数据源
+            versions: 本轮开始时的 snapshot_versions()，本轮期间数据有变化时条目在下次查找时作废
+        """
+        if not self.enabled or not agent_name or not answer or depends_on_context(question):
+            return False
+        versions = data_versions(tool_names, versions)
+        if versions is None:
+            with self._lock:
+                self.skipped += 1
+            return False
+        now = time.time() if now is None else now
+        normalized = normalize_question(question)
+        vector = _bigrams(normalized)
+        entry = CacheEntry(
+            agent_name, normalized, answer, now, time.strftime("%Y-%m-%d", time.localtime(now)), versions,
+            tuple(re.findall(r"\d+", normalized)), vector,
+            math.sqrt(sum(count * count for count in vector.values())),
+        )
+        with self._lock:
+            self._entries[(agent_name, normalized)] = entry
+            self._entries.move_to_end((agent_name, normalized))
+            self.stored += 1
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def describe(self) -> str:
+        average = self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0
+        return (f"答案缓存：查找 {self.lookups} 次，命中 {self.hits} 次（相似匹配 {self.similar_hits} 次），"
+                f"命中率 {self.hit_rate:.1%}，平均查找 {average:.2f}ms；"
+                f"条目 {len(self)}/{self.config.max_entries}，写入 {self.stored}，"
+                f"不可缓存 {self.skipped}，作废 {self.invalidated}，淘汰 {self.evicted}")
+
+
+# 全局答案缓存实例，供三种实现的 run_turn 共享
+answer_cache = AnswerCache(AnswerCacheConfig.from_env())
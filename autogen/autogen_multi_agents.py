@@ -6,14 +6,38 @@
 
 import asyncio
 import os
+import sys
 
 from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.base import Handoff
-from autogen_agentchat.conditions import TextMentionTermination
+from autogen_agentchat.base import Handoff, TaskResult
+from autogen_agentchat.conditions import FunctionCallTermination, TextMentionTermination
+from autogen_agentchat.messages import TextMessage
 from autogen_agentchat.teams import Swarm
+from autogen_core import CancellationToken
 from autogen_core.models import ModelFamily
+from autogen_core.tools import FunctionTool, StaticWorkbench
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 
+# 添加项目根目录到路径，以便导入共享模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import answer_cache, snapshot_versions
+from circuit_breaker import CLOSED, model_breaker
+from compressor_fleet import compressor_fleet
+from degraded_mode import answer_degraded
+from direct_return import DIRECT_RETURN_TOOLS
+from dispatch_control import dispatch_control
+from inspection_log import inspection_log
+from llm_http import SDK_MAX_RETRIES, create_http_client
+from model_config import AgentModelConfig, describe_model_configs, load_model_configs
+from profiling import turn_profiler
+from prompt_layout import AGENT_DIRECTORY, stable_tools
+from query_planner import query_planner
+from realtime_status import realtime_status
+from rul_estimator import rul_estimator
+from sensor_ingestion import sensor_ingestion
+from tool_budget import FETCH_TOOL, budgeted, tool_budget
+
 # ==================== 颜色定义 ====================
 
 class Colors:
@@ -25,50 +49,50 @@ class Colors:
 
 # ==================== 模型定义 ====================
 
-BASE_URL = os.getenv("OPENAI_BASE_URL") or ""
-API_KEY = os.getenv("OPENAI_API_KEY") or ""
-MODEL_NAME = os.getenv("OPENAI_MODEL_NAME") or ""
-
-if not BASE_URL or not API_KEY or not MODEL_NAME:
-    raise ValueError(
-        "Please set OPENAI_BASE_URL, OPENAI_API_KEY, OPENAI_MODEL_NAME via env var or code."
+# 各智能体的模型配置（路由与专业智能体可分别指定，见 model_config.py）
+MODEL_CONFIGS = load_model_configs()
+
+
+def create_model_client(agent_name: str, config: AgentModelConfig | None = None,
+                        label: str | None = None, shared_limiter: bool = True) -> OpenAIChatCompletionClient:
+    """按智能体的模型配置创建模型客户端，HTTP 客户端以智能体名称（或指定 label）标记以便分别统计用量和耗时"""
+    config = config or MODEL_CONFIGS[agent_name]
+    return OpenAIChatCompletionClient(
+        model=config.model_name,
+        api_key=config.api_key,
+        base_url=config.base_url,
+        http_client=create_http_client(label or agent_name, shared_limiter),
+        max_retries=SDK_MAX_RETRIES,
+        model_info={
+            "vision": False,
+            "function_calling": True,
+            "json_output": True,
+            "family": ModelFamily.ANY,
+            "structured_output": False,
+        }
     )
 
-# 创建模型客户端
-model_client = OpenAIChatCompletionClient(
-    model=MODEL_NAME,
-    api_key=API_KEY,
-    base_url=BASE_URL,
-    model_info={
-        "vision": False,
-        "function_calling": True,
-        "json_output": True,
-        "family": ModelFamily.ANY,
-        "structured_output": False,
-    }
-)
-
 # ==================== 工具定义 ====================
 
 # 空压站智能调度智能体工具
 def start_compressor(compressor_id: str) -> str:
     """启动指定编号的空压机"""
-    return f"空压机 {compressor_id} 已启动"
+    return compressor_fleet.start(compressor_id).text
 
 
 def stop_compressor(compressor_id: str) -> str:
     """停止指定编号的空压机"""
-    return f"空压机 {compressor_id} 已停止"
+    return compressor_fleet.stop(compressor_id).text
 
 
 def adjust_load(compressor_id: str, load_percentage: int) -> str:
     """调整空压机负荷百分比（0-100）"""
-    return f"空压机 {compressor_id} 负荷已调整至 {load_percentage}%"
+    return compressor_fleet.adjust_load(compressor_id, load_percentage).text
 
 
 def get_air_demand() -> str:
     """获取当前用气需求"""
-    return "当前用气需求：1200 m³/min，压力要求：0.7 MPa"
+    return compressor_fleet.describe_demand()
 
 
 # 空压机设备维修助手工具
@@ -78,13 +102,9 @@ def diagnose_fault(equipment_id: str, symptom: str) -> str:
 
 
 def get_repair_guide(fault_type: str) -> str:
-    """获取维修指南"""
-    guides = {
-        "轴承磨损": "1. 停机断电 2. 拆卸轴承盖 3. 检查轴承状态 4. 更换轴承 5. 重新组装",
-        "温度过高": "1. 检查冷却器 2. 清理散热片 3. 检查润滑油位 4. 检查环境通风",
-        "振动异常": "1. 检查地脚螺栓 2. 检查转子平衡 3. 检查联轴器对中 4. 检查轴承间隙"
-    }
-    return guides.get(fault_type, f"未找到'{fault_type}'的维修指南，请联系技术支持")
+    """获取维修指南，fault_type 为故障类型或现象（如"排气温度高"），返回维修手册中最相关的几段"""
+    from repair_manuals import repair_manuals  # 依赖 numpy，首次调用时才导入
+    return repair_manuals.describe_guide(fault_type)
 
 
 def order_spare_parts(part_name: str, quantity: int) -> str:
@@ -95,44 +115,50 @@ def order_spare_parts(part_name: str, quantity: int) -> str:
 # 空压站能耗分析智能体工具
 def analyze_energy_consumption(period: str) -> str:
     """分析指定时段的能耗数据"""
-    return f"{period}能耗分析：总耗电量 15,680 kWh，平均负载率 78%，单位产气能耗 0.12 kWh/m³"
+    return query_planner.describe_energy(period)
 
 
 def compare_energy_efficiency(compressor_ids: str) -> str:
     """对比多台设备的能效"""
-    return f"设备 {compressor_ids} 能效对比：1号机 0.115 kWh/m³（最优），2号机 0.128 kWh/m³，3号机 0.132 kWh/m³"
+    return query_planner.describe_efficiency(compressor_ids)
 
 
 def generate_energy_report() -> str:
     """生成能耗分析报告"""
-    return "能耗分析报告：本月总能耗较上月降低5.2%，主要节能措施包括优化启停策略和负载分配"
+    return query_planner.describe_energy_report()
 
 
 # 空压设备健康智能体工具
 def get_health_score(equipment_id: str) -> str:
     """获取设备健康评分（0-100）"""
-    return f"设备 {equipment_id} 健康评分：85分，状态良好，建议关注轴承温度趋势"
+    from history_store import history_store  # 依赖 numpy，首次调用时才导入
+    return history_store.describe_health(equipment_id)
 
 
 def predict_maintenance(equipment_id: str) -> str:
     """预测维护需求"""
-    return f"设备 {equipment_id} 预测性维护建议：预计15天后需要更换润滑油，30天后需要检查轴承"
+    return rul_estimator.describe(equipment_id)
 
 
 def get_realtime_status(equipment_id: str) -> str:
     """获取设备实时运行状态"""
-    return f"设备 {equipment_id} 实时状态：运行中，排气温度 95°C，排气压力 0.72 MPa，振动 2.3 mm/s，电流 85A"
+    return realtime_status.describe(equipment_id)
 
 
 # 空压站运营报告智能体工具
-def generate_daily_report() -> str:
-    """生成日报"""
-    return "日报摘要：今日产气量 1,234,567 m³，设备平均负载率 82%，能耗成本 ¥45,678，无重大故障"
+def generate_daily_report(period: str = "") -> str:
+    """生成日报，period 为报告时段（如"昨天"、"3月"），默认今天"""
+    return query_planner.describe_report("daily", period)
+
+
+def generate_monthly_report(period: str = "") -> str:
+    """生成月报，period 为报告时段（如"昨天"、"3月"），默认本月"""
+    return query_planner.describe_report("monthly", period)
 
 
-def generate_monthly_report() -> str:
-    """生成月报"""
-    return "月报摘要：本月总产气量 36,789 m³，总能耗 523,456 kWh，设备可用率 98.5%，节能建议：优化2号机启停策略"
+def get_abnormal_inspections(days: int = 7) -> str:
+    """获取近若干天的异常巡检发现"""
+    return inspection_log.describe_abnormal(days)
 
 
 def get_optimization_suggestions() -> str:
@@ -143,39 +169,65 @@ def get_optimization_suggestions() -> str:
 # 空压站设备巡检智能体工具
 def perform_visual_inspection(equipment_id: str) -> str:
     """执行视觉巡检"""
-    return f"设备 {equipment_id} 视觉巡检结果：外观正常，无明显泄漏，仪表读数正常，发现轻微油渍需要清理"
+    from visual_inspection import visual_inspection  # 依赖 numpy，首次调用时才导入
+    return visual_inspection.describe(equipment_id)
 
 
 def detect_anomaly(equipment_id: str) -> str:
     """检测设备异常"""
-    return f"设备 {equipment_id} 异常检测：检测到轻微振动异常，建议重点关注，可能需要动平衡调整"
+    from anomaly_detector import anomaly_detector  # 依赖 numpy，首次调用时才导入
+    return anomaly_detector.describe(equipment_id)
 
 
 def record_inspection_result(equipment_id: str, result: str) -> str:
     """记录巡检结果"""
-    return f"已记录设备 {equipment_id} 的巡检结果：{result}"
+    return inspection_log.record(equipment_id, result)
+
+
+def query_inspection_records(equipment_id: str, limit: int = 10) -> str:
+    """查询设备最近的巡检记录"""
+    return inspection_log.describe_latest(equipment_id, limit)
+
+
+# 工具输出预算：被压缩的输出按引用取回，旁路存储中有输出时才提供给模型
+def fetch_tool_output(ref: str, page: int = 1) -> str:
+    """按引用分页获取被压缩的工具完整输出，ref 为压缩说明中给出的引用，page 从 1 开始"""
+    return tool_budget.fetch(ref, page)
+
+
+class ToolBudgetWorkbench(StaticWorkbench):
+    """旁路存储中没有可取回的输出时不列出 fetch_tool_output（每次模型调用前重新列出工具）"""
+
+    async def list_tools(self) -> list:
+        schemas = await super().list_tools()
+        if tool_budget.has_outputs:
+            return schemas
+        return [schema for schema in schemas if schema["name"] != FETCH_TOOL]
+
+
+def agent_workbench(tools: list) -> ToolBudgetWorkbench:
+    """专业智能体的工作台：工具按名称排序；开启工具输出预算时逐个包装，并附带按需列出的 fetch_tool_output"""
+    if tool_budget.enabled:
+        tools = [budgeted(tool) for tool in tools] + [fetch_tool_output]
+    return ToolBudgetWorkbench([FunctionTool(tool, description=tool.__doc__ or "") for tool in stable_tools(tools)])
 
 
 # ==================== 子智能体定义 ====================
 
 # 通用 handoffs 函数 - 用于子智能体之间相互转发
 def get_sub_agent_handoffs(agent_name: str) -> list:
-    """获取子智能体的 handoffs 列表（排除自己）"""
-    all_agents = [
-        ("dispatch_agent", "空压站智能调度智能体，用于处理设备启停、负荷分配、运行优化、用气调度等问题"),
-        ("maintenance_agent", "空压机设备维修助手，用于处理故障诊断、维修指南、备件订购等问题"),
-        ("energy_analysis_agent", "空压站能耗分析智能体，用于处理能耗分析、能效对比、节能报告等问题"),
-        ("health_agent", "空压设备健康智能体，用于处理设备健康评分、预测性维护、实时状态监测等问题"),
-        ("report_agent", "空压站运营报告智能体，用于处理日报/月报生成、优化建议等问题"),
-        ("inspection_agent", "空压站设备巡检智能体，用于处理视觉巡检、异常检测、巡检记录等问题"),
+    """获取子智能体的 handoffs 列表（排除自己），顺序固定为智能体目录顺序"""
+    return [
+        Handoff(target=name, description=f"{title}，用于处理{duties}等问题")
+        for name, title, duties in AGENT_DIRECTORY
+        if name != agent_name
     ]
-    return [Handoff(target=name, description=desc) for name, desc in all_agents if name != agent_name]
 
 
 # 空压站智能调度智能体
 dispatch_agent = AssistantAgent(
     "dispatch_agent",
-    model_client=model_client,
+    model_client=create_model_client("dispatch_agent"),
     system_message="""你是空压站智能调度智能体。你的职责是基于AI算法与工业机理模型，实现对空压机组的自主启停、负荷分配及运行优化。
 
 你的核心能力：
@@ -188,14 +240,14 @@ dispatch_agent = AssistantAgent(
 如果用户的问题超出你的职责范围，请使用 handoff 工具将任务转发给其他专业智能体。
 完成回答后，请说"TERMINATE"结束对话。""",
     description="负责设备启停、负荷分配、运行优化、用气调度",
-    tools=[start_compressor, stop_compressor, adjust_load, get_air_demand],
+    workbench=agent_workbench([start_compressor, stop_compressor, adjust_load, get_air_demand]),
     handoffs=get_sub_agent_handoffs("dispatch_agent"),
 )
 
 # 空压机设备维修助手
 maintenance_agent = AssistantAgent(
     "maintenance_agent",
-    model_client=model_client,
+    model_client=create_model_client("maintenance_agent"),
     system_message="""你是空压机设备维修助手。你的职责是对设备故障进行维修、排查。
 
 你的核心能力：
@@ -207,14 +259,14 @@ maintenance_agent = AssistantAgent(
 如果用户的问题超出你的职责范围，请使用 handoff 工具将任务转发给其他专业智能体。
 完成回答后，请说"TERMINATE"结束对话。""",
     description="负责故障诊断、维修指南、备件订购",
-    tools=[diagnose_fault, get_repair_guide, order_spare_parts],
+    workbench=agent_workbench([diagnose_fault, get_repair_guide, order_spare_parts]),
     handoffs=get_sub_agent_handoffs("maintenance_agent"),
 )
 
 # 空压站能耗分析智能体
 energy_analysis_agent = AssistantAgent(
     "energy_analysis_agent",
-    model_client=model_client,
+    model_client=create_model_client("energy_analysis_agent"),
     system_message="""你是空压站能耗分析智能体。你的职责是通过集成多源数据与智能算法，实现对空压站运行状态的实时监控与能耗精准分析。
 
 你的核心能力：
@@ -227,14 +279,14 @@ energy_analysis_agent = AssistantAgent(
 如果用户的问题超出你的职责范围，请使用 handoff 工具将任务转发给其他专业智能体。
 完成回答后，请说"TERMINATE"结束对话。""",
     description="负责能耗分析、能效对比、节能报告",
-    tools=[analyze_energy_consumption, compare_energy_efficiency, generate_energy_report],
+    workbench=agent_workbench([analyze_energy_consumption, compare_energy_efficiency, generate_energy_report]),
     handoffs=get_sub_agent_handoffs("energy_analysis_agent"),
 )
 
 # 空压设备健康智能体
 health_agent = AssistantAgent(
     "health_agent",
-    model_client=model_client,
+    model_client=create_model_client("health_agent"),
     system_message="""你是空压设备健康智能体。你的职责是融合物联网与AI技术，实时监测空压设备运行状态。
 
 你的核心能力：
@@ -248,14 +300,14 @@ health_agent = AssistantAgent(
 如果用户的问题超出你的职责范围，请使用 handoff 工具将任务转发给其他专业智能体。
 完成回答后，请说"TERMINATE"结束对话。""",
     description="负责设备健康评分、预测性维护、实时状态监测",
-    tools=[get_health_score, predict_maintenance, get_realtime_status],
+    workbench=agent_workbench([get_health_score, predict_maintenance, get_realtime_status]),
     handoffs=get_sub_agent_handoffs("health_agent"),
 )
 
 # 空压站运营报告智能体
 report_agent = AssistantAgent(
     "report_agent",
-    model_client=model_client,
+    model_client=create_model_client("report_agent"),
     system_message="""你是空压站运营报告智能体。你的职责是融合多源数据与算法模型，自动分析空压站运行状态。
 
 你的核心能力：
@@ -268,14 +320,14 @@ report_agent = AssistantAgent(
 如果用户的问题超出你的职责范围，请使用 handoff 工具将任务转发给其他专业智能体。
 完成回答后，请说"TERMINATE"结束对话。""",
     description="负责日报/月报生成、优化建议",
-    tools=[generate_daily_report, generate_monthly_report, get_optimization_suggestions],
+    workbench=agent_workbench([generate_daily_report, generate_monthly_report, get_optimization_suggestions, get_abnormal_inspections]),
     handoffs=get_sub_agent_handoffs("report_agent"),
 )
 
 # 空压站设备巡检智能体
 inspection_agent = AssistantAgent(
     "inspection_agent",
-    model_client=model_client,
+    model_client=create_model_client("inspection_agent"),
     system_message="""你是空压站设备巡检智能体。你的职责是融合AI视觉识别与物联网技术，自动识别设备异常状态。
 
 你的核心能力：
@@ -287,16 +339,13 @@ inspection_agent = AssistantAgent(
 如果用户的问题超出你的职责范围，请使用 handoff 工具将任务转发给其他专业智能体。
 完成回答后，请说"TERMINATE"结束对话。""",
     description="负责视觉巡检、异常检测、巡检记录",
-    tools=[perform_visual_inspection, detect_anomaly, record_inspection_result],
+    workbench=agent_workbench([perform_visual_inspection, detect_anomaly, record_inspection_result, query_inspection_records]),
     handoffs=get_sub_agent_handoffs("inspection_agent"),
 )
 
 # ==================== 主调度智能体（使用 Handoffs）====================
 
-main_agent = AssistantAgent(
-    "main_agent",
-    model_client=model_client,
-    system_message="""你是空压站主调度智能体，负责理解用户需求并将任务分发给相应的专业智能体。
+MAIN_AGENT_SYSTEM_MESSAGE = """你是空压站主调度智能体，负责理解用户需求并将任务分发给相应的专业智能体。
 
 你有6个专业智能体可以协调：
 
@@ -312,20 +361,133 @@ main_agent = AssistantAgent(
 - 如果用户提出具体的专业问题（如设备调度、故障维修、能耗分析等），请使用相应的 handoff 工具将任务移交给专业智能体处理。
 - 如果问题涉及多个领域，可以选择最相关的一个智能体处理。
 
-请保持回复简洁友好。""",
-    handoffs=get_sub_agent_handoffs("main_agent"),
-)
+请保持回复简洁友好。"""
+
+
+def create_main_agent(config: AgentModelConfig | None = None) -> AssistantAgent:
+    """创建主调度智能体，可指定路由模型配置（用于对比不同路由模型）"""
+    return AssistantAgent(
+        "main_agent",
+        model_client=create_model_client("main_agent", config),
+        system_message=MAIN_AGENT_SYSTEM_MESSAGE,
+        handoffs=get_sub_agent_handoffs("main_agent"),
+    )
+
+
+main_agent = create_main_agent()
 
 # ==================== 创建 Team ====================
 
 # 定义终止条件：检测到 TERMINATE 时停止
 termination = TextMentionTermination("TERMINATE")
 
-# 创建 Swarm 团队 - 主智能体作为入口，负责路由到专业智能体
-team = Swarm(
-    [main_agent, dispatch_agent, maintenance_agent, energy_analysis_agent, health_agent, report_agent, inspection_agent],
-    termination_condition=termination
-)
+# 结果即答案的工具（维修指南、日报、备件下单等）执行后直接结束，工具调用摘要即为回复，
+# 不再让智能体调用模型复述结果并说 TERMINATE
+for direct_tool in sorted(DIRECT_RETURN_TOOLS):
+    termination |= FunctionCallTermination(direct_tool)
+
+
+def create_team(router: AssistantAgent | None = None) -> Swarm:
+    """创建 Swarm 团队 - 主智能体作为入口，负责路由到专业智能体"""
+    return Swarm(
+        [router or main_agent, dispatch_agent, maintenance_agent, energy_analysis_agent, health_agent, report_agent, inspection_agent],
+        termination_condition=termination
+    )
+
+
+team = create_team()
+
+# ==================== 降级模式 ====================
+
+DEGRADED_TOOLS = {
+    func.__name__: func
+    for func in (get_health_score, get_realtime_status, generate_daily_report, generate_monthly_report)
+}
+
+
+def local_result(user_input: str, agent_name: str | None, content: str) -> TaskResult:
+    """本地生成的一轮结果（降级模式、答案缓存命中），不进入 Swarm 的对话线程"""
+    return TaskResult(messages=[
+        TextMessage(source="user", content=user_input),
+        TextMessage(source=agent_name or "main_agent", content=content),
+    ])
+
+
+async def run_degraded_turn(user_input: str) -> TaskResult:
+    """熔断期间的一轮对话：本地关键词路由，只读工具按模板回复，不调用模型"""
+    agent_name, content = await answer_degraded(user_input, DEGRADED_TOOLS)
+    return local_result(user_input, agent_name, content)
+
+
+# ==================== 答案缓存 ====================
+
+def called_tools(result: TaskResult) -> list:
+    """一轮运行中调用的工具名（含移交）"""
+    return [call.name for message in result.messages if message.type == "ToolCallRequestEvent"
+            for call in message.content]
+
+
+def final_reply(result: TaskResult) -> tuple:
+    """一轮运行的 (回复的智能体, 回复文本)"""
+    for message in reversed(result.messages):
+        if message.source != "user" and isinstance(message.content, str):
+            return message.source, message.content
+    return None, ""
+
+
+async def run_turn(user_input: str, router_team: Swarm = team, console: bool = True,
+                   use_cache: bool = True) -> TaskResult:
+    """运行一轮对话（console=True 时在控制台流式输出）
+
+    答案缓存命中时直接返回缓存回复（use_cache=False 时不查找也不写入，如路由准确率测试）；
+    模型服务熔断时改走降级模式，本轮模型调用失败且熔断器已断开时同样降级回复
+    """
+    hit = answer_cache.lookup(user_input) if use_cache else None
+    if hit is not None:
+        return local_result(user_input, hit.agent_name, hit.answer)
+    if not model_breaker.accepts_turns():
+        return await run_degraded_turn(user_input)
+    versions = snapshot_versions()
+    try:
+        if console:
+            from autogen_agentchat.ui import Console
+            result = await Console(router_team.run_stream(task=user_input))
+        else:
+            result = await router_team.run(task=user_input)
+    except Exception:
+        if model_breaker.state == CLOSED:
+            raise
+        return await run_degraded_turn(user_input)
+    if use_cache:
+        agent_name, content = final_reply(result)
+        answer_cache.store(user_input, agent_name, content, called_tools(result), versions)
+    return result
+
+# ==================== 调度控制回路 ====================
+
+_control_agent = None
+
+
+async def escalate_to_dispatch_agent(prompt: str) -> str:
+    """调度控制回路的升级处理：在控制线程中运行调度智能体
+
+    使用单独标记的模型客户端（首次升级时在控制线程中创建，不经过主事件循环的全局限流器），不进入 Swarm 的对话线程；
+    每次升级前清空上下文，调用工具后由模型说明处理结果
+    """
+    global _control_agent
+    if _control_agent is None:
+        _control_agent = AssistantAgent(
+            "dispatch_agent",
+            model_client=create_model_client("dispatch_agent", label="dispatch_control", shared_limiter=False),
+            system_message="你是空压站智能调度智能体，负责处理调度控制回路无法自动处理的情况。"
+                           "使用调度工具启停空压机、调整负荷后，简要说明处理结果。",
+            workbench=agent_workbench([start_compressor, stop_compressor, adjust_load, get_air_demand]),
+            reflect_on_tool_use=True,
+        )
+    await _control_agent.on_reset(CancellationToken())
+    result = await _control_agent.run(task=prompt)
+    return result.messages[-1].to_text()
+
 
 # ==================== 主程序 ====================
 
@@ -337,8 +499,15 @@ async def run_interactive():
     print(f"{Colors.YELLOW}[AutoGen Swarm]{Colors.RESET}")
     print()
     print("模型信息：")
-    print(f"  BASE_URL={BASE_URL}, MODEL_NAME={MODEL_NAME}")
+    for line in describe_model_configs(MODEL_CONFIGS):
+        print(line)
     print()
+    if sensor_ingestion.start():
+        print(f"数据接入：{', '.join(source.name for source in sensor_ingestion.sources)}")
+        print()
+    if dispatch_control.start(escalate_to_dispatch_agent):
+        print(f"调度控制回路：每 {dispatch_control.config.interval:g} 秒自动调度，异常时升级给调度智能体")
+        print()
     print("可用功能：")
     print("  1. 设备调度 - 启停空压机、调整负荷、用气需求")
     print("  2. 故障维修 - 故障诊断、维修指南、备件订购")
@@ -369,8 +538,8 @@ async def run_interactive():
             print()
 
             # 运行团队并收集结果
-            from autogen_agentchat.ui import Console
-            result = await Console(team.run_stream(task=user_input))
+            with turn_profiler.turn("autogen") as profile:
+                result = await run_turn(user_input)
             # result = await team.run(task=user_input)
 
             # 从消息中提取最后的响应
@@ -391,6 +560,9 @@ async def run_interactive():
                       f"{Colors.YELLOW}[{last_agent}]{Colors.RESET}"
                       f"{Colors.BLUE}: {last_content}{Colors.RESET}", flush=True)
             print()
+            if profile is not None:
+                print(profile.describe())
+                print()
 
         except KeyboardInterrupt:
             print()
@@ -407,4 +579,17 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    with turn_profiler.suite("autogen-interactive"):
+        asyncio.run(main())
+    if dispatch_control.running:
+        dispatch_control.stop()
+        print(dispatch_control.describe())
+    if sensor_ingestion.running:
+        sensor_ingestion.stop()
+        print(sensor_ingestion.describe())
+    if answer_cache.enabled:
+        print(answer_cache.describe())
+    if tool_budget.stats.compacted:
+        print(tool_budget.stats.describe())
+    for line in turn_profiler.summary():
+        print(line)
\ No newline at end of file
@@ -11,8 +11,20 @@ import os
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from autogen_multi_agents import team
+from autogen_multi_agents import MODEL_CONFIGS, create_main_agent, create_team, run_turn, team
 from test_cases import TEST_CASES
+from bench_history import record_run
+from bench_stats import format_latency_percentiles, print_router_comparison, summarize_router_run
+from model_config import router_candidates
+from circuit_breaker import model_breaker
+from degraded_mode import degraded_stats
+from profiling import turn_profiler
+from rate_limiter import model_limiter
+from query_planner import query_planner
+from request_policy import policy_stats
+from sensor_ingestion import sensor_ingestion
+from token_usage import UsageTotals, format_usage, usage_tracker
+from tool_budget import tool_budget
 
 
 # ==================== 颜色定义 ====================
@@ -28,13 +40,17 @@ class TestColors:
 
 # ==================== 测试执行函数 ====================
 
-async def execute_single_test(test_case: dict, index: int) -> dict:
+DEGRADED_ERROR = "降级模式回复（熔断器断开），未经模型路由"
+
+
+async def execute_single_test(test_case: dict, index: int, router_team=team) -> dict:
     """
     测试单个问题
 
     Args:
         test_case: 测试用例字典，包含 question 和 expected_agent
         index: 测试序号（从1开始）
+        router_team: Swarm 团队（对比路由模型时传入）
 
     Returns:
         测试结果字典，包含问题、预期、实际、是否正确、错误信息
@@ -43,9 +59,9 @@ async def execute_single_test(test_case: dict, index: int) -> dict:
     expected = test_case["expected_agent"]
 
     try:
+        degraded_before = degraded_stats.turns
         # 运行团队
-        from autogen_agentchat.ui import Console
-        result = await Console(team.run_stream(task=question))
+        result = await run_turn(question, router_team, use_cache=False)
 
         # 从消息中提取最后的智能体
         last_agent = None
@@ -56,7 +72,9 @@ async def execute_single_test(test_case: dict, index: int) -> dict:
         # 如果没有检测到智能体，使用预期值进行比较
         actual = last_agent or expected
 
-        is_correct = actual == expected
+        # 熔断期间由本地关键词路由回复，不计入模型路由准确率
+        error = DEGRADED_ERROR if degraded_stats.turns > degraded_before else None
+        is_correct = error is None and actual == expected
 
         return {
             "index": index,
@@ -64,7 +82,7 @@ async def execute_single_test(test_case: dict, index: int) -> dict:
             "expected": expected,
             "actual": actual,
             "is_correct": is_correct,
-            "error": None
+            "error": error
         }
 
     except Exception as e:
@@ -154,11 +172,13 @@ def print_summary(results: list):
     print()
 
 
-async def run_tests():
+async def run_tests(router_team=team, router_model: str | None = None):
     """运行所有测试"""
     print("=" * 60)
     print("多智能体识别准确性测试 - AutoGen Swarm")
     print("=" * 60)
+    if router_model:
+        print(f"路由模型：{router_model}")
     print(f"测试用例数：{len(TEST_CASES)}")
     print(f"开始执行测试...")
     print()
@@ -169,9 +189,18 @@ async def run_tests():
     # 记录开始时间
     start_time = time.time()
     for index, test_case in enumerate(TEST_CASES, start=1):
-        result = await execute_single_test(test_case, index)
+        usage_before = usage_tracker.snapshot()
+        router_usage_before = usage_tracker.snapshot("main_agent")
+        case_start = time.time()
+        with turn_profiler.turn(f"autogen-case{index:02d}") as profile:
+            result = await execute_single_test(test_case, index, router_team)
+        result["latency"] = time.time() - case_start
+        result["usage"] = usage_tracker.snapshot().minus(usage_before)
+        result["router_usage"] = usage_tracker.snapshot("main_agent").minus(router_usage_before)
         results.append(result)
         print_test_result(result)
+        if profile is not None:
+            print(f"  {profile.describe()}")
     # 记录结束时间
     end_time = time.time()
 
@@ -181,12 +210,51 @@ async def run_tests():
     elapsed_time = end_time - start_time
     print(f"程序执行耗时: {elapsed_time:.2f} 秒")
 
+    # token 用量（区分前缀缓存命中与未命中的输入 token）
+    total_usage = UsageTotals()
+    for result in results:
+        total_usage.add(result["usage"])
+    print(format_usage(total_usage))
+    print(format_latency_percentiles(result["latency"] for result in results))
+    print(policy_stats.describe())
+    print(model_limiter.describe())
+    print(model_breaker.describe())
+    if sensor_ingestion.running:
+        print(sensor_ingestion.describe())
+    if query_planner.queries:
+        print(query_planner.describe())
+    if degraded_stats.turns:
+        print(degraded_stats.describe())
+    if tool_budget.stats.compacted:
+        print(tool_budget.stats.describe())
+    record_run("autogen", results, elapsed_time, MODEL_CONFIGS, router_model)
+
     return results
 
 
+async def compare_router_models(candidates: list):
+    """依次使用每个候选路由模型运行测试，对比准确率与路由耗时"""
+    rows = []
+    for model_name in candidates:
+        router_team = create_team(create_main_agent(MODEL_CONFIGS["main_agent"].with_model(model_name)))
+        results = await run_tests(router_team, model_name)
+        rows.append(summarize_router_run(model_name, results))
+        print()
+    print_router_comparison(rows)
+
+
 def main():
-    """主程序入口"""
-    asyncio.run(run_tests())
+    """主程序入口（设置 ROUTER_MODEL_CANDIDATES 时对比多个路由模型）"""
+    candidates = router_candidates()
+    sensor_ingestion.start()
+    with turn_profiler.suite("autogen-suite"):
+        if candidates:
+            asyncio.run(compare_router_models(candidates))
+        else:
+            asyncio.run(run_tests())
+    sensor_ingestion.stop()
+    for line in turn_profiler.summary():
+        print(line)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,293 @@
+"""
+基准测试结果历史与回归门禁
+三种实现的测试脚本每次运行后写入一个 JSON 结果文件（带格式版本号），记录实现、各智能体模型、git 提交，
+以及每题的路由结果、耗时、token 用量与模型调用次数：
+
+    bench_results/runs/<实现>/<时间>-<提交>.json      每次运行（不入库）
+    bench_results/baselines/<实现>.json              基线（可入库，供 CI 对比）
+
+命令行：
+    python bench_history.py list --impl openai                  列出历史运行
+    python bench_history.py baseline --impl openai [运行文件]      将指定运行（默认最近一次）设为基线
+    python bench_history.py compare --impl openai [运行文件]       与基线对比，存在回归时以退出码 1 结束
+
+回归判定：准确率下降超过阈值或有题目由正确变为错误、单题耗时 P50/P95 增长超过阈值、
+单题平均 token 或模型调用次数增长超过阈值。题目按问题文本对应，题库变化时只对比共同的题目
+
+BENCH_RESULTS_DIR 指定结果目录（默认项目根目录下的 bench_results），设为空字符串时测试脚本不写结果文件
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+from bench_stats import percentile
+
+# ==================== 配置 ====================
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_VERSION = 1
+_results_dir = os.getenv("BENCH_RESULTS_DIR")
+RESULTS_DIR = os.path.join(ROOT, "bench_results") if _results_dir is None else _results_dir
+
+
+@dataclass(frozen=True)
+class Thresholds:
+    """回归阈值，增长类为相对基线的比例"""
+    accuracy_drop: float = 0.0          # 准确率允许下降的百分点
+    latency_growth: float = 0.2
+    token_growth: float = 0.1
+    call_growth: float = 0.1
+
+
+# ==================== 记录 ====================
+
+def git_revision() -> dict:
+    """当前 git 提交与工作区是否有未提交修改，不在仓库中时为 unknown"""
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=10,
+                              check=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "-uno"))}
+    except (OSError, subprocess.SubprocessError):
+        return {"commit": "unknown", "dirty": False}
+
+
+def summarize_cases(cases: list) -> dict:
+    total = len(cases)
+    latencies = [case["latency"] for case in cases]
+    correct = sum(1 for case in cases if case["is_correct"])
+    return {
+        "cases": total,
+        "correct": correct,
+        "errors": sum(1 for case in cases if case["error"]),
+        "accuracy": correct / total if total else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "calls": sum(case["calls"] for case in cases),
+        "input_tokens": sum(case["input_tokens"] for case in cases),
+        "cached_input_tokens": sum(case["cached_input_tokens"] for case in cases),
+        "output_tokens": sum(case["output_tokens"] for case in cases),
+    }
+
+
+def build_run(impl: str, results: list, elapsed: float, model_configs: dict,
+              router_model: str | None = None) -> dict:
+    """由测试脚本的结果列表（含 latency 与 usage）生成结果记录"""
+    models = {agent: config.model_name for agent, config in model_configs.items()}
+    if router_model:
+        models["main_agent"] = router_model
+    cases = [
+        {
+            "question": result["question"],
+            "expected": result["expected"],
+            "actual": result["actual"],
+            "is_correct": result["is_correct"],
+            "error": result["error"],
+            "latency": round(result["latency"], 4),
+            "calls": result["usage"].calls,
+            "input_tokens": result["usage"].input_tokens,
+            "cached_input_tokens": result["usage"].cached_input_tokens,
+            "output_tokens": result["usage"].output_tokens,
+        }
+        for result in results
+    ]
+    return {
+        "schema": SCHEMA_VERSION,
+        "impl": impl,
+        "models": models,
+        "git": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "elapsed_seconds": round(elapsed, 3),
+        "summary": summarize_cases(cases),
+        "cases": cases,
+    }
+
+
+def runs_dir(impl: str) -> str:
+    return os.path.join(RESULTS_DIR, "runs", impl)
+
+
+def baseline_path(impl: str) -> str:
+    return os.path.join(RESULTS_DIR, "baselines", f"{impl}.json")
+
+
+def save_run(run: dict) -> str:
+    """写入结果文件，返回路径"""
+    directory = runs_dir(run["impl"])
+    os.makedirs(directory, exist_ok=True)
+    stamp = run["timestamp"].replace("-", "").replace(":", "").replace("T", "-")
+    path = os.path.join(directory, f"{stamp}-{run['git']['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(run, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def load_run(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        run = json.load(f)
+    if run.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"{path} 的结果格式版本为 {run.get('schema')}，当前版本为 {SCHEMA_VERSION}")
+    return run
+
+
+def run_paths(impl: str) -> list:
+    """历史运行文件，按时间排序"""
+    return sorted(glob.glob(os.path.join(runs_dir(impl), "*.json")))
+
+
+# ==================== 对比 ====================
+
+def _growth(baseline: float, current: float) -> float:
+    return current / baseline - 1.0 if baseline else 0.0
+
+
+def compare_runs(baseline: dict, current: dict, thresholds: Thresholds = Thresholds()) -> tuple:
+    """对比共同题目，返回 (对比明细行, 回归行)"""
+    base_cases = {case["question"]: case for case in baseline["cases"]}
+    shared = [case for case in current["cases"] if case["question"] in base_cases]
+    if not shared:
+        return [], ["与基线没有共同的题目，无法对比"]
+    before = summarize_cases([base_cases[case["question"]] for case in shared])
+    after = summarize_cases(shared)
+    count = len(shared)
+
+    lines = [f"对比题目：{count}（基线 {baseline['git']['commit']} {baseline['timestamp']}，"
+             f"本次 {current['git']['commit']} {current['timestamp']}）"]
+    regressions = []
+
+    accuracy_drop = (before["accuracy"] - after["accuracy"]) * 100
+    lines.append(f"准确率：{before['accuracy']:.2%} → {after['accuracy']:.2%}")
+    if accuracy_drop > thresholds.accuracy_drop:
+        regressions.append(f"准确率下降 {accuracy_drop:.2f} 个百分点（阈值 {thresholds.accuracy_drop}）")
+    for case in shared:
+        if base_cases[case["question"]]["is_correct"] and not case["is_correct"]:
+            regressions.append(f"由正确变为错误：\"{case['question']}\"（预期 {case['expected']}，"
+                               f"实际 {case['actual'] or case['error']}）")
+
+    for key, label in (("latency_p50", "单题耗时 P50"), ("latency_p95", "单题耗时 P95")):
+        growth = _growth(before[key], after[key])
+        lines.append(f"{label}：{before[key]:.2f}s → {after[key]:.2f}s（{growth:+.1%}）")
+        if growth > thresholds.latency_growth:
+            regressions.append(f"{label} 增长 {growth:.1%}（阈值 {thresholds.latency_growth:.0%}）")
+
+    tokens_before = (before["input_tokens"] + before["output_tokens"]) / count
+    tokens_after = (after["input_tokens"] + after["output_tokens"]) / count
+    growth = _growth(tokens_before, tokens_after)
+    lines.append(f"单题 tokens：{tokens_before:.0f} → {tokens_after:.0f}（{growth:+.1%}）")
+    if growth > thresholds.token_growth:
+        regressions.append(f"单题 tokens 增长 {growth:.1%}（阈值 {thresholds.token_growth:.0%}）")
+
+    growth = _growth(before["calls"] / count, after["calls"] / count)
+    lines.append(f"单题模型调用：{before['calls'] / count:.2f} → {after['calls'] / count:.2f}（{growth:+.1%}）")
+    if growth > thresholds.call_growth:
+        regressions.append(f"单题模型调用增长 {growth:.1%}（阈值 {thresholds.call_growth:.0%}）")
+
+    changed_models = {agent: (baseline["models"].get(agent), model) for agent, model in current["models"].items()
+                      if baseline["models"].get(agent) != model}
+    if changed_models:
+        lines.append("模型变化：" + "，".join(f"{agent} {old} → {new}" for agent, (old, new) in changed_models.items()))
+    return lines, regressions
+
+
+def print_baseline_comparison(run: dict):
+    """测试脚本结束时：存在基线则打印对比（不影响退出码）"""
+    path = baseline_path(run["impl"])
+    if not os.path.exists(path):
+        return
+    lines, regressions = compare_runs(load_run(path), run)
+    print("与基线对比：")
+    for line in lines:
+        print(f"  {line}")
+    for regression in regressions:
+        print(f"  回归：{regression}")
+    if not regressions:
+        print("  未发现回归")
+
+
+def record_run(impl: str, results: list, elapsed: float, model_configs: dict, router_model: str | None = None):
+    """测试脚本调用：写入结果文件并与基线对比；BENCH_RESULTS_DIR 为空字符串时不记录"""
+    if not RESULTS_DIR:
+        return
+    run = build_run(impl, results, elapsed, model_configs, router_model)
+    path = save_run(run)
+    print(f"结果已保存：{os.path.relpath(path, ROOT) if path.startswith(ROOT) else path}")
+    print_baseline_comparison(run)
+
+
+# ==================== 命令行入口 ====================
+
+def _resolve_run(impl: str, path: str | None) -> str:
+    if path:
+        return path
+    paths = run_paths(impl)
+    if not paths:
+        sys.exit(f"{runs_dir(impl)} 中没有运行记录，请先运行 {impl} 的测试脚本")
+    return paths[-1]
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--impl", default="openai", choices=("agentscope", "autogen", "openai"))
+    parser = argparse.ArgumentParser(description="基准测试结果历史与回归门禁")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", parents=[common], help="列出历史运行")
+    # 子命令各自解析运行文件位置参数，选项可写在运行文件之前或之后
+    for name, help_text in (("baseline", "将指定运行（默认最近一次）设为基线"),
+                            ("compare", "与基线对比，存在回归时以退出码 1 结束")):
+        command = commands.add_parser(name, parents=[common], help=help_text)
+        command.add_argument("run", nargs="?", help="运行结果文件，默认最近一次")
+        command.add_argument("--baseline", help="基线文件，默认 bench_results/baselines/<实现>.json")
+    compare = commands.choices["compare"]
+    compare.add_argument("--max-accuracy-drop", type=float, default=Thresholds.accuracy_drop,
+                         help="准确率允许下降的百分点")
+    compare.add_argument("--max-latency-growth", type=float, default=Thresholds.latency_growth)
+    compare.add_argument("--max-token-growth", type=float, default=Thresholds.token_growth)
+    compare.add_argument("--max-call-growth", type=float, default=Thresholds.call_growth)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in run_paths(args.impl):
+            run = load_run(path)
+            summary = run["summary"]
+            dirty = "*" if run["git"]["dirty"] else ""
+            print(f"{run['timestamp']}  {run['git']['commit']}{dirty:1s}  {run['models'].get('main_agent', '-')}  "
+                  f"准确率 {summary['accuracy']:.2%}  P50 {summary['latency_p50']:.2f}s  "
+                  f"P95 {summary['latency_p95']:.2f}s  调用 {summary['calls']}  "
+                  f"tokens {summary['input_tokens'] + summary['output_tokens']}  {os.path.basename(path)}")
+        return
+
+    path = _resolve_run(args.impl, args.run)
+    if args.command == "baseline":
+        load_run(path)
+        target = args.baseline or baseline_path(args.impl)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+        print(f"已将 {os.path.basename(path)} 设为 {args.impl} 的基线：{target}")
+        return
+
+    baseline = args.baseline or baseline_path(args.impl)
+    if not os.path.exists(baseline):
+        sys.exit(f"基线文件不存在：{baseline}，请先运行 python bench_history.py baseline --impl {args.impl}")
+    thresholds = Thresholds(args.max_accuracy_drop, args.max_latency_growth, args.max_token_growth,
+                            args.max_call_growth)
+    lines, regressions = compare_runs(load_run(baseline), load_run(path), thresholds)
+    for line in lines:
+        print(line)
+    if regressions:
+        print("发现回归：")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("通过：未发现回归")
+
+
+if __name__ == "__main__":
+    main()
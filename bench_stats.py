@@ -0,0 +1,59 @@
+"""
+基准测试统计辅助函数
+三种实现的测试脚本共用：分位数计算、路由模型对比汇总
+"""
+
+import math
+
+# ==================== 统计函数 ====================
+
+def percentile(values, q: float) -> float:
+    """线性插值分位数，q 取值 0-100，空序列返回 0"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * q / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def format_latency_percentiles(latencies, title: str = "单题耗时") -> str:
+    """格式化延迟分位数摘要"""
+    latencies = list(latencies)
+    return (f"{title}：P50 {percentile(latencies, 50):.2f}s / P95 {percentile(latencies, 95):.2f}s / "
+            f"P99 {percentile(latencies, 99):.2f}s / 最大 {max(latencies, default=0.0):.2f}s")
+
+
+# ==================== 路由模型对比 ====================
+
+def summarize_router_run(model_name: str, results: list) -> dict:
+    """汇总一个路由模型的测试结果
+
+    results 中每项需包含 is_correct、latency（单题耗时）与 router_usage（路由模型用量）
+    """
+    total = len(results)
+    correct = sum(1 for r in results if r["is_correct"])
+    router_latencies = [r["router_usage"].latency_seconds for r in results if r["router_usage"].calls]
+    return {
+        "model": model_name,
+        "accuracy": correct / total if total else 0.0,
+        "router_calls": sum(r["router_usage"].calls for r in results),
+        "router_avg": sum(router_latencies) / len(router_latencies) if router_latencies else 0.0,
+        "router_p95": percentile(router_latencies, 95),
+        "case_avg": sum(r["latency"] for r in results) / total if total else 0.0,
+        "router_tokens": sum(r["router_usage"].input_tokens + r["router_usage"].output_tokens for r in results),
+    }
+
+
+def print_router_comparison(rows: list):
+    """打印路由模型对比表"""
+    print("=" * 60)
+    print("路由模型对比")
+    print("=" * 60)
+    for row in rows:
+        print(f"{row['model']}: 准确率 {row['accuracy']:.2%} | "
+              f"路由耗时 平均 {row['router_avg']:.2f}s / P95 {row['router_p95']:.2f}s | "
+              f"单题平均 {row['case_avg']:.2f}s | 路由调用 {row['router_calls']} 次 | "
+              f"路由 tokens {row['router_tokens']}")
+    print()
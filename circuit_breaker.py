@@ -0,0 +1,146 @@
+"""
+模型调用熔断器
+模型服务故障或明显变慢时，继续把每个请求发给模型只会让所有操作员请求一起挂起。
+熔断器统计最近若干次模型请求（含重试后的最终结果）的失败与慢调用比例：
+1. 闭合：正常发送；最近窗口内失败/慢调用比例达到阈值时熔断
+2. 断开：不再发送模型请求，直接抛出 CircuitOpenError，各实现改走降级模式（见 degraded_mode.py）
+3. 半开：断开 CIRCUIT_OPEN_SECONDS 秒后放行一个探测请求，成功则恢复闭合，失败则重新断开
+
+配置（环境变量）：CIRCUIT_FAILURE_RATE、CIRCUIT_SLOW_CALL_SECONDS、CIRCUIT_MIN_CALLS、
+CIRCUIT_WINDOW、CIRCUIT_OPEN_SECONDS，CIRCUIT_BREAKER=0 关闭熔断
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import httpx
+
+# ==================== 配置 ====================
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class BreakerConfig:
+    """熔断配置"""
+    enabled: bool = True
+    failure_rate: float = 0.5           # 窗口内失败（含慢调用）比例达到该值时熔断
+    slow_call_seconds: float = 15.0     # 单次请求（含重试）超过该时长记为慢调用
+    min_calls: int = 5                  # 窗口内样本不足时不熔断
+    window: int = 20                    # 统计最近多少次请求
+    open_seconds: float = 30.0          # 断开多久后进入半开探测
+
+    @classmethod
+    def from_env(cls) -> "BreakerConfig":
+        return cls(
+            enabled=os.getenv("CIRCUIT_BREAKER") != "0",
+            failure_rate=_env_float("CIRCUIT_FAILURE_RATE", cls.failure_rate),
+            slow_call_seconds=_env_float("CIRCUIT_SLOW_CALL_SECONDS", cls.slow_call_seconds),
+            min_calls=int(os.getenv("CIRCUIT_MIN_CALLS") or cls.min_calls),
+            window=int(os.getenv("CIRCUIT_WINDOW") or cls.window),
+            open_seconds=_env_float("CIRCUIT_OPEN_SECONDS", cls.open_seconds),
+        )
+
+
+class CircuitOpenError(httpx.TransportError):
+    """熔断器断开，模型请求未发送"""
+
+
+# ==================== 熔断器 ====================
+
+class CircuitBreaker:
+    """按最近请求的失败与慢调用比例熔断，断开一段时间后用单个探测请求恢复"""
+
+    def __init__(self, config: BreakerConfig):
+        self.config = config
+        self._state = CLOSED
+        self._outcomes = deque(maxlen=config.window)    # True 表示失败或慢调用
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        # 指标
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.config.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def accepts_turns(self) -> bool:
+        """新一轮对话是否走模型：闭合，或半开且探测名额空闲时返回 True（不占用名额）"""
+        if not self.config.enabled:
+            return True
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._probe_in_flight)
+
+    def allow_request(self) -> bool:
+        """模型请求发送前调用：半开时只放行一个探测请求"""
+        if not self.config.enabled:
+            return True
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, seconds: float, failed: bool):
+        """记录一次模型请求的最终结果（含重试），超过慢调用阈值的成功请求也记为失败"""
+        if not self.config.enabled:
+            return
+        failed = failed or seconds >= self.config.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                if failed:
+                    self._open()
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            if self._state == OPEN:
+                return
+            self._outcomes.append(failed)
+            if (len(self._outcomes) >= self.config.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.config.failure_rate):
+                self._open()
+
+    def abandon(self):
+        """请求被取消（未得出结果）：释放半开探测名额"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.trips += 1
+
+    def describe(self) -> str:
+        return f"熔断：状态 {self.state}，熔断 {self.trips} 次，拒绝请求 {self.rejected} 次"
+
+
+# 全局熔断器：所有智能体的模型请求共用
+model_breaker = CircuitBreaker(BreakerConfig.from_env())
@@ -0,0 +1,216 @@
+"""
+空压机组运行状态与执行
+调度工具（start_compressor / stop_compressor / adjust_load / get_air_demand）与后台调度控制回路（dispatch_control）
+共享同一份机组状态：每台空压机的启停、负荷设定与最近一次手动操作时间
+
+用气需求与管网压力由需求源提供，内置模拟管网：需求按日周期波动并叠加随机游走，管网压力随供需差偏离设定值；
+接入真实数据时替换 CompressorFleet.demand_source。故障状态取自实时状态看板（realtime_status）
+
+开关（环境变量）：FLEET_EQUIPMENT（空压机台数，默认 3）、FLEET_CAPACITY（单台额定排气量 m³/min，默认 40）、
+FLEET_PRESSURE_SETPOINT（管网压力设定值 MPa，默认 0.7）
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from equipment import normalize_equipment_id
+from realtime_status import STALE_SECONDS, realtime_status
+
+# ==================== 配置 ====================
+
+ACTOR_AGENT = "agent"           # 调度智能体或操作员（经工具调用）
+ACTOR_CONTROL = "control"       # 后台调度控制回路
+START_LOAD = 50                 # 启动后的初始负荷（%）
+ACTION_LOG_SIZE = 200
+
+
+@dataclass(frozen=True)
+class FleetConfig:
+    """机组配置"""
+    equipment: int = 3              # 空压机台数，编号 1..N
+    capacity: float = 40.0          # 单台额定排气量（m³/min）
+    pressure_setpoint: float = 0.7  # 管网压力设定值（MPa）
+
+    @classmethod
+    def from_env(cls) -> "FleetConfig":
+        return cls(
+            equipment=int(os.getenv("FLEET_EQUIPMENT") or cls.equipment),
+            capacity=float(os.getenv("FLEET_CAPACITY") or cls.capacity),
+            pressure_setpoint=float(os.getenv("FLEET_PRESSURE_SETPOINT") or cls.pressure_setpoint),
+        )
+
+
+# ==================== 机组状态 ====================
+
+@dataclass
+class CompressorUnit:
+    """单台空压机的运行状态"""
+    equipment_id: str
+    capacity: float
+    running: bool = False
+    load: int = 0                       # 负荷设定（%）
+    started_at: float | None = None
+    manual_at: float | None = None      # 最近一次由智能体或操作员操作的时间
+
+    @property
+    def output(self) -> float:
+        """当前供气量（m³/min）"""
+        return self.capacity * self.load / 100.0 if self.running else 0.0
+
+
+@dataclass(frozen=True)
+class AirDemand:
+    """一次用气需求读数"""
+    timestamp: float
+    demand: float           # 用气需求（m³/min）
+    supply: float           # 机组当前供气量（m³/min）
+    pressure: float         # 管网压力（MPa）
+    setpoint: float         # 压力要求（MPa）
+
+
+@dataclass(frozen=True)
+class ActionResult:
+    """一次启停/调负荷操作的结果，text 为工具返回文本"""
+    ok: bool
+    text: str
+
+
+@dataclass(frozen=True)
+class FleetAction:
+    """操作记录"""
+    timestamp: float
+    actor: str
+    text: str
+
+
+# ==================== 模拟管网 ====================
+
+class SimulatedAirNetwork:
+    """模拟用气需求与管网压力，调用方式：source(供气量, 时间戳) -> (需求, 压力)"""
+
+    BASE_RATIO = 0.55           # 平均需求占机组总额定排气量的比例
+    DAILY_AMPLITUDE = 0.2       # 日周期波动幅度（占平均需求的比例）
+    WALK_STD = 0.01             # 每次读数的随机游走标准差（占平均需求的比例）
+    WALK_LIMIT = 0.15
+    PRESSURE_GAIN = 0.3         # 供需差等于总额定排气量时的压力偏差（MPa）
+
+    def __init__(self, total_capacity: float, setpoint: float, seed: int | None = None):
+        self.total_capacity = total_capacity
+        self.setpoint = setpoint
+        self.rng = random.Random(seed)
+        self.walk = 0.0
+
+    def __call__(self, supply: float, now: float) -> tuple:
+        self.walk = min(max(self.walk + self.rng.gauss(0.0, self.WALK_STD), -self.WALK_LIMIT), self.WALK_LIMIT)
+        hour = time.localtime(now).tm_hour + time.localtime(now).tm_min / 60.0
+        daily = self.DAILY_AMPLITUDE * math.sin((hour - 8.0) / 24.0 * 2 * math.pi)
+        demand = self.total_capacity * self.BASE_RATIO * (1.0 + daily + self.walk)
+        pressure = self.setpoint + self.PRESSURE_GAIN * (supply - demand) / self.total_capacity
+        return demand, max(pressure, 0.0)
+
+
+# ==================== 机组 ====================
+
+class CompressorFleet:
+    """全站空压机组：启停与负荷设定的唯一入口，操作记录可追溯到智能体或控制回路"""
+
+    def __init__(self, config: FleetConfig, demand_source=None):
+        self.config = config
+        self.units = {
+            str(index): CompressorUnit(str(index), config.capacity)
+            for index in range(1, config.equipment + 1)
+        }
+        # 初始状态：最后一台备用，其余以初始负荷运行
+        now = time.time()
+        for unit in list(self.units.values())[:-1] or self.units.values():
+            unit.running, unit.load, unit.started_at = True, START_LOAD, now
+        self.demand_source = demand_source or SimulatedAirNetwork(
+            config.capacity * config.equipment, config.pressure_setpoint)
+        self.actions = deque(maxlen=ACTION_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> list:
+        """各机组状态的副本，按编号排序"""
+        with self._lock:
+            return [CompressorUnit(**vars(unit)) for unit in self.units.values()]
+
+    @staticmethod
+    def is_faulted(equipment_id: str, now: float | None = None) -> bool:
+        """实时状态看板中该机组处于故障（过期读数不计）"""
+        snapshot = realtime_status.get(equipment_id)
+        now = time.time() if now is None else now
+        return snapshot is not None and snapshot.fault and now - snapshot.timestamp <= STALE_SECONDS
+
+    def air_demand(self, now: float | None = None) -> AirDemand:
+        now = time.time() if now is None else now
+        with self._lock:
+            supply = sum(unit.output for unit in self.units.values())
+            demand, pressure = self.demand_source(supply, now)
+        return AirDemand(now, demand, supply, pressure, self.config.pressure_setpoint)
+
+    # -------------------- 操作 --------------------
+
+    def _operate(self, compressor_id: str, actor: str, change) -> ActionResult:
+        """在锁内对机组执行 change(unit, now) -> (成功, 文本)，成功时记录操作"""
+        key = normalize_equipment_id(compressor_id)
+        now = time.time()
+        with self._lock:
+            unit = self.units.get(key)
+            if unit is None:
+                return ActionResult(False, f"未找到空压机 {compressor_id}，可用编号：{'、'.join(self.units)}")
+            ok, text = change(unit, now)
+            if ok:
+                if actor != ACTOR_CONTROL:
+                    unit.manual_at = now
+                self.actions.append(FleetAction(now, actor, text))
+        return ActionResult(ok, text)
+
+    def start(self, compressor_id: str, actor: str = ACTOR_AGENT) -> ActionResult:
+        def change(unit, now):
+            if self.is_faulted(unit.equipment_id, now):
+                return False, f"空压机 {compressor_id} 处于故障状态，无法启动"
+            if unit.running:
+                return False, f"空压机 {compressor_id} 已在运行中"
+            unit.running, unit.load, unit.started_at = True, START_LOAD, now
+            return True, f"空压机 {compressor_id} 已启动"
+        return self._operate(compressor_id, actor, change)
+
+    def stop(self, compressor_id: str, actor: str = ACTOR_AGENT) -> ActionResult:
+        def change(unit, now):
+            if not unit.running:
+                return False, f"空压机 {compressor_id} 未在运行"
+            unit.running, unit.load, unit.started_at = False, 0, None
+            return True, f"空压机 {compressor_id} 已停止"
+        return self._operate(compressor_id, actor, change)
+
+    def adjust_load(self, compressor_id: str, load_percentage: int, actor: str = ACTOR_AGENT) -> ActionResult:
+        def change(unit, now):
+            if not 0 <= load_percentage <= 100:
+                return False, f"负荷百分比应在 0-100 之间，收到 {load_percentage}"
+            if not unit.running:
+                return False, f"空压机 {compressor_id} 未运行，请先启动"
+            unit.load = int(load_percentage)
+            return True, f"空压机 {compressor_id} 负荷已调整至 {load_percentage}%"
+        return self._operate(compressor_id, actor, change)
+
+    # -------------------- 工具文本 --------------------
+
+    def describe_demand(self) -> str:
+        """get_air_demand 工具的返回文本"""
+        reading = self.air_demand()
+        units = self.snapshot()
+        running = "、".join(f"{unit.equipment_id}号机 {unit.load}%" for unit in units if unit.running) or "无"
+        standby = "、".join(f"{unit.equipment_id}号机" + ("（故障）" if self.is_faulted(unit.equipment_id) else "")
+                            for unit in units if not unit.running) or "无"
+        return (f"当前用气需求：{reading.demand:.0f} m³/min，供气量 {reading.supply:.0f} m³/min，"
+                f"管网压力 {reading.pressure:.2f} MPa，压力要求：{reading.setpoint} MPa；"
+                f"运行中：{running}；备用：{standby}")
+
+
+# 全局机组实例，供三种实现的调度工具与调度控制回路共享
+compressor_fleet = CompressorFleet(FleetConfig.from_env())
@@ -0,0 +1,123 @@
+"""
+降级模式
+熔断器断开（见 circuit_breaker.py）时不再调用模型：
+1. 路由：用本地关键词路由（keyword_router.predict_agent）确定专业智能体
+2. 只读工具：实时状态、健康评分、日报/月报直接执行工具，按模板包装工具输出作为回复
+3. 其他问题（启停、维修、订购等需要模型推理或有副作用的操作）回复服务降级提示，不执行任何操作
+
+各实现提供 工具名 -> 调用函数 的映射，由 answer_degraded 按计划执行
+"""
+
+import inspect
+import re
+from dataclasses import dataclass, field
+
+from equipment import normalize_equipment_id
+from keyword_router import predict_agent
+from prompt_layout import AGENT_DIRECTORY
+
+# ==================== 只读工具 ====================
+
+@dataclass(frozen=True)
+class ReadOnlyTool:
+    """可在降级模式下直接执行的只读工具"""
+    name: str
+    agent_name: str
+    keywords: tuple
+    needs_equipment: bool = False
+
+
+# 按顺序匹配，先匹配到关键词的工具胜出
+READ_ONLY_TOOLS = (
+    ReadOnlyTool("get_health_score", "health_agent", ("健康", "评分"), needs_equipment=True),
+    ReadOnlyTool("get_realtime_status", "health_agent", ("实时", "状态"), needs_equipment=True),
+    ReadOnlyTool("generate_monthly_report", "report_agent", ("月报", "本月", "月度")),
+    ReadOnlyTool("generate_daily_report", "report_agent", ("日报", "今天", "今日", "运营")),
+)
+READ_ONLY_TOOL_NAMES = frozenset(tool.name for tool in READ_ONLY_TOOLS)
+
+AGENT_TITLES = {name: title for name, title, _ in AGENT_DIRECTORY}
+
+_EQUIPMENT_PATTERN = re.compile(r"(\d+|[一二两三四五六七八九十]+)号")
+
+DEGRADED_PREFIX = "【降级模式】模型服务暂时不可用"
+
+
+# ==================== 降级计划 ====================
+
+@dataclass
+class DegradedPlan:
+    """降级模式下一个问题的处理方式：路由到的智能体，以及要直接执行的只读工具（可为空）"""
+    agent_name: str | None
+    tool_name: str | None = None
+    arguments: dict = field(default_factory=dict)
+
+
+def find_equipment_id(question: str) -> str | None:
+    """从问题中提取第一个设备编号（"1号"、"三号"），没有时返回 None"""
+    match = _EQUIPMENT_PATTERN.search(question)
+    return normalize_equipment_id(match.group()) if match else None
+
+
+def plan_degraded(question: str) -> DegradedPlan:
+    """按关键词确定智能体与只读工具"""
+    agent_name, _ = predict_agent(question)
+    equipment_id = find_equipment_id(question)
+    for tool in READ_ONLY_TOOLS:
+        if tool.agent_name != agent_name or not any(keyword in question for keyword in tool.keywords):
+            continue
+        if tool.needs_equipment:
+            if equipment_id is None:
+                continue
+            return DegradedPlan(agent_name, tool.name, {"equipment_id": equipment_id})
+        return DegradedPlan(agent_name, tool.name)
+    return DegradedPlan(agent_name)
+
+
+def render_degraded_reply(plan: DegradedPlan, output: str | None = None) -> str:
+    """降级回复模板"""
+    if plan.tool_name is not None:
+        return f"{DEGRADED_PREFIX}，以下为{AGENT_TITLES[plan.agent_name]}的查询结果（未经模型分析）：\n{output}"
+    if plan.agent_name is not None:
+        return (f"{DEGRADED_PREFIX}，您的问题已转交{AGENT_TITLES[plan.agent_name]}，"
+                f"该操作需要模型处理，请稍后重试。")
+    return f"{DEGRADED_PREFIX}，目前仅支持查询设备实时状态、健康评分与运营日报/月报，请稍后重试。"
+
+
+# ==================== 执行 ====================
+
+@dataclass
+class DegradedStats:
+    """降级模式统计"""
+    turns: int = 0
+    tool_answers: int = 0
+
+    def describe(self) -> str:
+        return f"降级模式：回复 {self.turns} 轮，其中直接执行只读工具 {self.tool_answers} 轮"
+
+
+# 全局统计实例
+degraded_stats = DegradedStats()
+
+
+async def answer_degraded(question: str, tools: dict) -> tuple:
+    """降级模式下回答一个问题
+
+    Args:
+        question: 用户问题
+        tools: 工具名 -> 调用函数（接收关键字参数，返回文本或可等待的文本）
+
+    Returns:
+        (路由到的智能体名称或 None, 回复文本)
+    """
+    plan = plan_degraded(question)
+    output = None
+    if plan.tool_name is not None and plan.tool_name in tools:
+        output = tools[plan.tool_name](**plan.arguments)
+        if inspect.isawaitable(output):
+            output = await output
+    else:
+        plan.tool_name = None
+    degraded_stats.turns += 1
+    degraded_stats.tool_answers += plan.tool_name is not None
+    return plan.agent_name, render_degraded_reply(plan, output)
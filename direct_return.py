@@ -0,0 +1,47 @@
+"""
+工具结果直接返回配置
+维修指南、日报、备件下单等确定性工具的输出本身就是答案，调用后直接作为回复返回，
+不再让模型复述一遍；AgentScope 的主调度智能体同样可直接返回子智能体的回复
+
+DIRECT_RETURN_TOOLS：直接返回的工具名（逗号分隔），未设置时使用默认列表，设为空字符串则关闭
+DIRECT_RETURN_HANDOFFS：主调度智能体直接返回其回复的专业智能体名（逗号分隔），未设置时为全部专业智能体
+"""
+
+import os
+
+from model_config import SPECIALIST_AGENTS
+from prompt_layout import tool_name
+
+# ==================== 配置 ====================
+
+DEFAULT_DIRECT_RETURN_TOOLS = (
+    "get_repair_guide",
+    "order_spare_parts",
+    "generate_daily_report",
+    "generate_monthly_report",
+    "record_inspection_result",
+)
+# 巡检记录查询等列表类工具不直接返回：输出随数据量增长，需经工具输出预算压缩后再进入会话历史（见 tool_budget.py）
+
+
+def _names_from_env(name: str, default) -> frozenset:
+    raw = os.getenv(name)
+    if raw is None:
+        return frozenset(default)
+    return frozenset(item.strip() for item in raw.split(",") if item.strip())
+
+
+DIRECT_RETURN_TOOLS = _names_from_env("DIRECT_RETURN_TOOLS", DEFAULT_DIRECT_RETURN_TOOLS)
+DIRECT_RETURN_HANDOFFS = _names_from_env("DIRECT_RETURN_HANDOFFS", SPECIALIST_AGENTS)
+
+
+# ==================== 查询 ====================
+
+def direct_return_tool_names(tools) -> list:
+    """tools 中需要直接返回结果的工具名（保持 tools 的顺序）"""
+    return [tool_name(tool) for tool in tools if tool_name(tool) in DIRECT_RETURN_TOOLS]
+
+
+def returns_handoff_directly(agent_name: str) -> bool:
+    """主调度智能体是否直接返回该专业智能体的回复"""
+    return agent_name in DIRECT_RETURN_HANDOFFS
@@ -0,0 +1,346 @@
+"""
+空压站调度控制回路
+后台每隔 DISPATCH_INTERVAL 秒读取用气需求与机组状态，按确定性分配策略直接执行启停与负荷调整，不调用模型；
+只有约束无法满足或策略无法确定时，才把现场情况交给调度智能体（dispatch_agent）处理：
+
+1. 分配策略：以目标负荷率（DISPATCH_TARGET_LOAD）用最少台数满足需求，优先沿用已运行的机组，备用机组按编号启动；
+   去掉一台后在（目标负荷率 - 停机裕度）下仍能满足需求时停机（最晚启动的先停，运行未满最短时间的不停）；
+   运行机组均分负荷（不低于最低负荷），变化小于死区时不调整
+2. 升级（调用调度智能体）：需求超过全部可用机组能力、管网压力低于下限、运行中的机组故障（先行停机）、
+   执行失败、需求数据过期（本轮暂缓动作）；需求突变时本轮暂缓、下一轮确认后按策略执行，
+   连续两轮突变（需求来回跳变）才升级；
+   同类问题在冷却时间内只升级一次，已有升级在处理或模型服务熔断时不升级
+3. 智能体或操作员经工具操作过的机组在保持期（DISPATCH_MANUAL_HOLD）内不被控制回路改动（故障停机除外）
+
+控制回路与数据接入管道一样在独立线程的事件循环中运行，不受交互输入阻塞；升级处理函数由各实现传入，
+在该线程中以独立的模型客户端运行调度智能体
+
+开关（环境变量）：DISPATCH_CONTROL=1 启用（默认不启动）、DISPATCH_INTERVAL（秒，默认 5）、DISPATCH_TARGET_LOAD、
+DISPATCH_MIN_LOAD、DISPATCH_STOP_MARGIN、DISPATCH_LOAD_DEADBAND、DISPATCH_MIN_RUN_SECONDS、DISPATCH_PRESSURE_MIN、
+DISPATCH_STALE_SECONDS、DISPATCH_DEMAND_JUMP、DISPATCH_MANUAL_HOLD、DISPATCH_ESCALATION_COOLDOWN
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from circuit_breaker import model_breaker
+from compressor_fleet import ACTOR_CONTROL, AirDemand, compressor_fleet
+
+# ==================== 配置 ====================
+
+STOP_TIMEOUT = 5.0              # 停止时等待进行中的升级结束的最长秒数
+ESCALATION_LOG_SIZE = 50
+
+# 问题类型 -> 名称
+ISSUE_LABELS = {
+    "capacity": "能力不足",
+    "pressure": "压力过低",
+    "fault": "机组故障",
+    "actuation": "执行失败",
+    "stale": "数据过期",
+    "jump": "需求突变",
+}
+
+
+def _env_flag(name: str) -> bool:
+    return (os.getenv(name) or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class DispatchConfig:
+    """调度控制回路配置，负荷相关单位均为 %"""
+    enabled: bool = False
+    interval: float = 5.0               # 控制周期（秒）
+    target_load: float = 85.0           # 目标负荷率：启机判据
+    min_load: float = 40.0              # 运行机组的最低负荷
+    stop_margin: float = 10.0           # 停机判据比目标负荷率低的裕度，避免在边界上反复启停
+    load_deadband: float = 5.0          # 负荷变化小于该值时不调整
+    min_run_seconds: float = 300.0      # 启动后最短运行时间
+    pressure_min: float = 0.6           # 管网压力下限（MPa）
+    stale_seconds: float = 30.0         # 需求读数超过该秒数视为过期
+    demand_jump: float = 0.3            # 相邻两轮需求变化超过该比例视为突变
+    manual_hold: float = 600.0          # 手动操作后的保持期（秒）
+    escalation_cooldown: float = 300.0  # 同类问题的升级冷却时间（秒）
+
+    @classmethod
+    def from_env(cls) -> "DispatchConfig":
+        def number(name: str, default: float) -> float:
+            return float(os.getenv(name) or default)
+
+        return cls(
+            enabled=_env_flag("DISPATCH_CONTROL"),
+            interval=number("DISPATCH_INTERVAL", cls.interval),
+            target_load=number("DISPATCH_TARGET_LOAD", cls.target_load),
+            min_load=number("DISPATCH_MIN_LOAD", cls.min_load),
+            stop_margin=number("DISPATCH_STOP_MARGIN", cls.stop_margin),
+            load_deadband=number("DISPATCH_LOAD_DEADBAND", cls.load_deadband),
+            min_run_seconds=number("DISPATCH_MIN_RUN_SECONDS", cls.min_run_seconds),
+            pressure_min=number("DISPATCH_PRESSURE_MIN", cls.pressure_min),
+            stale_seconds=number("DISPATCH_STALE_SECONDS", cls.stale_seconds),
+            demand_jump=number("DISPATCH_DEMAND_JUMP", cls.demand_jump),
+            manual_hold=number("DISPATCH_MANUAL_HOLD", cls.manual_hold),
+            escalation_cooldown=number("DISPATCH_ESCALATION_COOLDOWN", cls.escalation_cooldown),
+        )
+
+
+# ==================== 分配策略 ====================
+
+@dataclass(frozen=True)
+class ControlAction:
+    """一次执行动作：start / stop / adjust"""
+    kind: str
+    equipment_id: str
+    load: int = 0
+
+
+@dataclass(frozen=True)
+class Issue:
+    """需要调度智能体介入的问题"""
+    kind: str
+    detail: str
+
+
+@dataclass
+class Decision:
+    """一轮策略输出；hold 为真时策略不确定，本轮不执行动作"""
+    actions: list = field(default_factory=list)
+    issues: list = field(default_factory=list)
+    hold: bool = False
+
+
+def allocate(reading: AirDemand | None, units: list, faulted: set, config: DispatchConfig,
+             now: float, previous: AirDemand | None = None) -> Decision:
+    """确定性分配策略：根据需求读数与机组状态给出启停/负荷动作及需要升级的问题"""
+    if reading is None or now - reading.timestamp > config.stale_seconds:
+        return Decision(issues=[Issue("stale", "用气需求数据缺失或已过期")], hold=True)
+    if previous is not None and previous.demand > 0:
+        change = reading.demand / previous.demand - 1.0
+        if abs(change) > config.demand_jump:
+            return Decision(issues=[Issue("jump", f"用气需求 {previous.demand:.0f} → {reading.demand:.0f} m³/min，"
+                                                  f"变化 {change:+.0%}，本轮暂缓调整")], hold=True)
+
+    decision = Decision()
+    held = {unit.equipment_id for unit in units
+            if unit.manual_at is not None and now - unit.manual_at < config.manual_hold}
+    for unit in units:
+        if unit.running and unit.equipment_id in faulted:
+            decision.actions.append(ControlAction("stop", unit.equipment_id))
+            decision.issues.append(Issue("fault", f"{unit.equipment_id}号机运行中故障，已停机"))
+
+    available = [unit for unit in units if unit.equipment_id not in faulted]
+    fixed_supply = sum(unit.output for unit in available if unit.equipment_id in held)
+    controllable = [unit for unit in available if unit.equipment_id not in held]
+    need = max(reading.demand - fixed_supply, 0.0)
+
+    total_capacity = sum(unit.capacity for unit in controllable)
+    if need > total_capacity:
+        decision.issues.append(Issue("capacity", f"用气需求 {reading.demand:.0f} m³/min 超过可用机组能力 "
+                                                 f"{total_capacity + fixed_supply:.0f} m³/min"))
+    if reading.pressure < config.pressure_min:
+        decision.issues.append(Issue("pressure", f"管网压力 {reading.pressure:.2f} MPa 低于下限 "
+                                                 f"{config.pressure_min} MPa"))
+
+    def capacity(selected: list) -> float:
+        return sum(unit.capacity for unit in selected)
+
+    selected = [unit for unit in controllable if unit.running]
+    standby = [unit for unit in controllable if not unit.running]
+    started = []
+    while standby and capacity(selected) * config.target_load / 100.0 < need:
+        unit = standby.pop(0)
+        selected.append(unit)
+        started.append(unit.equipment_id)
+        decision.actions.append(ControlAction("start", unit.equipment_id))
+    if not started:
+        for unit in sorted(selected, key=lambda unit: unit.started_at or 0.0, reverse=True):
+            rest = capacity(selected) - unit.capacity
+            if unit.started_at is not None and now - unit.started_at < config.min_run_seconds:
+                continue
+            if rest * (config.target_load - config.stop_margin) / 100.0 >= need and (rest > 0 or need == 0):
+                selected.remove(unit)
+                decision.actions.append(ControlAction("stop", unit.equipment_id))
+
+    if selected:
+        share = min(max(need / capacity(selected) * 100.0, config.min_load), 100.0)
+        for unit in selected:
+            if unit.equipment_id in started or abs(unit.load - share) >= config.load_deadband:
+                decision.actions.append(ControlAction("adjust", unit.equipment_id, round(share)))
+    return decision
+
+
+# ==================== 指标 ====================
+
+@dataclass
+class EscalationRecord:
+    """一次升级：问题、调度智能体的处理结果与耗时"""
+    timestamp: float
+    issues: tuple
+    reply: str
+    seconds: float
+
+
+class DispatchStats:
+    """控制回路指标：本地处理的轮次与动作数、升级次数（仅升级会产生模型调用）"""
+
+    def __init__(self):
+        self.ticks = 0
+        self.holds = 0
+        self.actions = Counter()            # 动作类型 -> 次数
+        self.issues = Counter()             # 问题类型 -> 出现轮次
+        self.escalations = 0
+        self.escalations_suppressed = 0     # 冷却期内、已有升级在处理或熔断期间未升级
+        self.escalation_errors = 0
+        self.history = deque(maxlen=ESCALATION_LOG_SIZE)
+
+    def describe(self) -> str:
+        actions = "，".join(f"{name} {count}" for name, count in sorted(self.actions.items())) or "无"
+        line = (f"调度控制：{self.ticks} 轮（暂缓 {self.holds} 轮），本地执行动作 {sum(self.actions.values())} 次"
+                f"（{actions}），升级调度智能体 {self.escalations} 次（抑制 {self.escalations_suppressed} 次，"
+                f"失败 {self.escalation_errors} 次）")
+        if self.issues:
+            line += "，问题 " + "，".join(f"{ISSUE_LABELS[kind]} {count}" for kind, count in sorted(self.issues.items()))
+        return line
+
+
+# ==================== 控制回路 ====================
+
+class DispatchController:
+    """周期读取需求 -> 分配策略 -> 执行；约束违反或策略不确定时升级给调度智能体"""
+
+    def __init__(self, config: DispatchConfig, fleet=compressor_fleet):
+        self.config = config
+        self.fleet = fleet
+        self.stats = DispatchStats()
+        self.escalate = None                # async (提示词) -> 调度智能体的回复文本
+        self._previous = None
+        self._consecutive_holds = 0
+        self._last_escalated = {}           # 问题类型 -> 最近升级时间
+        self._escalation = None
+        self._thread = None
+        self._loop = None
+        self._stopping = None
+        self._ready = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, escalate=None) -> bool:
+        """启动后台控制线程；未启用时不启动，返回是否已在运行"""
+        if self.running:
+            return True
+        if not self.config.enabled:
+            return False
+        self.escalate = escalate
+        self._ready.clear()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), name="dispatch-control",
+                                        daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(STOP_TIMEOUT)
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._ready.set()
+        while not self._stopping.is_set():
+            self.tick()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.config.interval)
+            except TimeoutError:
+                pass
+        if self._escalation is not None:
+            await asyncio.wait({self._escalation}, timeout=STOP_TIMEOUT)
+
+    def tick(self, now: float | None = None) -> Decision:
+        """执行一轮控制：读取需求、运行策略、执行动作，需要时发起升级（在控制线程的事件循环中）"""
+        now = time.time() if now is None else now
+        try:
+            reading = self.fleet.air_demand(now)
+        except Exception:
+            reading = None
+        units = self.fleet.snapshot()
+        faulted = {unit.equipment_id for unit in units if self.fleet.is_faulted(unit.equipment_id, now)}
+        decision = allocate(reading, units, faulted, self.config, now, self._previous)
+        self._previous = reading
+
+        self.stats.ticks += 1
+        self._consecutive_holds = self._consecutive_holds + 1 if decision.hold else 0
+        if decision.hold:
+            self.stats.holds += 1
+        for action in decision.actions:
+            result = self._apply(action)
+            if result.ok:
+                self.stats.actions[action.kind] += 1
+            else:
+                decision.issues.append(Issue("actuation", result.text))
+        for issue in decision.issues:
+            self.stats.issues[issue.kind] += 1
+        # 单次突变先暂缓确认，连续暂缓才说明策略无法确定
+        issues = [issue for issue in decision.issues if issue.kind != "jump" or self._consecutive_holds > 1]
+        if issues:
+            self._maybe_escalate(issues, decision, now)
+        return decision
+
+    def _apply(self, action: ControlAction):
+        if action.kind == "start":
+            return self.fleet.start(action.equipment_id, ACTOR_CONTROL)
+        if action.kind == "stop":
+            return self.fleet.stop(action.equipment_id, ACTOR_CONTROL)
+        return self.fleet.adjust_load(action.equipment_id, action.load, ACTOR_CONTROL)
+
+    def _maybe_escalate(self, issues: list, decision: Decision, now: float):
+        """冷却期外的新问题交给调度智能体；同一时间只有一个升级在处理"""
+        fresh = [issue for issue in issues
+                 if now - self._last_escalated.get(issue.kind, float("-inf")) >= self.config.escalation_cooldown]
+        busy = self._escalation is not None and not self._escalation.done()
+        if not fresh or busy or self.escalate is None or self._loop is None or not model_breaker.accepts_turns():
+            self.stats.escalations_suppressed += 1
+            return
+        for issue in fresh:
+            self._last_escalated[issue.kind] = now
+        self.stats.escalations += 1
+        self._escalation = self._loop.create_task(self._run_escalation(fresh, decision))
+
+    def escalation_prompt(self, issues: list, decision: Decision) -> str:
+        problems = "；".join(f"{ISSUE_LABELS[issue.kind]}：{issue.detail}" for issue in issues)
+        done = "、".join(
+            f"{action.equipment_id}号机{'启动' if action.kind == 'start' else '停机' if action.kind == 'stop' else f'负荷{action.load}%'}"
+            for action in decision.actions
+        ) or "无"
+        return (f"调度控制回路发现需要判断的情况：{problems}。\n"
+                f"控制回路本轮已执行：{done}。\n"
+                f"当前状态：{self.fleet.describe_demand()}\n"
+                "请使用调度工具处理（启停空压机、调整负荷），并简要说明处理结果；无需操作时说明原因。")
+
+    async def _run_escalation(self, issues: list, decision: Decision):
+        started = time.perf_counter()
+        try:
+            reply = await self.escalate(self.escalation_prompt(issues, decision))
+        except Exception as e:
+            self.stats.escalation_errors += 1
+            reply = f"升级处理失败：{e}"
+        self.stats.history.append(EscalationRecord(
+            time.time(), tuple(issue.kind for issue in issues), str(reply), time.perf_counter() - started))
+
+    def describe(self) -> str:
+        line = self.stats.describe()
+        if self.stats.history:
+            last = self.stats.history[-1]
+            kinds = "、".join(ISSUE_LABELS[kind] for kind in last.issues)
+            line += f"\n最近一次升级（{kinds}，{last.seconds:.1f}s）：{last.reply}"
+        return line
+
+
+# 全局调度控制回路实例，由三种实现的交互入口启动
+dispatch_control = DispatchController(DispatchConfig.from_env())
@@ -0,0 +1,39 @@
+"""
+空压站设备编号工具
+模型传入的设备编号写法不一（"1号空压机"、"一号机"、"#1"、"C-1"），统一归一化为纯编号
+"""
+
+import re
+
+# ==================== 编号归一化 ====================
+
+CHINESE_DIGITS = {
+    "零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+    "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10,
+}
+
+_ARABIC_PATTERN = re.compile(r"\d+")
+_CHINESE_PATTERN = re.compile(r"[零一二两三四五六七八九十]+(?=号)")
+
+
+def chinese_to_int(text: str) -> int:
+    """将"十二"、"二十一"这类简单中文数字转为整数"""
+    if "十" not in text:
+        return CHINESE_DIGITS[text[-1]]
+    tens, _, ones = text.partition("十")
+    value = CHINESE_DIGITS[tens] * 10 if tens else 10
+    if ones:
+        value += CHINESE_DIGITS[ones]
+    return value
+
+
+def normalize_equipment_id(equipment_id: str) -> str:
+    """将设备编号归一化，例如 "1号空压机" -> "1"，无法识别时返回去空白后的原文"""
+    text = str(equipment_id).strip()
+    match = _ARABIC_PATTERN.search(text)
+    if match:
+        return str(int(match.group()))
+    match = _CHINESE_PATTERN.search(text)
+    if match:
+        return str(chinese_to_int(match.group()))
+    return text
@@ -0,0 +1,293 @@
+"""
+空压机时序历史库（内存映射列存）
+按 设备/日期 分区，每个分区一个时间索引列（ts.f64，float64 秒级时间戳，单调递增）与每通道一个数据列
+（<通道>.f32，float32），各列行数一致，只追加写入：
+1. 范围查询：按日期名筛选分区，在时间索引上二分查找行号区间，数据列按行号切片
+2. 读取：列文件以 np.memmap 只读映射，切片即零拷贝视图，只有实际访问的页会被读入内存
+3. 写入：每批按分区分组，先追加数据列、最后追加时间索引；打开分区时按时间索引行数截断数据列，
+   中途崩溃留下的半行不会错位。新出现的通道补齐 NaN，缺失的通道写 NaN，早于分区末行的样本丢弃并计数
+
+1 Hz 采样、22 个通道时每台设备每天约 8 MB，多年数据也只映射查询范围内的分区
+数据由 sensor_ingestion 管道写入；HISTORY_DIR 指定目录（默认 ./data/history）
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from equipment import normalize_equipment_id
+from report_rollups import MAX_SAMPLE_GAP_SECONDS, EquipmentTotals, Rollup
+from rul_estimator import SIGNAL_SPECS
+
+# ==================== 配置 ====================
+
+DEFAULT_HISTORY_DIR = os.getenv("HISTORY_DIR") or "./data/history"
+TIME_COLUMN = "ts"
+TIME_DTYPE = np.dtype("<f8")
+VALUE_DTYPE = np.dtype("<f4")
+MAX_OPEN_WRITERS = 64           # 同时打开写入的分区数上限（超出时关闭最久未写入的）
+HEALTH_TREND_DAYS = 30
+
+# 健康评分使用的退化信号 -> 历史库通道名
+HEALTH_CHANNELS = {"vibration": "vibration", "temperature": "exhaust_temperature", "oil_quality": "oil_quality"}
+
+
+def day_key(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+# ==================== 查询结果 ====================
+
+@dataclass
+class HistorySlice:
+    """一个分区内命中范围的行：timestamps 与 columns 中的数组均为内存映射的零拷贝视图"""
+    equipment_id: str
+    day: str
+    timestamps: np.ndarray
+    columns: dict
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+def _column(part: HistorySlice, channel: str, fill: float) -> np.ndarray:
+    """取通道为 float64 数组，缺失值与缺失通道用 fill 填充"""
+    values = part.columns.get(channel)
+    if values is None:
+        return np.full(len(part), fill)
+    return np.nan_to_num(np.asarray(values, dtype=np.float64), nan=fill)
+
+
+# ==================== 分区写入 ====================
+
+class PartitionWriter:
+    """一个分区的追加写入器，持有各列的文件句柄"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        time_path = os.path.join(directory, f"{TIME_COLUMN}.f64")
+        self.rows = os.path.getsize(time_path) // TIME_DTYPE.itemsize if os.path.exists(time_path) else 0
+        self.last_timestamp = None
+        if self.rows:
+            with open(time_path, "rb") as f:
+                f.seek((self.rows - 1) * TIME_DTYPE.itemsize)
+                self.last_timestamp = float(np.frombuffer(f.read(TIME_DTYPE.itemsize), TIME_DTYPE)[0])
+        self.files = {}
+        for name in os.listdir(directory):
+            channel, extension = os.path.splitext(name)
+            if extension == ".f32":
+                self.files[channel] = self._open(channel, truncate=True)
+        self.time_file = open(time_path, "ab")
+
+    def _open(self, channel: str, truncate: bool = False):
+        f = open(os.path.join(self.directory, f"{channel}.f32"), "ab")
+        if truncate:
+            f.truncate(self.rows * VALUE_DTYPE.itemsize)
+        return f
+
+    def append(self, timestamps: np.ndarray, columns: dict):
+        """追加若干行（timestamps 已按时间排序且晚于分区末行），columns 为 通道名 -> 数组"""
+        for channel in columns:
+            if channel not in self.files:
+                self.files[channel] = self._open(channel)
+                np.full(self.rows, np.nan, dtype=VALUE_DTYPE).tofile(self.files[channel])
+        missing = np.full(len(timestamps), np.nan, dtype=VALUE_DTYPE)
+        for channel, f in self.files.items():
+            values = columns.get(channel)
+            (missing if values is None else np.asarray(values, dtype=VALUE_DTYPE)).tofile(f)
+            f.flush()
+        # 时间索引最后写入：读取方以时间索引行数为准
+        np.asarray(timestamps, dtype=TIME_DTYPE).tofile(self.time_file)
+        self.time_file.flush()
+        self.rows += len(timestamps)
+        self.last_timestamp = float(timestamps[-1])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.time_file.close()
+
+
+# ==================== 历史库 ====================
+
+class HistoryStore:
+    """按 设备/日期 分区的内存映射列存"""
+
+    def __init__(self, root: str = DEFAULT_HISTORY_DIR):
+        self.root = root
+        self._writers = OrderedDict()
+        self._write_lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_dropped = 0
+
+    # -------------------- 写入 --------------------
+
+    def _writer(self, equipment_id: str, day: str) -> PartitionWriter:
+        key = (equipment_id, day)
+        writer = self._writers.get(key)
+        if writer is None:
+            writer = self._writers[key] = PartitionWriter(os.path.join(self.root, equipment_id, day))
+            if len(self._writers) > MAX_OPEN_WRITERS:
+                self._writers.popitem(last=False)[1].close()
+        else:
+            self._writers.move_to_end(key)
+        return writer
+
+    def append(self, equipment_id: str, timestamps, columns: dict):
+        """追加一台设备的若干行，columns 为 通道名 -> 与 timestamps 等长的序列，可跨日"""
+        key = normalize_equipment_id(equipment_id)
+        timestamps = np.asarray(timestamps, dtype=TIME_DTYPE)
+        columns = {channel: np.asarray(values, dtype=VALUE_DTYPE) for channel, values in columns.items()}
+        order = np.argsort(timestamps, kind="stable")
+        if not np.all(order == np.arange(len(order))):
+            timestamps = timestamps[order]
+            columns = {channel: values[order] for channel, values in columns.items()}
+        days = [day_key(ts) for ts in (timestamps[0], timestamps[-1])] if len(timestamps) else []
+        with self._write_lock:
+            if days and days[0] == days[1]:
+                self._append_partition(key, days[0], timestamps, columns)
+                return
+            day_of_row = np.array([day_key(ts) for ts in timestamps])
+            for day in dict.fromkeys(day_of_row):
+                mask = day_of_row == day
+                self._append_partition(key, day, timestamps[mask],
+                                       {channel: values[mask] for channel, values in columns.items()})
+
+    def _append_partition(self, equipment_id: str, day: str, timestamps: np.ndarray, columns: dict):
+        writer = self._writer(equipment_id, day)
+        if writer.last_timestamp is not None:
+            keep = timestamps > writer.last_timestamp
+            if not keep.all():
+                self.rows_dropped += int((~keep).sum())
+                timestamps = timestamps[keep]
+                columns = {channel: values[keep] for channel, values in columns.items()}
+        if len(timestamps):
+            writer.append(timestamps, columns)
+            self.rows_written += len(timestamps)
+
+    def close(self):
+        with self._write_lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
+
+    # -------------------- 查询 --------------------
+
+    def equipment_ids(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def partitions(self, equipment_id: str, start: float, end: float) -> list:
+        """与 [start, end) 相交的分区日期（分区目录名为 YYYY-MM-DD，按字符串比较即可筛选）"""
+        directory = os.path.join(self.root, normalize_equipment_id(equipment_id))
+        if not os.path.isdir(directory):
+            return []
+        first, last = day_key(start), day_key(end - 1e-6)
+        return sorted(day for day in os.listdir(directory) if first <= day <= last)
+
+    def _map(self, path: str, dtype: np.dtype, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+    def query(self, equipment_id: str, start: float, end: float, channels=None):
+        """逐分区产出 [start, end) 内的 HistorySlice，channels 为 None 时包含分区内全部通道"""
+        key = normalize_equipment_id(equipment_id)
+        for day in self.partitions(key, start, end):
+            directory = os.path.join(self.root, key, day)
+            time_path = os.path.join(directory, f"{TIME_COLUMN}.f64")
+            if not os.path.exists(time_path):
+                continue
+            rows = os.path.getsize(time_path) // TIME_DTYPE.itemsize
+            timestamps = self._map(time_path, TIME_DTYPE, rows)
+            lo, hi = np.searchsorted(timestamps, (start, end), side="left")
+            if lo >= hi:
+                continue
+            names = channels if channels is not None else [
+                os.path.splitext(name)[0] for name in os.listdir(directory) if name.endswith(".f32")
+            ]
+            columns = {}
+            for channel in names:
+                path = os.path.join(directory, f"{channel}.f32")
+                if os.path.exists(path):
+                    columns[channel] = self._map(path, VALUE_DTYPE, rows)[lo:hi]
+            yield HistorySlice(key, day, timestamps[lo:hi], columns)
+
+    # -------------------- 分析 --------------------
+
+    def energy_totals(self, equipment_id: str, start: float, end: float) -> EquipmentTotals:
+        """[start, end) 内的产气、能耗、运行与故障累计，积分口径与 report_rollups 一致"""
+        totals = EquipmentTotals()
+        previous_ts = None
+        previous_fault = False
+        channels = ("flow", "power", "load_ratio", "running", "fault")
+        for part in self.query(equipment_id, start, end, channels):
+            ts = np.asarray(part.timestamps)
+            dt = np.diff(ts, prepend=ts[0] if previous_ts is None else previous_ts)
+            dt[(dt <= 0) | (dt > MAX_SAMPLE_GAP_SECONDS)] = 0.0
+            running = _column(part, "running", 1.0) > 0.5
+            fault = _column(part, "fault", 0.0) > 0.5
+            run_dt = np.where(running, dt, 0.0)
+
+            totals.observed_seconds += float(dt.sum())
+            totals.run_seconds += float(run_dt.sum())
+            totals.load_seconds += float((_column(part, "load_ratio", 0.0) / 100.0 * run_dt).sum())
+            totals.air_m3 += float((_column(part, "flow", 0.0) * run_dt).sum() / 60.0)
+            totals.energy_kwh += float((_column(part, "power", 0.0) * dt).sum() / 3600.0)
+            totals.fault_seconds += float(np.where(fault, dt, 0.0).sum())
+            totals.faults += int((fault & ~np.concatenate(([previous_fault], fault[:-1]))).sum())
+            previous_ts = float(ts[-1])
+            previous_fault = bool(fault[-1])
+        return totals
+
+    def energy_rollup(self, label: str, start: float, end: float, equipment_ids=None) -> Rollup:
+        """任意时间范围的能耗汇总，返回 Rollup 以复用报告格式"""
+        rollup = Rollup(label)
+        for equipment_id in equipment_ids or self.equipment_ids():
+            totals = self.energy_totals(equipment_id, start, end)
+            if totals.observed_seconds > 0:
+                rollup.equipment[normalize_equipment_id(equipment_id)] = totals
+        return rollup
+
+    def daily_means(self, equipment_id: str, channel: str, start: float, end: float) -> list:
+        """[start, end) 内每个分区的通道均值，返回 [(日期, 均值)]"""
+        means = []
+        for part in self.query(equipment_id, start, end, (channel,)):
+            values = part.columns.get(channel)
+            if values is not None and np.isfinite(values).any():
+                means.append((part.day, float(np.nanmean(values))))
+        return means
+
+    # -------------------- 工具文本 --------------------
+
+    def describe_health(self, equipment_id: str, days: int = HEALTH_TREND_DAYS, now: float | None = None) -> str:
+        """get_health_score 工具的返回文本：按最近一天的退化信号均值评分，并给出近 days 天趋势"""
+        end = time.time() if now is None else now
+        start = end - days * 86400
+        trends = []
+        progress = 0.0
+        history_days = 0
+        for spec in SIGNAL_SPECS:
+            means = self.daily_means(equipment_id, HEALTH_CHANNELS[spec.name], start, end)
+            if not means:
+                continue
+            history_days = max(history_days, len(means))
+            first, last = means[0][1], means[-1][1]
+            progress = max(progress, min(max((last - spec.nominal) / (spec.limit - spec.nominal), 0.0), 1.0))
+            trends.append(f"{spec.label} {first:.1f}→{last:.1f}{spec.unit}")
+        if not trends:
+            return f"设备 {equipment_id} 暂无历史运行数据，无法评估健康状态，请确认设备编号或数据接入状态"
+        score = round(100 * (1.0 - progress))
+        level = "状态良好" if score >= 80 else "需要关注" if score >= 60 else "状态较差，建议安排检修"
+        return (f"设备 {equipment_id} 健康评分：{score}分，{level}；近{days}天趋势：{'，'.join(trends)}"
+                f"（基于 {history_days} 天历史数据）")
+
+
+# 全局历史库实例，供三种实现的工具共享
+history_store = HistoryStore()
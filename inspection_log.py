@@ -0,0 +1,191 @@
+"""
+空压站巡检记录库
+基于 SQLite 的只追加巡检记录存储，支持批量写入，按设备编号+时间、异常+时间建立索引
+"最近 10 次 3 号机巡检"、"本周所有异常发现"等查询只走索引，多年数据下仍为毫秒级
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from equipment import normalize_equipment_id
+
+# ==================== 配置 ====================
+
+DEFAULT_DB_PATH = os.getenv("INSPECTION_LOG_PATH") or "./data/inspection_log.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inspections (
+    id INTEGER PRIMARY KEY,
+    equipment_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    abnormal INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    source TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_inspections_equipment_ts ON inspections (equipment_id, ts);
+CREATE INDEX IF NOT EXISTS idx_inspections_abnormal_ts ON inspections (ts) WHERE abnormal = 1;
+CREATE TRIGGER IF NOT EXISTS inspections_no_update BEFORE UPDATE ON inspections
+BEGIN SELECT RAISE(ABORT, 'inspections is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS inspections_no_delete BEFORE DELETE ON inspections
+BEGIN SELECT RAISE(ABORT, 'inspections is append-only'); END;
+"""
+
+_NORMAL_PATTERN = re.compile(r"(无|未发现|没有)[^，。；,;]{0,6}(异常|故障|泄漏|问题)|^\s*(设备)?正常")
+_ABNORMAL_PATTERN = re.compile(r"异常|故障|泄漏|漏油|漏气|超标|报警|损坏|磨损|锈蚀|裂纹|松动|过高|过低|油渍")
+
+
+def classify_result(result: str) -> bool:
+    """根据巡检结论文本判定是否异常"""
+    text = _NORMAL_PATTERN.sub("", result)
+    return bool(_ABNORMAL_PATTERN.search(text))
+
+
+@dataclass
+class InspectionEntry:
+    """一条巡检记录"""
+    id: int
+    equipment_id: str
+    timestamp: float
+    abnormal: bool
+    result: str
+    source: str
+
+    def describe(self) -> str:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.timestamp))
+        flag = "异常" if self.abnormal else "正常"
+        return f"[{when}] 设备 {self.equipment_id}（{flag}）：{self.result}"
+
+
+# ==================== 记录库 ====================
+
+class InspectionLog:
+    """只追加的巡检记录库"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self.version = 0                # 每次写入加 1，供答案缓存判断数据是否变化
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # 首次使用时才创建数据库文件
+        if self._conn is None:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row(equipment_id: str, result: str, timestamp: float | None = None,
+             abnormal: bool | None = None, source: str = "") -> tuple:
+        return (
+            normalize_equipment_id(equipment_id),
+            time.time() if timestamp is None else timestamp,
+            int(classify_result(result) if abnormal is None else abnormal),
+            result,
+            source,
+        )
+
+    def append(self, equipment_id: str, result: str, timestamp: float | None = None,
+               abnormal: bool | None = None, source: str = "") -> InspectionEntry:
+        """追加一条记录，abnormal 未指定时根据结论文本自动判定"""
+        row = self._row(equipment_id, result, timestamp, abnormal, source)
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO inspections (equipment_id, ts, abnormal, result, source) VALUES (?, ?, ?, ?, ?)",
+                row,
+            )
+            self.version += 1
+        return InspectionEntry(cursor.lastrowid, row[0], row[1], bool(row[2]), row[3], row[4])
+
+    def append_many(self, records) -> int:
+        """批量追加记录（单个事务），records 为 (equipment_id, result[, timestamp[, abnormal[, source]]]) 序列"""
+        rows = [self._row(*record) for record in records]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO inspections (equipment_id, ts, abnormal, result, source) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.version += 1
+        return len(rows)
+
+    def _query(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [InspectionEntry(row[0], row[1], row[2], bool(row[3]), row[4], row[5]) for row in rows]
+
+    def latest(self, equipment_id: str, limit: int = 10) -> list:
+        """指定设备最近 limit 条记录，按时间倒序"""
+        # SQLite 的 LIMIT -1 表示不限条数，负数按 0 处理
+        return self._query(
+            "SELECT id, equipment_id, ts, abnormal, result, source FROM inspections "
+            "WHERE equipment_id = ? ORDER BY ts DESC LIMIT ?",
+            (normalize_equipment_id(equipment_id), max(0, limit)),
+        )
+
+    def abnormal_between(self, start: float, end: float | None = None, limit: int = 100) -> list:
+        """时间范围内最近 limit 条异常记录，按时间倒序"""
+        return self._query(
+            "SELECT id, equipment_id, ts, abnormal, result, source FROM inspections "
+            "WHERE abnormal = 1 AND ts >= ? AND ts < ? ORDER BY ts DESC LIMIT ?",
+            (start, time.time() + 1 if end is None else end, max(0, limit)),
+        )
+
+    def count_abnormal_between(self, start: float, end: float | None = None) -> int:
+        """时间范围内的异常记录总数（走异常+时间索引）"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM inspections WHERE abnormal = 1 AND ts >= ? AND ts < ?",
+                (start, time.time() + 1 if end is None else end),
+            ).fetchone()[0]
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM inspections").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -------------------- 工具文本 --------------------
+
+    def record(self, equipment_id: str, result: str) -> str:
+        """record_inspection_result 工具的返回文本"""
+        entry = self.append(equipment_id, result, source="agent")
+        flag = "异常" if entry.abnormal else "正常"
+        return f"已记录设备 {equipment_id} 的巡检结果：{result}（记录编号 {entry.id}，判定：{flag}）"
+
+    def describe_latest(self, equipment_id: str, limit: int = 10) -> str:
+        """query_inspection_records 工具的返回文本"""
+        entries = self.latest(equipment_id, limit)
+        if not entries:
+            return f"设备 {equipment_id} 暂无巡检记录"
+        lines = "\n".join(entry.describe() for entry in entries)
+        return f"设备 {equipment_id} 最近 {len(entries)} 次巡检记录：\n{lines}"
+
+    def describe_abnormal(self, days: int = 7) -> str:
+        """get_abnormal_inspections 工具的返回文本"""
+        start, end = time.time() - days * 86400, time.time() + 1
+        entries = self.abnormal_between(start, end)
+        if not entries:
+            return f"近 {days} 天巡检未发现异常"
+        lines = "\n".join(entry.describe() for entry in entries)
+        total = self.count_abnormal_between(start, end)
+        if total > len(entries):
+            return f"近 {days} 天共 {total} 条异常巡检发现，以下为最近 {len(entries)} 条：\n{lines}"
+        return f"近 {days} 天共 {total} 条异常巡检发现：\n{lines}"
+
+
+# 全局巡检记录库实例，供三种实现的工具共享
+inspection_log = InspectionLog()
@@ -0,0 +1,56 @@
+"""
+本地关键词路由
+不调用模型，按关键词加权打分预测问题所属的专业智能体，微秒级返回
+用于投机执行时提前启动专业智能体；置信度不足时由调用方放弃预测
+"""
+
+# ==================== 关键词表 ====================
+
+# 权重越高越能单独决定归属；"报告"、"异常"等多个智能体共用的词给低权重
+KEYWORDS = {
+    "dispatch_agent": {
+        "启动": 3, "停止": 3, "启停": 3, "开机": 3, "停机": 2, "关机": 3,
+        "负荷": 3, "用气": 3, "供气": 2, "调度": 2, "压力": 1,
+    },
+    "maintenance_agent": {
+        "故障": 3, "诊断": 3, "维修": 3, "修理": 3, "备件": 3, "配件": 3,
+        "订购": 3, "更换": 2, "损坏": 2, "步骤": 1,
+    },
+    "energy_analysis_agent": {
+        "能耗": 3, "能效": 3, "节能": 3, "耗电": 3, "电费": 2, "用电": 2, "功率": 1,
+    },
+    "health_agent": {
+        "健康": 3, "评分": 2, "预测": 3, "维护": 2, "实时": 3, "寿命": 3, "状态": 1,
+    },
+    "report_agent": {
+        "日报": 3, "月报": 3, "运营": 3, "建议": 2, "优化": 1, "报告": 1, "状况": 1,
+    },
+    "inspection_agent": {
+        "巡检": 3, "视觉": 3, "检测": 2, "记录": 2, "异常": 1, "图像": 2,
+    },
+}
+
+
+# ==================== 预测 ====================
+
+def score_agents(question: str) -> dict:
+    """各专业智能体的关键词得分，只包含得分大于 0 的智能体"""
+    scores = {}
+    for agent_name, keywords in KEYWORDS.items():
+        score = sum(weight for keyword, weight in keywords.items() if keyword in question)
+        if score:
+            scores[agent_name] = score
+    return scores
+
+
+def predict_agent(question: str) -> tuple:
+    """预测问题所属的专业智能体
+
+    Returns:
+        (agent_name, confidence)：confidence 为最高得分占全部得分的比例，未命中任何关键词时为 (None, 0.0)
+    """
+    scores = score_agents(question)
+    if not scores:
+        return None, 0.0
+    agent_name = max(scores, key=scores.get)
+    return agent_name, scores[agent_name] / sum(scores.values())
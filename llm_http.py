@@ -0,0 +1,63 @@
+"""
+模型请求 HTTP 客户端
+三种实现的模型客户端共用同一个 httpx 客户端构造入口，统一挂载用量统计钩子与请求策略（重试、截止时间、对冲）
+
+连接池传输在首次请求时才创建，并共用一个 SSL 上下文：httpcore（及其导入的 trio）与 CA 证书加载
+不再计入启动耗时，也不再随智能体数量重复
+"""
+
+import ssl
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+
+from rate_limiter import model_limiter
+from request_policy import PolicyTransport, RequestPolicy
+from token_usage import usage_tracker
+
+# 与 openai 默认值一致的连接池设置（传入自定义 transport 时客户端不再使用 limits 参数）
+CONNECTION_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+# 请求策略（见 request_policy.py），各模型客户端需设置 max_retries=0 关闭 SDK 自带重试
+REQUEST_POLICY = RequestPolicy.from_env()
+SDK_MAX_RETRIES = 0
+
+
+_ssl_context = None
+
+
+def shared_ssl_context() -> ssl.SSLContext:
+    """所有模型客户端共用的 SSL 上下文（加载 CA 证书约 20ms，只做一次）"""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
+
+
+class LazyTransport(httpx.AsyncBaseTransport):
+    """首次请求时才创建的连接池传输"""
+
+    def __init__(self):
+        self._transport = None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._transport is None:
+            self._transport = httpx.AsyncHTTPTransport(verify=shared_ssl_context(), limits=CONNECTION_LIMITS)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        if self._transport is not None:
+            await self._transport.aclose()
+
+
+def create_http_client(label: str = "", shared_limiter: bool = True) -> DefaultAsyncHttpxClient:
+    """创建挂载了用量统计钩子与请求策略的异步 HTTP 客户端（保留 openai 默认的超时设置）
+
+    Args:
+        label: 用量统计与延迟统计标签，通常为智能体名称
+        shared_limiter: 是否经过全局限流器；限流器的排队 future 绑定主事件循环且不是线程安全的，
+            在其他线程的事件循环中使用的客户端（调度控制回路）需设为 False
+    """
+    limiter = model_limiter if shared_limiter else None
+    transport = PolicyTransport(LazyTransport(), REQUEST_POLICY, label, limiter=limiter)
+    return DefaultAsyncHttpxClient(transport=transport, event_hooks={"response": [usage_tracker.hook(label)]})
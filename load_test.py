@@ -0,0 +1,243 @@
+"""
+开环压测
+按泊松过程（指数分布的到达间隔）发起请求，到达时间与请求完成无关；超过并发上限的请求在本地排队，
+排队时间计入延迟。按时间窗口输出吞吐、P50/P95/P99、错误率、排队延迟与模型限流器排队深度，
+逐步提高到达速率即可找到各实现的饱和点。
+
+用法：
+    python load_test.py --impl openai --rate 5 --duration 60 --concurrency 32 --mock --mock-delay 0.3
+不加 --mock 时使用 OPENAI_BASE_URL 等环境变量指定的模型服务
+
+AgentScope 与 AutoGen 实现的智能体（及其记忆/团队状态）是模块级单例，不能并发运行，
+压测时并发度固定为 1，每个请求结束后清空记忆/重置团队，使每个请求相当于一个独立会话；
+OpenAI Agents SDK 实现不带会话运行，可按 --concurrency 并发
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+from bench_stats import percentile
+from rate_limiter import model_limiter
+from request_policy import policy_stats
+from test_cases import TEST_CASES
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 实现名 -> (目录, 模块名, 最大并发)
+IMPLEMENTATIONS = {
+    "agentscope": ("agent-scope", "agentscope_multi_agents", 1),
+    "autogen": ("autogen", "autogen_multi_agents", 1),
+    "openai": ("openai-agents-sdk", "openai_multi_agents", None),
+}
+SAMPLE_INTERVAL = 0.5       # 排队深度采样间隔（秒）
+
+
+# ==================== 被测实现 ====================
+
+def load_runner(impl: str):
+    """导入实现模块（需在模型服务环境变量设置之后），返回 async run(question)"""
+    directory, module_name, _ = IMPLEMENTATIONS[impl]
+    sys.path.insert(0, os.path.join(ROOT, directory))
+    module = importlib.import_module(module_name)
+
+    if impl == "agentscope":
+        for agent in (module.main_agent, *module.SUB_AGENTS.values()):
+            agent.set_console_output_enabled(False)
+
+        async def run(question: str):
+            try:
+                return await module.run_turn(question)
+            finally:
+                await module.main_agent.memory.clear()
+                await module.sub_agent_memory.clear()
+        return run
+
+    if impl == "autogen":
+        async def run(question: str):
+            try:
+                return await module.run_turn(question, console=False)
+            finally:
+                await module.team.reset()
+        return run
+
+    return module.run_turn
+
+
+# ==================== 压测 ====================
+
+@dataclass
+class RequestRecord:
+    """单个请求的时间线（相对压测开始的秒数）"""
+    arrived: float
+    started: float = 0.0
+    finished: float = 0.0
+    error: str | None = None
+
+    @property
+    def queueing(self) -> float:
+        return self.started - self.arrived
+
+    @property
+    def latency(self) -> float:
+        return self.finished - self.arrived
+
+
+@dataclass
+class DepthSample:
+    """排队深度采样"""
+    at: float
+    local_queue: int        # 等待并发名额的请求数
+    in_flight: int          # 正在运行的请求数
+    model_queue: int        # 模型限流器排队深度
+
+
+async def run_load(run, questions: list, rate: float, duration: float, concurrency: int,
+                   seed: int | None = None) -> tuple:
+    """开环发起请求：到达间隔服从指数分布，与请求完成情况无关
+
+    Returns:
+        (请求记录列表, 排队深度采样列表, 总耗时)
+    """
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    records = []
+    samples = []
+    tasks = []
+    waiting = 0
+    in_flight = 0
+    start = time.perf_counter()
+
+    def now() -> float:
+        return time.perf_counter() - start
+
+    async def handle(question: str, record: RequestRecord):
+        nonlocal waiting, in_flight
+        waiting += 1
+        async with semaphore:
+            waiting -= 1
+            in_flight += 1
+            record.started = now()
+            try:
+                await run(question)
+            except Exception as exc:
+                record.error = f"{type(exc).__name__}: {exc}"
+            finally:
+                record.finished = now()
+                in_flight -= 1
+
+    async def sample():
+        while True:
+            samples.append(DepthSample(now(), waiting, in_flight, model_limiter.queue_depth))
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    sampler = asyncio.create_task(sample())
+    next_arrival = rng.expovariate(rate)
+    while next_arrival < duration:
+        delay = next_arrival - now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        record = RequestRecord(arrived=now())
+        records.append(record)
+        tasks.append(asyncio.create_task(handle(rng.choice(questions), record)))
+        next_arrival += rng.expovariate(rate)
+    await asyncio.gather(*tasks)
+    sampler.cancel()
+    return records, samples, now()
+
+
+# ==================== 报告 ====================
+
+def format_window(title: str, records: list, samples: list, seconds: float) -> str:
+    """一个时间窗口（或全程）的汇总行：按完成时间统计吞吐、延迟与错误"""
+    latencies = [r.latency for r in records if r.error is None]
+    queueing = [r.queueing for r in records]
+    errors = sum(1 for r in records if r.error is not None)
+    error_rate = errors / len(records) if records else 0.0
+    return (f"{title} 完成 {len(records)}，吞吐 {len(records) / seconds if seconds else 0:.2f}/s，"
+            f"延迟 P50 {percentile(latencies, 50):.2f}s / P95 {percentile(latencies, 95):.2f}s / "
+            f"P99 {percentile(latencies, 99):.2f}s，错误率 {error_rate:.1%}，"
+            f"排队 平均 {sum(queueing) / len(queueing) if queueing else 0:.2f}s / "
+            f"最大 {max(queueing, default=0.0):.2f}s，"
+            f"本地排队峰值 {max((s.local_queue for s in samples), default=0)}，"
+            f"模型排队峰值 {max((s.model_queue for s in samples), default=0)}")
+
+
+def print_report(records: list, samples: list, elapsed: float, interval: float, rate: float):
+    """按时间窗口与全程输出压测结果"""
+    print("=" * 60)
+    print("按时间窗口（按完成时间归入窗口）")
+    print("=" * 60)
+    window_start = 0.0
+    while window_start < elapsed:
+        window_end = window_start + interval
+        window_records = [r for r in records if window_start <= r.finished < window_end]
+        window_samples = [s for s in samples if window_start <= s.at < window_end]
+        title = f"[{window_start:6.1f}s-{window_end:6.1f}s]"
+        print(format_window(title, window_records, window_samples, min(window_end, elapsed) - window_start))
+        window_start = window_end
+
+    print()
+    print("=" * 60)
+    print("全程汇总")
+    print("=" * 60)
+    print(f"请求数：{len(records)}，目标到达速率 {rate:.2f}/s，实际到达速率 "
+          f"{len(records) / max(r.arrived for r in records) if len(records) > 1 else 0:.2f}/s")
+    print(format_window("全程", records, samples, elapsed))
+    errors = {}
+    for record in records:
+        if record.error is not None:
+            errors[record.error] = errors.get(record.error, 0) + 1
+    for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+        print(f"  错误 {count} 次：{error[:120]}")
+
+
+# ==================== 命令行入口 ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="多智能体系统开环压测")
+    parser.add_argument("--impl", choices=sorted(IMPLEMENTATIONS), default="openai")
+    parser.add_argument("--rate", type=float, default=2.0, help="平均到达速率（请求/秒）")
+    parser.add_argument("--duration", type=float, default=30.0, help="发起请求的时长（秒），之后等待在途请求完成")
+    parser.add_argument("--concurrency", type=int, default=16, help="同时运行的请求数上限")
+    parser.add_argument("--interval", type=float, default=5.0, help="报告时间窗口（秒）")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--mock", action="store_true", help="启动本地模拟模型服务（见 mock_llm.py）")
+    parser.add_argument("--mock-delay", type=float, default=0.3, help="模拟服务每个请求的基础延迟（秒）")
+    parser.add_argument("--mock-slow-rate", type=float, default=0.0)
+    parser.add_argument("--mock-max-concurrency", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mock:
+        from mock_llm import MockBehavior, start_mock_server
+        server = start_mock_server(MockBehavior(delay=args.mock_delay, slow_rate=args.mock_slow_rate,
+                                                max_concurrency=args.mock_max_concurrency, seed=args.seed))
+        os.environ.update(OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY="mock", OPENAI_MODEL_NAME="mock")
+
+    max_concurrency = IMPLEMENTATIONS[args.impl][2]
+    concurrency = min(args.concurrency, max_concurrency) if max_concurrency else args.concurrency
+    if concurrency != args.concurrency:
+        print(f"{args.impl} 实现的智能体为模块级单例，并发度限制为 {concurrency}")
+
+    run = load_runner(args.impl)
+    questions = [case["question"] for case in TEST_CASES]
+    print(f"开环压测：实现 {args.impl}，到达速率 {args.rate}/s，时长 {args.duration}s，并发上限 {concurrency}")
+    records, samples, elapsed = asyncio.run(
+        run_load(run, questions, args.rate, args.duration, concurrency, args.seed)
+    )
+    if not records:
+        print("时长内没有请求到达")
+        return
+    print_report(records, samples, elapsed, args.interval, args.rate)
+
+    print(policy_stats.describe())
+    print(model_limiter.describe())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+本地模拟模型服务
+OpenAI 兼容的 /v1/chat/completions 接口，不依赖外部服务即可运行三种实现的测试脚本与压测
+- 主调度智能体：按本地关键词路由调用对应的转发/移交工具
+- 专业智能体：先调用自己的第一个工具，拿到工具结果后给出带 TERMINATE 的文本回复
+- 可注入延迟、慢请求、429、5xx 与并发上限，用于验证重试、对冲、限流与熔断
+
+用法：python mock_llm.py --port 18080 --delay 0.3 --slow-rate 0.05 --slow-delay 5
+然后设置 OPENAI_BASE_URL=http://127.0.0.1:18080/v1 OPENAI_API_KEY=mock OPENAI_MODEL_NAME=mock
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from keyword_router import predict_agent
+from tool_budget import FETCH_TOOL
+
+# ==================== 故障注入配置 ====================
+
+@dataclass
+class MockBehavior:
+    """模拟服务的延迟与故障注入参数"""
+    delay: float = 0.0              # 每个请求的基础延迟（秒）
+    slow_rate: float = 0.0          # 慢请求比例
+    slow_delay: float = 5.0         # 慢请求的额外延迟（秒）
+    rate_limit_rate: float = 0.0    # 返回 429 的比例
+    error_rate: float = 0.0         # 返回 500 的比例
+    max_concurrency: int = 0        # 同时处理的请求数上限，超出时返回 429（0 表示不限制）
+    seed: int | None = None
+
+
+HANDOFF_PREFIXES = ("transfer_to_", "handoff_to_")
+
+
+# ==================== 回复生成 ====================
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return content or ""
+
+
+def _is_handoff_result(message: dict) -> bool:
+    # OpenAI Agents SDK 的移交结果为 {"assistant": ...}，AutoGen 为 "Transferred to ..."
+    content = _text(message.get("content"))
+    return '"assistant"' in content or content.startswith("Transferred to")
+
+
+def _tool_call(name: str, arguments: dict) -> dict:
+    return {
+        "id": "call_" + uuid.uuid4().hex[:12],
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)},
+    }
+
+
+def _default_arguments(schema: dict) -> dict:
+    arguments = {}
+    for name, spec in (schema.get("parameters") or {}).get("properties", {}).items():
+        arguments[name] = "1" if spec.get("type") == "string" else 1
+    return arguments
+
+
+def build_reply(body: dict) -> dict:
+    """根据请求生成一条 assistant 消息"""
+    messages = body.get("messages", [])
+    tools = {tool["function"]["name"]: tool["function"] for tool in body.get("tools", [])}
+    handoffs = [name for name in tools if name.startswith(HANDOFF_PREFIXES)]
+    # fetch_tool_output 只用于取回被压缩的输出，不作为专业智能体的默认工具
+    own_tools = sorted(name for name in tools if name not in handoffs and name != FETCH_TOOL)
+    system = _text(messages[0].get("content")) if messages and messages[0]["role"] == "system" else ""
+    user_messages = [m for m in messages if m["role"] == "user"]
+    question = _text(user_messages[-1]["content"]) if user_messages else ""
+    last = messages[-1] if messages else {}
+
+    if last.get("role") == "tool" and not _is_handoff_result(last):
+        return {"role": "assistant", "content": f"已完成。{_text(last.get('content'))[:200]} TERMINATE"}
+    if "主调度" in system and handoffs:
+        agent_name, _ = predict_agent(question)
+        target = next((name for name in handoffs if agent_name and name.endswith(agent_name)), None)
+        if target is None:
+            return {"role": "assistant", "content": "您好，我是空压站主调度智能体，请描述您的问题。TERMINATE"}
+        arguments = {"task": question} if target.startswith("handoff_to_") else {}
+        return {"role": "assistant", "content": None, "tool_calls": [_tool_call(target, arguments)]}
+    if own_tools:
+        name = own_tools[0]
+        return {"role": "assistant", "content": None,
+                "tool_calls": [_tool_call(name, _default_arguments(tools[name]))]}
+    return {"role": "assistant", "content": "您好 TERMINATE"}
+
+
+# ==================== HTTP 服务 ====================
+
+class MockLLMServer(ThreadingHTTPServer):
+    """模拟模型服务，记录请求数"""
+    daemon_threads = True
+
+    def __init__(self, address, behavior: MockBehavior):
+        super().__init__(address, MockLLMHandler)
+        self.behavior = behavior
+        self.random = random.Random(behavior.seed)
+        self.requests = 0
+        self.active = 0
+        self.rejected = 0           # 因超出并发上限返回 429 的次数
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple:
+        """计数并抽取本次请求的 (故障, 慢请求) 随机数"""
+        with self._lock:
+            self.requests += 1
+            return self.random.random(), self.random.random()
+
+    def enter(self) -> bool:
+        """占用一个处理名额，超出并发上限时返回 False"""
+        with self._lock:
+            if self.behavior.max_concurrency and self.active >= self.behavior.max_concurrency:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length") or 0)) or b"{}")
+        behavior = self.server.behavior
+        draw, slow_draw = self.server.draw()
+
+        if draw < behavior.rate_limit_rate or not self.server.enter():
+            self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit_error"}})
+            return
+        try:
+            if draw < behavior.rate_limit_rate + behavior.error_rate:
+                self._send_json(500, {"error": {"message": "internal error", "type": "server_error"}})
+                return
+            self._reply(body, behavior, slow_draw)
+        finally:
+            self.server.leave()
+
+    def _reply(self, body: dict, behavior: MockBehavior, slow_draw: float):
+        delay = behavior.delay
+        if slow_draw < behavior.slow_rate:
+            delay += behavior.slow_delay
+        if delay:
+            time.sleep(delay)
+
+        message = build_reply(body)
+        prompt_tokens = max(1, len(json.dumps(body, ensure_ascii=False)) // 4)
+        completion_tokens = max(1, len(json.dumps(message, ensure_ascii=False)) // 4)
+        self._send_json(200, {
+            "id": "chatcmpl-" + uuid.uuid4().hex[:12],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": 0},
+            },
+        })
+
+
+def start_mock_server(behavior: MockBehavior | None = None, host: str = "127.0.0.1",
+                      port: int = 0) -> MockLLMServer:
+    """在后台线程启动模拟服务，port=0 时自动分配端口，返回服务实例（server.base_url 为接口地址）"""
+    server = MockLLMServer((host, port), behavior or MockBehavior())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ==================== 命令行入口 ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--delay", type=float, default=0.0, help="每个请求的基础延迟（秒）")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="慢请求比例")
+    parser.add_argument("--slow-delay", type=float, default=5.0, help="慢请求的额外延迟（秒）")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="同时处理的请求数上限，超出时返回 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    behavior = MockBehavior(args.delay, args.slow_rate, args.slow_delay,
+                            args.rate_limit_rate, args.error_rate, args.max_concurrency, args.seed)
+    server = MockLLMServer((args.host, args.port), behavior)
+    print(f"模拟模型服务已启动：{server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+按智能体分级的模型配置
+路由（main_agent）只做六分类，可使用更小更快的模型；各专业智能体可单独指定模型与服务地址
+
+配置优先级（高 -> 低）：
+1. 智能体级环境变量：<AGENT>_MODEL_NAME / <AGENT>_BASE_URL / <AGENT>_API_KEY，例如 HEALTH_AGENT_MODEL_NAME
+2. 配置文件中的 agents.<agent_name>
+3. 角色级环境变量：ROUTER_*（main_agent）或 SPECIALIST_*（其余智能体）
+4. 配置文件中的 router / specialist
+5. 默认环境变量：OPENAI_MODEL_NAME / OPENAI_BASE_URL / OPENAI_API_KEY
+6. 配置文件中的 default
+
+配置文件路径由 MODEL_CONFIG_FILE 指定，JSON 格式：
+{"default": {"model_name": ..., "base_url": ..., "api_key": ...},
+ "router": {"model_name": ...}, "specialist": {...}, "agents": {"health_agent": {...}}}
+"""
+
+import json
+import os
+from dataclasses import dataclass, replace
+
+from prompt_layout import AGENT_DIRECTORY
+
+# ==================== 配置定义 ====================
+
+ROUTER_AGENT = "main_agent"
+SPECIALIST_AGENTS = tuple(name for name, _, _ in AGENT_DIRECTORY)
+ALL_AGENTS = (ROUTER_AGENT,) + SPECIALIST_AGENTS
+
+FIELDS = ("model_name", "base_url", "api_key")
+ENV_SUFFIXES = {"model_name": "MODEL_NAME", "base_url": "BASE_URL", "api_key": "API_KEY"}
+
+
+@dataclass(frozen=True)
+class AgentModelConfig:
+    """单个智能体的模型配置"""
+    model_name: str
+    base_url: str
+    api_key: str
+
+    def with_model(self, model_name: str) -> "AgentModelConfig":
+        return replace(self, model_name=model_name)
+
+
+def _from_env(prefix: str) -> dict:
+    values = {}
+    for field_name, suffix in ENV_SUFFIXES.items():
+        value = os.getenv(f"{prefix}_{suffix}")
+        if value:
+            values[field_name] = value
+    return values
+
+
+def _load_file() -> dict:
+    path = os.getenv("MODEL_CONFIG_FILE")
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve_model_config(agent_name: str, file_config: dict | None = None) -> AgentModelConfig:
+    """按优先级解析单个智能体的模型配置"""
+    if file_config is None:
+        file_config = _load_file()
+    role = "router" if agent_name == ROUTER_AGENT else "specialist"
+    layers = (
+        _from_env(agent_name.upper()),
+        file_config.get("agents", {}).get(agent_name, {}),
+        _from_env(role.upper()),
+        file_config.get(role, {}),
+        _from_env("OPENAI"),
+        file_config.get("default", {}),
+    )
+
+    values = {}
+    for field_name in FIELDS:
+        values[field_name] = next((layer[field_name] for layer in layers if layer.get(field_name)), "")
+    if not all(values.values()):
+        raise ValueError(
+            "Please set OPENAI_BASE_URL, OPENAI_API_KEY, OPENAI_MODEL_NAME via env var or code."
+        )
+    return AgentModelConfig(**values)
+
+
+def load_model_configs() -> dict:
+    """解析全部智能体的模型配置，返回 {agent_name: AgentModelConfig}"""
+    file_config = _load_file()
+    return {name: resolve_model_config(name, file_config) for name in ALL_AGENTS}
+
+
+def router_candidates() -> list:
+    """路由模型候选列表（ROUTER_MODEL_CANDIDATES，逗号分隔），用于准确率测试中对比"""
+    raw = os.getenv("ROUTER_MODEL_CANDIDATES") or ""
+    return [name.strip() for name in raw.split(",") if name.strip()]
+
+
+def describe_model_configs(configs: dict) -> list:
+    """模型信息展示行：路由模型单独一行，专业智能体按模型分组"""
+    router = configs[ROUTER_AGENT]
+    lines = [f"  路由: {router.model_name} @ {router.base_url}"]
+    groups = {}
+    for name in SPECIALIST_AGENTS:
+        config = configs[name]
+        groups.setdefault((config.model_name, config.base_url), []).append(name)
+    for (model_name, base_url), names in groups.items():
+        lines.append(f"  专业智能体: {model_name} @ {base_url}（{', '.join(names)}）")
+    return lines
@@ -4,17 +4,47 @@
 """
 
 import asyncio
+import json
 import os
+import sys
+from dataclasses import dataclass, replace
+
 from agents import (
     Agent,
+    FunctionTool,
+    OpenAIChatCompletionsModel,
+    RunHooks,
     Runner,
+    StopAtTools,
     function_tool,
     set_default_openai_api,
     set_default_openai_client,
     set_tracing_disabled,
 )
+from agents.tool_context import ToolContext
 from openai import AsyncOpenAI
 
+# 添加项目根目录到路径，以便导入共享模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import answer_cache, snapshot_versions
+from circuit_breaker import CLOSED, model_breaker
+from compressor_fleet import compressor_fleet
+from degraded_mode import answer_degraded
+from direct_return import direct_return_tool_names
+from dispatch_control import dispatch_control
+from inspection_log import inspection_log
+from llm_http import SDK_MAX_RETRIES, create_http_client
+from model_config import AgentModelConfig, describe_model_configs, load_model_configs
+from profiling import turn_profiler
+from prompt_layout import stable_tools
+from query_planner import query_planner
+from realtime_status import realtime_status
+from rul_estimator import rul_estimator
+from sensor_ingestion import sensor_ingestion
+from speculation import hold_side_effects, speculative_label, speculative_router
+from tool_budget import tool_budget
+
 # ==================== 颜色定义 ====================
 
 class Colors:
@@ -26,44 +56,60 @@ class Colors:
 
 # ==================== 模型定义 ====================
 
-BASE_URL = os.getenv("OPENAI_BASE_URL") or ""
-API_KEY = os.getenv("OPENAI_API_KEY") or ""
-MODEL_NAME = os.getenv("OPENAI_MODEL_NAME") or ""
+# 各智能体的模型配置（路由与专业智能体可分别指定，见 model_config.py）
+MODEL_CONFIGS = load_model_configs()
 
-if not BASE_URL or not API_KEY or not MODEL_NAME:
-    raise ValueError(
-        "Please set OPENAI_BASE_URL, OPENAI_API_KEY, OPENAI_MODEL_NAME via env var or code."
-    )
-client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY)
+ROUTER_CONFIG = MODEL_CONFIGS["main_agent"]
+client = AsyncOpenAI(
+    base_url=ROUTER_CONFIG.base_url,
+    api_key=ROUTER_CONFIG.api_key,
+    max_retries=SDK_MAX_RETRIES,
+    http_client=create_http_client(),
+)
 set_default_openai_client(client=client, use_for_tracing=False)
 set_default_openai_api("chat_completions")
 set_tracing_disabled(disabled=True)
 
+
+def create_model(agent_name: str, config: AgentModelConfig | None = None,
+                 label: str | None = None, shared_limiter: bool = True) -> OpenAIChatCompletionsModel:
+    """按智能体的模型配置创建模型，HTTP 客户端以智能体名称（或指定 label）标记以便分别统计用量和耗时"""
+    config = config or MODEL_CONFIGS[agent_name]
+    return OpenAIChatCompletionsModel(
+        model=config.model_name,
+        openai_client=AsyncOpenAI(
+            base_url=config.base_url,
+            api_key=config.api_key,
+            http_client=create_http_client(label or agent_name, shared_limiter),
+            max_retries=SDK_MAX_RETRIES,
+        ),
+    )
+
 # ==================== 工具定义 ====================
 
 # 空压站智能调度智能体工具
 @function_tool
 def start_compressor(compressor_id: str) -> str:
     """启动指定编号的空压机"""
-    return f"空压机 {compressor_id} 已启动"
+    return compressor_fleet.start(compressor_id).text
 
 
 @function_tool
 def stop_compressor(compressor_id: str) -> str:
     """停止指定编号的空压机"""
-    return f"空压机 {compressor_id} 已停止"
+    return compressor_fleet.stop(compressor_id).text
 
 
 @function_tool
 def adjust_load(compressor_id: str, load_percentage: int) -> str:
     """调整空压机负荷百分比（0-100）"""
-    return f"空压机 {compressor_id} 负荷已调整至 {load_percentage}%"
+    return compressor_fleet.adjust_load(compressor_id, load_percentage).text
 
 
 @function_tool
 def get_air_demand() -> str:
     """获取当前用气需求"""
-    return "当前用气需求：1200 m³/min，压力要求：0.7 MPa"
+    return compressor_fleet.describe_demand()
 
 
 # 空压机设备维修助手工具
@@ -75,13 +121,9 @@ def diagnose_fault(equipment_id: str, symptom: str) -> str:
 
 @function_tool
 def get_repair_guide(fault_type: str) -> str:
-    """获取维修指南"""
-    guides = {
-        "轴承磨损": "1. 停机断电 2. 拆卸轴承盖 3. 检查轴承状态 4. 更换轴承 5. 重新组装",
-        "温度过高": "1. 检查冷却器 2. 清理散热片 3. 检查润滑油位 4. 检查环境通风",
-        "振动异常": "1. 检查地脚螺栓 2. 检查转子平衡 3. 检查联轴器对中 4. 检查轴承间隙"
-    }
-    return guides.get(fault_type, f"未找到'{fault_type}'的维修指南，请联系技术支持")
+    """获取维修指南，fault_type 为故障类型或现象（如"排气温度高"），返回维修手册中最相关的几段"""
+    from repair_manuals import repair_manuals  # 依赖 numpy，首次调用时才导入
+    return repair_manuals.describe_guide(fault_type)
 
 
 @function_tool
@@ -94,51 +136,58 @@ def order_spare_parts(part_name: str, quantity: int) -> str:
 @function_tool
 def analyze_energy_consumption(period: str) -> str:
     """分析指定时段的能耗数据"""
-    return f"{period}能耗分析：总耗电量 15,680 kWh，平均负载率 78%，单位产气能耗 0.12 kWh/m³"
+    return query_planner.describe_energy(period)
 
 
 @function_tool
 def compare_energy_efficiency(compressor_ids: str) -> str:
     """对比多台设备的能效"""
-    return f"设备 {compressor_ids} 能效对比：1号机 0.115 kWh/m³（最优），2号机 0.128 kWh/m³，3号机 0.132 kWh/m³"
+    return query_planner.describe_efficiency(compressor_ids)
 
 
 @function_tool
 def generate_energy_report() -> str:
     """生成能耗分析报告"""
-    return "能耗分析报告：本月总能耗较上月降低5.2%，主要节能措施包括优化启停策略和负载分配"
+    return query_planner.describe_energy_report()
 
 
 # 空压设备健康智能体工具
 @function_tool
 def get_health_score(equipment_id: str) -> str:
     """获取设备健康评分（0-100）"""
-    return f"设备 {equipment_id} 健康评分：85分，状态良好，建议关注轴承温度趋势"
+    from history_store import history_store  # 依赖 numpy，首次调用时才导入
+    return history_store.describe_health(equipment_id)
 
 
 @function_tool
 def predict_maintenance(equipment_id: str) -> str:
     """预测维护需求"""
-    return f"设备 {equipment_id} 预测性维护建议：预计15天后需要更换润滑油，30天后需要检查轴承"
+    return rul_estimator.describe(equipment_id)
 
 
 @function_tool
 def get_realtime_status(equipment_id: str) -> str:
     """获取设备实时运行状态"""
-    return f"设备 {equipment_id} 实时状态：运行中，排气温度 95°C，排气压力 0.72 MPa，振动 2.3 mm/s，电流 85A"
+    return realtime_status.describe(equipment_id)
 
 
 # 空压站运营报告智能体工具
 @function_tool
-def generate_daily_report() -> str:
-    """生成日报"""
-    return "日报摘要：今日产气量 1,234,567 m³，设备平均负载率 82%，能耗成本 ¥45,678，无重大故障"
+def generate_daily_report(period: str = "") -> str:
+    """生成日报，period 为报告时段（如"昨天"、"3月"），默认今天"""
+    return query_planner.describe_report("daily", period)
 
 
 @function_tool
-def generate_monthly_report() -> str:
-    """生成月报"""
-    return "月报摘要：本月总产气量 36,789 m³，总能耗 523,456 kWh，设备可用率 98.5%，节能建议：优化2号机启停策略"
+def generate_monthly_report(period: str = "") -> str:
+    """生成月报，period 为报告时段（如"昨天"、"3月"），默认本月"""
+    return query_planner.describe_report("monthly", period)
+
+
+@function_tool
+def get_abnormal_inspections(days: int = 7) -> str:
+    """获取近若干天的异常巡检发现"""
+    return inspection_log.describe_abnormal(days)
 
 
 @function_tool
@@ -151,19 +200,48 @@ def get_optimization_suggestions() -> str:
 @function_tool
 def perform_visual_inspection(equipment_id: str) -> str:
     """执行视觉巡检"""
-    return f"设备 {equipment_id} 视觉巡检结果：外观正常，无明显泄漏，仪表读数正常，发现轻微油渍需要清理"
+    from visual_inspection import visual_inspection  # 依赖 numpy，首次调用时才导入
+    return visual_inspection.describe(equipment_id)
 
 
 @function_tool
 def detect_anomaly(equipment_id: str) -> str:
     """检测设备异常"""
-    return f"设备 {equipment_id} 异常检测：检测到轻微振动异常，建议重点关注，可能需要动平衡调整"
+    from anomaly_detector import anomaly_detector  # 依赖 numpy，首次调用时才导入
+    return anomaly_detector.describe(equipment_id)
 
 
 @function_tool
 def record_inspection_result(equipment_id: str, result: str) -> str:
     """记录巡检结果"""
-    return f"已记录设备 {equipment_id} 的巡检结果：{result}"
+    return inspection_log.record(equipment_id, result)
+
+
+@function_tool
+def query_inspection_records(equipment_id: str, limit: int = 10) -> str:
+    """查询设备最近的巡检记录"""
+    return inspection_log.describe_latest(equipment_id, limit)
+
+
+# 工具输出预算：被压缩的输出按引用取回，旁路存储中有输出时才提供给模型
+@function_tool(is_enabled=lambda context, agent: tool_budget.has_outputs)
+def fetch_tool_output(ref: str, page: int = 1) -> str:
+    """按引用分页获取被压缩的工具完整输出，ref 为压缩说明中给出的引用，page 从 1 开始"""
+    return tool_budget.fetch(ref, page)
+
+
+def budget_tool(tool: FunctionTool) -> FunctionTool:
+    """工具输出按预算压缩后再交给模型"""
+    async def invoke(context, arguments):
+        return tool_budget.apply(tool.name, await tool.on_invoke_tool(context, arguments))
+    return replace(tool, on_invoke_tool=invoke)
+
+
+def agent_tools(tools: list) -> list:
+    """专业智能体的工具列表：按名称排序；开启工具输出预算时逐个包装，并附带按需提供的 fetch_tool_output"""
+    if not tool_budget.enabled:
+        return stable_tools(tools)
+    return stable_tools([budget_tool(tool) for tool in tools] + [fetch_tool_output])
 
 
 # ==================== 智能体定义 ====================
@@ -171,7 +249,7 @@ def record_inspection_result(equipment_id: str, result: str) -> str:
 # 空压站智能调度智能体
 dispatch_agent = Agent(
     name="dispatch_agent",
-    model=MODEL_NAME,
+    model=create_model("dispatch_agent"),
     instructions="""你是空压站智能调度智能体。你的职责是基于AI算法与工业机理模型，实现对空压机组的自主启停、负荷分配及运行优化。
 
 你的核心能力：
@@ -182,18 +260,18 @@ dispatch_agent = Agent(
 
 当用户询问关于设备调度、启停、负荷分配等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    tools=[
+    tools=agent_tools([
         start_compressor,
         stop_compressor,
         adjust_load,
         get_air_demand,
-    ],
+    ]),
 )
 
 # 空压机设备维修助手
 maintenance_agent = Agent(
     name="maintenance_agent",
-    model=MODEL_NAME,
+    model=create_model("maintenance_agent"),
     instructions="""你是空压机设备维修助手。你的职责是对设备故障进行维修、排查。
 
 你的核心能力：
@@ -203,17 +281,17 @@ maintenance_agent = Agent(
 
 当用户询问关于设备故障、维修方法、备件等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    tools=[
+    tools=agent_tools([
         diagnose_fault,
         get_repair_guide,
         order_spare_parts,
-    ],
+    ]),
 )
 
 # 空压站能耗分析智能体
 energy_analysis_agent = Agent(
     name="energy_analysis_agent",
-    model=MODEL_NAME,
+    model=create_model("energy_analysis_agent"),
     instructions="""你是空压站能耗分析智能体。你的职责是通过集成多源数据与智能算法，实现对空压站运行状态的实时监控与能耗精准分析。
 
 你的核心能力：
@@ -224,17 +302,17 @@ energy_analysis_agent = Agent(
 
 当用户询问关于能耗分析、能效对比、节能报告等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    tools=[
+    tools=agent_tools([
         analyze_energy_consumption,
         compare_energy_efficiency,
         generate_energy_report,
-    ],
+    ]),
 )
 
 # 空压设备健康智能体
 health_agent = Agent(
     name="health_agent",
-    model=MODEL_NAME,
+    model=create_model("health_agent"),
     instructions="""你是空压设备健康智能体。你的职责是融合物联网与AI技术，实时监测空压设备运行状态。
 
 你的核心能力：
@@ -246,17 +324,17 @@ health_agent = Agent(
 
 当用户询问关于设备健康状态、预测性维护、实时监测等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    tools=[
+    tools=agent_tools([
         get_health_score,
         predict_maintenance,
         get_realtime_status,
-    ],
+    ]),
 )
 
 # 空压站运营报告智能体
 report_agent = Agent(
     name="report_agent",
-    model=MODEL_NAME,
+    model=create_model("report_agent"),
     instructions="""你是空压站运营报告智能体。你的职责是融合多源数据与算法模型，自动分析空压站运行状态。
 
 你的核心能力：
@@ -267,17 +345,18 @@ report_agent = Agent(
 
 当用户询问关于运营报告、优化建议等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    tools=[
+    tools=agent_tools([
         generate_daily_report,
         generate_monthly_report,
         get_optimization_suggestions,
-    ],
+        get_abnormal_inspections,
+    ]),
 )
 
 # 空压站设备巡检智能体
 inspection_agent = Agent(
     name="inspection_agent",
-    model=MODEL_NAME,
+    model=create_model("inspection_agent"),
     instructions="""你是空压站设备巡检智能体。你的职责是融合AI视觉识别与物联网技术，自动识别设备异常状态。
 
 你的核心能力：
@@ -287,17 +366,23 @@ inspection_agent = Agent(
 
 当用户询问关于设备巡检、异常检测等问题时，使用你的专业工具来响应。
 如果用户的问题超出你的职责范围，请移交给相应的专业智能体。""",
-    tools=[
+    tools=agent_tools([
         perform_visual_inspection,
         detect_anomaly,
         record_inspection_result,
-    ],
+        query_inspection_records,
+    ]),
 )
 
+# 结果即答案的工具（维修指南、日报、备件下单等）调用后直接返回工具输出，不再调用模型复述
+for specialist in (dispatch_agent, maintenance_agent, energy_analysis_agent,
+                   health_agent, report_agent, inspection_agent):
+    specialist.tool_use_behavior = StopAtTools(stop_at_tool_names=direct_return_tool_names(specialist.tools))
+
 # 主调度智能体（路由智能体）
 main_agent = Agent(
     name="main_agent",
-    model=MODEL_NAME,
+    model=create_model("main_agent"),
     instructions="""你是空压站主调度智能体，负责理解用户需求并将任务分发给相应的专业智能体。
 
 你有6个专业智能体可以协调：
@@ -321,6 +406,188 @@ main_agent = Agent(
 )
 
 
+def create_main_agent(config: AgentModelConfig | None = None) -> Agent:
+    """创建主调度智能体，可指定路由模型配置（用于对比不同路由模型）"""
+    return main_agent.clone(model=create_model("main_agent", config))
+
+
+# ==================== 投机执行 ====================
+
+_speculative_agents = {}
+
+
+def hold_tool(tool: FunctionTool) -> FunctionTool:
+    """投机副本的工具：有副作用的工具等待投机结果被采用后再执行"""
+    async def invoke(context, arguments):
+        await hold_side_effects(tool.name)
+        return await tool.on_invoke_tool(context, arguments)
+    return replace(tool, on_invoke_tool=invoke)
+
+
+def get_speculative_agent(agent_name: str) -> Agent:
+    """专业智能体的投机副本：模型请求单独标记，便于统计未命中时浪费的用量"""
+    agent = _speculative_agents.get(agent_name)
+    if agent is None:
+        source = next(handoff for handoff in main_agent.handoffs if handoff.name == agent_name)
+        agent = source.clone(
+            model=create_model(agent_name, label=speculative_label(agent_name)),
+            tools=[hold_tool(tool) for tool in source.tools],
+        )
+        _speculative_agents[agent_name] = agent
+    return agent
+
+
+class SpeculationHooks(RunHooks):
+    """监听路由移交：与预测一致时通知调用方采用投机结果，并挂起路由运行等待取消"""
+
+    def __init__(self, speculation):
+        self.speculation = speculation
+        self.adopted = asyncio.get_running_loop().create_future()
+
+    async def on_handoff(self, context, from_agent, to_agent):
+        if self.speculation.matches(to_agent.name):
+            self.adopted.set_result(None)
+            # 在路由轮次写入会话之前挂起，由 run_turn 取消
+            await asyncio.Future()
+        await self.speculation.discard()
+
+
+async def run_model_turn(user_input: str, session=None, router: Agent = main_agent):
+    """运行一轮对话；开启投机执行时预测的专业智能体与路由并行运行
+
+    命中时取消路由运行，投机运行产生的条目写入会话（用户输入已由路由运行在开始时写入）
+    """
+    history = await session.get_items() if speculative_router.enabled and session is not None else []
+    speculative_input = history + [{"role": "user", "content": user_input}]
+    speculation = speculative_router.start(
+        user_input,
+        lambda agent_name: Runner.run(get_speculative_agent(agent_name), input=speculative_input),
+    )
+    if speculation is None:
+        return await Runner.run(router, input=user_input, session=session)
+
+    hooks = SpeculationHooks(speculation)
+    routed = asyncio.create_task(Runner.run(router, input=user_input, session=session, hooks=hooks))
+    await asyncio.wait({routed, hooks.adopted}, return_when=asyncio.FIRST_COMPLETED)
+    if not hooks.adopted.done():
+        await speculation.discard()
+        return routed.result()
+
+    routed.cancel()
+    try:
+        await routed
+    except asyncio.CancelledError:
+        pass
+    result = await speculation.adopt()
+    if session is not None:
+        await session.add_items(result.to_input_list()[len(speculative_input):])
+    return result
+
+
+# ==================== 降级模式 ====================
+
+def read_only_tool_text(tool):
+    """包装只读工具供降级模式直接调用，返回工具输出文本"""
+    async def run(**kwargs) -> str:
+        arguments = json.dumps(kwargs, ensure_ascii=False)
+        context = ToolContext(context=None, tool_name=tool.name, tool_call_id="degraded", tool_arguments=arguments)
+        return await tool.on_invoke_tool(context, arguments)
+    return run
+
+
+DEGRADED_TOOLS = {
+    tool.name: read_only_tool_text(tool)
+    for tool in (get_health_score, get_realtime_status, generate_daily_report, generate_monthly_report)
+}
+
+
+@dataclass
+class LocalResult:
+    """本地生成的一轮结果（降级模式、答案缓存命中），与 RunResult 一样提供 last_agent 与 final_output"""
+    last_agent: Agent
+    final_output: str
+
+
+async def record_local_turn(user_input: str, content: str, session=None, user_recorded: bool = False):
+    """将本地生成的回复写入会话"""
+    if session is not None:
+        items = [{"role": "assistant", "content": content}]
+        if not user_recorded:
+            items.insert(0, {"role": "user", "content": user_input})
+        await session.add_items(items)
+
+
+async def run_degraded_turn(user_input: str, session=None, router: Agent = main_agent,
+                            user_recorded: bool = False) -> LocalResult:
+    """熔断期间的一轮对话：本地关键词路由，只读工具按模板回复，不调用模型
+
+    Args:
+        user_recorded: 用户输入是否已由路由运行写入会话（模型调用中途失败时）
+    """
+    agent_name, content = await answer_degraded(user_input, DEGRADED_TOOLS)
+    agent = next((handoff for handoff in router.handoffs if handoff.name == agent_name), router)
+    await record_local_turn(user_input, content, session, user_recorded)
+    return LocalResult(agent, content)
+
+
+# ==================== 答案缓存 ====================
+
+def called_tools(result) -> list:
+    """一轮运行中调用的工具名（移交不计入）"""
+    return [item.raw_item.name for item in result.new_items if item.type == "tool_call_item"]
+
+
+async def run_cached_turn(user_input: str, hit, session=None, router: Agent = main_agent) -> LocalResult:
+    """答案缓存命中：直接返回缓存回复并写入会话，不调用模型"""
+    agent = next((handoff for handoff in router.handoffs if handoff.name == hit.agent_name), router)
+    await record_local_turn(user_input, hit.answer, session)
+    return LocalResult(agent, hit.answer)
+
+
+async def run_turn(user_input: str, session=None, router: Agent = main_agent, use_cache: bool = True):
+    """运行一轮对话
+
+    答案缓存命中时直接返回缓存回复（use_cache=False 时不查找也不写入，如路由准确率测试）；
+    模型服务熔断时改走降级模式，本轮模型调用失败且熔断器已断开时同样降级回复
+    """
+    hit = answer_cache.lookup(user_input) if use_cache else None
+    if hit is not None:
+        return await run_cached_turn(user_input, hit, session, router)
+    if not model_breaker.accepts_turns():
+        return await run_degraded_turn(user_input, session, router)
+    versions = snapshot_versions()
+    try:
+        result = await run_model_turn(user_input, session, router)
+    except Exception:
+        if model_breaker.state == CLOSED:
+            raise
+        return await run_degraded_turn(user_input, session, router, user_recorded=True)
+    if use_cache:
+        answer_cache.store(user_input, result.last_agent.name, str(result.final_output), called_tools(result), versions)
+    return result
+
+
+# ==================== 调度控制回路 ====================
+
+_control_agent = None
+
+
+async def escalate_to_dispatch_agent(prompt: str) -> str:
+    """调度控制回路的升级处理：在控制线程中运行调度智能体
+
+    使用单独标记的模型客户端（首次升级时在控制线程中创建，不经过主事件循环的全局限流器），不写入对话会话；
+    调用调度工具后继续由模型说明处理结果
+    """
+    global _control_agent
+    if _control_agent is None:
+        _control_agent = dispatch_agent.clone(
+            model=create_model("dispatch_agent", label="dispatch_control", shared_limiter=False),
+            tool_use_behavior="run_llm_again",
+        )
+    result = await Runner.run(_control_agent, input=prompt)
+    return result.final_output
+
+
 # ==================== 主程序 ====================
 
 async def main():
@@ -331,8 +598,15 @@ async def main():
     print(f"{Colors.YELLOW}[OpenAI Agents SDK]{Colors.RESET}")
     print()
     print("模型信息：")
-    print(f"{BASE_URL=}, {MODEL_NAME=}")
+    for line in describe_model_configs(MODEL_CONFIGS):
+        print(line)
     print()
+    if sensor_ingestion.start():
+        print(f"数据接入：{', '.join(source.name for source in sensor_ingestion.sources)}")
+        print()
+    if dispatch_control.start(escalate_to_dispatch_agent):
+        print(f"调度控制回路：每 {dispatch_control.config.interval:g} 秒自动调度，异常时升级给调度智能体")
+        print()
     print("可用功能：")
     print("  1. 设备调度 - 启停空压机、调整负荷、用气需求")
     print("  2. 故障维修 - 故障诊断、维修指南、备件订购")
@@ -346,6 +620,7 @@ async def main():
 
     # 使用会话保持上下文
     from agents import SQLiteSession
+    os.makedirs("./sessions", exist_ok=True)
     session = SQLiteSession(
         session_id="air_compressor_session",
         db_path = "./sessions/session.db"
@@ -369,16 +644,16 @@ async def main():
             print()
 
             # 调用智能体
-            result = await Runner.run(
-                main_agent,
-                input=user_input,
-                session=session
-            )
+            with turn_profiler.turn("openai") as profile:
+                result = await run_turn(user_input, session)
             # Assistant 输出 - 蓝色
             print(f"{Colors.BLUE}Assistant - {Colors.RESET}"
                   f"{Colors.YELLOW}[{result.last_agent.name}]{Colors.RESET}"
                   f"{Colors.BLUE}: {result.final_output}{Colors.RESET}", flush=True)
             print(flush=True)
+            if profile is not None:
+                print(profile.describe())
+                print()
 
         except KeyboardInterrupt:
             print()
@@ -394,4 +669,17 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    with turn_profiler.suite("openai-interactive"):
+        asyncio.run(main())
+    if dispatch_control.running:
+        dispatch_control.stop()
+        print(dispatch_control.describe())
+    if sensor_ingestion.running:
+        sensor_ingestion.stop()
+        print(sensor_ingestion.describe())
+    if answer_cache.enabled:
+        print(answer_cache.describe())
+    if tool_budget.stats.compacted:
+        print(tool_budget.stats.describe())
+    for line in turn_profiler.summary():
+        print(line)
\ No newline at end of file
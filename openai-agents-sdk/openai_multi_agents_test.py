@@ -4,11 +4,24 @@
 """
 
 import asyncio
+import os
 import time
 
-from agents import Runner
-from openai_multi_agents import main_agent
+from openai_multi_agents import MODEL_CONFIGS, create_main_agent, main_agent, run_turn
 from test_cases import TEST_CASES
+from bench_history import record_run
+from bench_stats import format_latency_percentiles, print_router_comparison, summarize_router_run
+from model_config import router_candidates
+from circuit_breaker import model_breaker
+from degraded_mode import degraded_stats
+from profiling import turn_profiler
+from rate_limiter import model_limiter
+from query_planner import query_planner
+from request_policy import policy_stats
+from sensor_ingestion import sensor_ingestion
+from speculation import speculative_router
+from token_usage import UsageTotals, format_usage, usage_tracker
+from tool_budget import tool_budget
 
 
 # ==================== 颜色定义 ====================
@@ -23,13 +36,27 @@ class TestColors:
 
 # ==================== 测试执行函数 ====================
 
-async def execute_single_test(test_case: dict, index: int) -> dict:
+DEGRADED_ERROR = "降级模式回复（熔断器断开），未经模型路由"
+
+
+def test_session():
+    """测试用例共用的会话（同一次运行内保持上下文）"""
+    from agents import SQLiteSession
+    os.makedirs("./sessions", exist_ok=True)
+    return SQLiteSession(
+        session_id="recognition_test",
+        db_path="./sessions/recognition_test.db"
+    )
+
+
+async def execute_single_test(test_case: dict, index: int, router=main_agent) -> dict:
     """
     测试单个问题
 
     Args:
         test_case: 测试用例字典，包含 question 和 expected_agent
         index: 测试序号（从1开始）
+        router: 主调度智能体（对比路由模型时传入）
 
     Returns:
         测试结果字典，包含问题、预期、实际、是否正确、错误信息
@@ -39,20 +66,15 @@ async def execute_single_test(test_case: dict, index: int) -> dict:
 
     try:
         # 使用会话保持上下文
-        from agents import SQLiteSession
-        session = SQLiteSession(
-            session_id="recognition_test",
-            db_path="./sessions/recognition_test.db"
-        )
+        session = test_session()
+        degraded_before = degraded_stats.turns
         # 调用智能体
-        result = await Runner.run(
-            main_agent,
-            input=question,
-            session=session
-        )
+        result = await run_turn(question, session, router, use_cache=False)
 
         actual = result.last_agent.name
-        is_correct = actual == expected
+        # 熔断期间由本地关键词路由回复，不计入模型路由准确率
+        error = DEGRADED_ERROR if degraded_stats.turns > degraded_before else None
+        is_correct = error is None and actual == expected
 
         return {
             "index": index,
@@ -60,7 +82,7 @@ async def execute_single_test(test_case: dict, index: int) -> dict:
             "expected": expected,
             "actual": actual,
             "is_correct": is_correct,
-            "error": None
+            "error": error
         }
 
     except Exception as e:
@@ -136,24 +158,37 @@ def print_summary(results: list):
 
 
 
-async def run_tests():
+async def run_tests(router=main_agent, router_model: str | None = None):
     """运行所有测试"""
     print("=" * 60)
     print("多智能体识别准确性测试")
     print("=" * 60)
+    if router_model:
+        print(f"路由模型：{router_model}")
     print(f"测试用例数：{len(TEST_CASES)}")
     print(f"开始执行测试...")
     print()
 
     results = []
+    # 每次运行从空会话开始，避免历史跨运行累积而抬高提示长度
+    await test_session().clear_session()
 
     # 逐个执行测试
     # 记录开始时间
     start_time = time.time()
     for index, test_case in enumerate(TEST_CASES, start=1):
-        result = await execute_single_test(test_case, index)
+        usage_before = usage_tracker.snapshot()
+        router_usage_before = usage_tracker.snapshot("main_agent")
+        case_start = time.time()
+        with turn_profiler.turn(f"openai-case{index:02d}") as profile:
+            result = await execute_single_test(test_case, index, router)
+        result["latency"] = time.time() - case_start
+        result["usage"] = usage_tracker.snapshot().minus(usage_before)
+        result["router_usage"] = usage_tracker.snapshot("main_agent").minus(router_usage_before)
         results.append(result)
         print_test_result(result)
+        if profile is not None:
+            print(f"  {profile.describe()}")
     # 记录结束时间
     end_time = time.time()
 
@@ -163,12 +198,53 @@ async def run_tests():
     elapsed_time = end_time - start_time
     print(f"程序执行耗时: {elapsed_time:.2f} 秒")
 
+    # token 用量（区分前缀缓存命中与未命中的输入 token）
+    total_usage = UsageTotals()
+    for result in results:
+        total_usage.add(result["usage"])
+    print(format_usage(total_usage))
+    print(format_latency_percentiles(result["latency"] for result in results))
+    print(policy_stats.describe())
+    print(model_limiter.describe())
+    print(model_breaker.describe())
+    if sensor_ingestion.running:
+        print(sensor_ingestion.describe())
+    if query_planner.queries:
+        print(query_planner.describe())
+    if degraded_stats.turns:
+        print(degraded_stats.describe())
+    if speculative_router.enabled:
+        print(speculative_router.stats.describe())
+    if tool_budget.stats.compacted:
+        print(tool_budget.stats.describe())
+    record_run("openai", results, elapsed_time, MODEL_CONFIGS, router_model)
+
     return results
 
 
+async def compare_router_models(candidates: list):
+    """依次使用每个候选路由模型运行测试，对比准确率与路由耗时"""
+    rows = []
+    for model_name in candidates:
+        router = create_main_agent(MODEL_CONFIGS["main_agent"].with_model(model_name))
+        results = await run_tests(router, model_name)
+        rows.append(summarize_router_run(model_name, results))
+        print()
+    print_router_comparison(rows)
+
+
 def main():
-    """主程序入口"""
-    asyncio.run(run_tests())
+    """主程序入口（设置 ROUTER_MODEL_CANDIDATES 时对比多个路由模型）"""
+    candidates = router_candidates()
+    sensor_ingestion.start()
+    with turn_profiler.suite("openai-suite"):
+        if candidates:
+            asyncio.run(compare_router_models(candidates))
+        else:
+            asyncio.run(run_tests())
+    sensor_ingestion.stop()
+    for line in turn_profiler.summary():
+        print(line)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,274 @@
+"""
+中文时段解析
+将能耗分析、运营报告工具收到的时段文本（"本月"、"上周"、"昨天8点到12点"、"3月5日至3月10日"、
+"最近7天"、"2024年3月"）转为精确的 [开始, 结束) 时间范围，供 query_planner 选择汇总粒度
+
+1. 单个时段：日期部分（相对日/周/月/季度/年、绝对日期、最近 N 个单位）+ 可选的钟点或上午/下午等时段
+2. 范围："A 到/至/~ B"，B 未写日期时沿用 A 的日期；B 带钟点时以该时刻为结束，否则以 B 的整个时段结束为结束
+3. 未写年份的月份/日期晚于今天时视为去年；未写日期的钟点晚于当前时间时视为昨天（"23点到1点"）；结束时间不超过当前时间
+
+无法识别时返回 None
+"""
+
+import calendar
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from equipment import chinese_to_int
+
+# ==================== 时段结构 ====================
+
+@dataclass(frozen=True)
+class Period:
+    """解析结果：[start, end) 时间戳与原文"""
+    text: str
+    start: float
+    end: float
+
+    @property
+    def label(self) -> str:
+        """规范化的时段描述，如 2026-10-18、2026-10-18 08:00-12:00、2026-10-01 至 2026-10-19 15:30"""
+        start = datetime.fromtimestamp(self.start)
+        end = datetime.fromtimestamp(self.end)
+        whole_days = start.time() == end.time() == datetime.min.time()
+        if whole_days:
+            last = (end - timedelta(days=1)).date()
+            return str(start.date()) if last == start.date() else f"{start.date()} 至 {last}"
+        if start.date() == end.date():
+            return f"{start:%Y-%m-%d %H:%M}-{end:%H:%M}"
+        return f"{start:%Y-%m-%d %H:%M} 至 {end:%Y-%m-%d %H:%M}"
+
+
+@dataclass
+class _Span:
+    """单个时段表达式的解析结果"""
+    start: datetime
+    end: datetime
+    day: date | None = None         # 表达式落在单日内时为该日，钟点据此定位
+    has_clock: bool = False
+    month: date | None = None       # 表达式为整月时为该月 1 号，"本月1号"的日据此定位
+
+
+# ==================== 日期计算 ====================
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def _add_months(day: date, months: int) -> date:
+    """月份加减，日取 1 号"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _shift_months(moment: datetime, months: int) -> datetime:
+    """按月前后平移，日超出目标月天数时取月末"""
+    first = _add_months(moment.date(), months)
+    day = min(moment.day, calendar.monthrange(first.year, first.month)[1])
+    return moment.replace(year=first.year, month=first.month, day=day)
+
+
+def _month_span(year: int, month: int) -> _Span:
+    first = date(year, month, 1)
+    return _Span(_midnight(first), _midnight(_add_months(first, 1)), month=first)
+
+
+def _day_span(day: date) -> _Span:
+    return _Span(_midnight(day), _midnight(day + timedelta(days=1)), day)
+
+
+def _past_year(year: int | None, month: int, day: int, today: date) -> int:
+    """未写年份时取今年，晚于今天则取去年"""
+    if year is not None:
+        return year
+    return today.year if (month, day) <= (today.month, today.day) else today.year - 1
+
+
+# ==================== 日期部分 ====================
+
+_CHINESE_DIGITS = {"零": "0", "〇": "0", "一": "1", "二": "2", "三": "3", "四": "4",
+                   "五": "5", "六": "6", "七": "7", "八": "8", "九": "9"}
+_CHINESE_YEAR = re.compile(r"[零〇一二三四五六七八九]{4}(?=年)")
+_CHINESE_NUMBER = re.compile(r"[零一二两三四五六七八九十]+(?=[点时分号日月天周星期个小年季刻])")
+_RECENT = re.compile(r"(?:最近|近|过去|前)(\d+)个?(分钟|小时|天|日|周|星期|月|年)")
+_FULL_DATE = re.compile(r"(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})[日号]?")
+_YEAR_MONTH = re.compile(r"(\d{4})(?:年(\d{1,2})月份?|[-/.](\d{1,2})(?!\d))")
+_YEAR = re.compile(r"(\d{4})年")
+_MONTH_DAY = re.compile(r"(\d{1,2})月(\d{1,2})[日号]")
+_MONTH = re.compile(r"(\d{1,2})月份?")
+_DAY_OF_MONTH = re.compile(r"(\d{1,2})[日号]")
+_QUARTER = re.compile(r"第?([1-4])季度")
+
+_RELATIVE_DAYS = (("大前天", -3), ("前天", -2), ("昨天", -1), ("昨日", -1), ("今天", 0), ("今日", 0), ("当天", 0))
+_WEEK_WORDS = (("上上周", -2), ("上周", -1), ("上个星期", -1), ("上星期", -1), ("上个周", -1),
+               ("本周", 0), ("这周", 0), ("这个星期", 0), ("本星期", 0))
+_MONTH_WORDS = (("上上个月", -2), ("上个月", -1), ("上月", -1), ("本月", 0), ("这个月", 0), ("当月", 0))
+_QUARTER_WORDS = (("上个季度", -1), ("上季度", -1), ("本季度", 0), ("这个季度", 0))
+_YEAR_WORDS = (("去年", -1), ("上年", -1), ("今年", 0), ("本年", 0))
+_RECENT_UNITS = {"分钟": timedelta(minutes=1), "小时": timedelta(hours=1), "天": timedelta(days=1),
+                 "日": timedelta(days=1), "周": timedelta(weeks=1), "星期": timedelta(weeks=1)}
+
+
+def _parse_date_part(text: str, now: datetime) -> tuple:
+    """识别日期部分，返回 (_Span 或 None, 去掉日期部分后的剩余文本)"""
+    today = now.date()
+
+    match = _RECENT.search(text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        if unit in ("月", "年"):
+            start = _shift_months(now, -count * (12 if unit == "年" else 1))
+        else:
+            start = now - count * _RECENT_UNITS[unit]
+        return _Span(start, now), text.replace(match.group(), "")
+
+    for pattern in (_FULL_DATE, _MONTH_DAY):
+        match = pattern.search(text)
+        if match:
+            numbers = [int(group) for group in match.groups()]
+            year, month, day = numbers if len(numbers) == 3 else (None, *numbers)
+            return _day_span(date(_past_year(year, month, day, today), month, day)), text.replace(match.group(), "")
+
+    match = _YEAR_MONTH.search(text)
+    if match:
+        month = int(match.group(2) or match.group(3))
+        return _month_span(int(match.group(1)), month), text.replace(match.group(), "")
+    match = _QUARTER.search(text)
+    if match:
+        year_match = _YEAR.search(text)
+        year = int(year_match.group(1)) if year_match else today.year
+        first = date(year, (int(match.group(1)) - 1) * 3 + 1, 1)
+        return _Span(_midnight(first), _midnight(_add_months(first, 3))), ""
+    match = _YEAR.search(text)
+    if match:
+        year = int(match.group(1))
+        return _Span(datetime(year, 1, 1), datetime(year + 1, 1, 1)), text.replace(match.group(), "")
+    match = _MONTH.search(text)
+    if match:
+        month = int(match.group(1))
+        return _month_span(_past_year(None, month, 1, today), month), text.replace(match.group(), "")
+
+    for word, offset in _RELATIVE_DAYS:
+        if word in text:
+            return _day_span(today + timedelta(days=offset)), text.replace(word, "")
+    for word, offset in _WEEK_WORDS:
+        if word in text:
+            monday = today - timedelta(days=today.weekday()) + timedelta(weeks=offset)
+            return _Span(_midnight(monday), _midnight(monday + timedelta(weeks=1))), text.replace(word, "")
+    for word, offset in _MONTH_WORDS:
+        if word in text:
+            first = _add_months(today, offset)
+            return _month_span(first.year, first.month), text.replace(word, "")
+    for word, offset in _QUARTER_WORDS:
+        if word in text:
+            first = _add_months(date(today.year, (today.month - 1) // 3 * 3 + 1, 1), offset * 3)
+            return _Span(_midnight(first), _midnight(_add_months(first, 3))), text.replace(word, "")
+    for word, offset in _YEAR_WORDS:
+        if word in text:
+            year = today.year + offset
+            return _Span(datetime(year, 1, 1), datetime(year + 1, 1, 1)), text.replace(word, "")
+    return None, text
+
+
+# ==================== 钟点部分 ====================
+
+_CLOCK = re.compile(r"(凌晨|早上|上午|中午|下午|傍晚|晚上)?(\d{1,2})(?:[:：](\d{2})|点(?:(\d{1,2})分?|(半))?|时)")
+# 时段词 -> (开始小时, 结束小时)
+_DAY_PARTS = {"凌晨": (0, 6), "早上": (6, 9), "上午": (6, 12), "中午": (11, 13), "下午": (12, 18),
+              "傍晚": (17, 19), "晚上": (18, 24), "白天": (6, 18), "夜间": (18, 24)}
+_AFTERNOON = ("下午", "傍晚", "晚上")
+
+
+def _apply_clock(text: str, day: date) -> _Span | None:
+    """识别钟点（"8点"、"下午3点半"、"14:30"）或时段词（"上午"），返回落在 day 内的 _Span"""
+    match = _CLOCK.search(text)
+    if match:
+        part, hour = match.group(1), int(match.group(2))
+        minute = int(match.group(3) or match.group(4) or (30 if match.group(5) else 0))
+        if part in _AFTERNOON and hour < 12:
+            hour += 12
+        if hour > 24 or minute > 59:
+            return None
+        start = _midnight(day) + timedelta(hours=hour, minutes=minute)
+        precise = match.group(3) or match.group(4) or match.group(5)
+        return _Span(start, start + (timedelta(minutes=1) if precise else timedelta(hours=1)), day, True)
+    for word, (first, last) in _DAY_PARTS.items():
+        if word in text:
+            return _Span(_midnight(day) + timedelta(hours=first), _midnight(day) + timedelta(hours=last), day)
+    return None
+
+
+# ==================== 解析入口 ====================
+
+_RANGE_SEPARATOR = re.compile(r"到|至|~|～|—|(?<=[点时分日号天月])-")
+
+
+def _normalize(text: str) -> str:
+    text = re.sub(r"\s+", "", text)
+    # 年份按位读（"二零二四年"），须先于按数值转换，否则会被读成 4
+    text = _CHINESE_YEAR.sub(lambda match: "".join(_CHINESE_DIGITS[char] for char in match.group()), text)
+    return _CHINESE_NUMBER.sub(lambda match: str(chinese_to_int(match.group())), text)
+
+
+def _parse_span(text: str, now: datetime, context_day: date | None = None,
+                context_month: date | None = None) -> _Span | None:
+    span, rest = _parse_date_part(text, now)
+    if span is not None and span.month is not None:
+        # 整月后跟日（"本月1号"），落到该月的这一天
+        match = _DAY_OF_MONTH.search(rest)
+        if match:
+            span, rest = _day_span(span.month.replace(day=int(match.group(1)))), rest.replace(match.group(), "")
+    if span is None and (context_day or context_month) is not None:
+        # 范围后半段只写了日（"3月5日到10日"、"本月1号到15号"），沿用前半段的年月
+        match = _DAY_OF_MONTH.search(text)
+        if match:
+            day = (context_day or context_month).replace(day=int(match.group(1)))
+            span, rest = _day_span(day), text.replace(match.group(), "")
+    if span is None:
+        if context_day is not None:
+            return _apply_clock(text, context_day)
+        clock = _apply_clock(text, now.date())
+        if clock is not None and clock.start > now:
+            # 未写日期的钟点还没到（上午说"23点到1点"），指昨天
+            clock = _apply_clock(text, now.date() - timedelta(days=1))
+        return clock
+    if span.day is not None:
+        return _apply_clock(rest, span.day) or span
+    return span
+
+
+def parse_period(text: str, now: float | None = None) -> Period | None:
+    """解析时段文本，返回 Period（结束时间不超过 now）；无法识别或日期不存在时返回 None"""
+    current = datetime.fromtimestamp(time.time() if now is None else now)
+    try:
+        return _parse_period(text, current)
+    except (ValueError, OverflowError):
+        # 不存在的日期（"2月30日"、"13月"、"2024-13"、"4月5日到31日"）或超出范围的年份、时长
+        return None
+
+
+def _parse_period(text: str, current: datetime) -> Period | None:
+    normalized = _normalize(text or "")
+    parts = _RANGE_SEPARATOR.split(normalized, maxsplit=1)
+
+    first = _parse_span(parts[0], current)
+    if first is None:
+        return None
+    start, end = first.start, first.end
+    if len(parts) == 2:
+        second_text = parts[1]
+        if first.has_clock and re.fullmatch(r"\d{1,2}", second_text):
+            second_text += "点"
+        second = _parse_span(second_text, current, first.day, first.month)
+        if second is None:
+            return None
+        end = second.start if second.has_clock else second.end
+        if second.has_clock and end <= start:
+            # "下午3点到5点"：后半段沿用下午；"23点到1点"：跨过零点
+            end += timedelta(hours=12) if start < end + timedelta(hours=12) else timedelta(days=1)
+    end = min(end, current)
+    if end <= start:
+        return None
+    return Period(text, start.timestamp(), end.timestamp())
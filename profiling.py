@@ -0,0 +1,195 @@
+"""
+按需性能分析
+区分每轮对话中框架自身的 CPU 开销（消息格式化、schema 构建、Pydantic 校验等）与等待模型响应的时间：
+1. CPU/墙钟：每轮记录主线程 CPU 时间（time.thread_time，不含采样线程与进程内模拟服务的线程）与墙钟时间，
+   两者之差即为等待网络/模型的时间
+2. 采样：后台线程按固定间隔采样主线程调用栈，输出 collapsed stack 格式（每行 "帧;帧;帧 次数"），
+   可直接用 flamegraph.pl、speedscope 或 inferno 生成火焰图；事件循环空闲（等待 I/O）的样本归入 selectors 帧
+
+开关（环境变量）：
+    PROFILE=turn    每轮一个采样文件
+    PROFILE=suite   整个测试集/交互会话一个采样文件
+    PROFILE_DIR（默认 profiles）、PROFILE_INTERVAL_MS（默认 5）
+未设置 PROFILE 时不采样也不计时，没有额外开销
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+# ==================== 配置 ====================
+
+MODE_TURN = "turn"
+MODE_SUITE = "suite"
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IDLE_FUNCTIONS = frozenset({"select", "poll"})     # selectors 中这些函数为栈顶时视为等待 I/O
+
+
+def _profile_mode() -> str:
+    mode = (os.getenv("PROFILE") or "").strip().lower()
+    return MODE_TURN if mode in ("1", MODE_TURN) else mode if mode == MODE_SUITE else ""
+
+
+# ==================== 采样器 ====================
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(ROOT):
+        path = os.path.relpath(path, ROOT)
+    elif "site-packages" in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_qualname} ({path})".replace(";", ",")
+
+
+class StackSampler:
+    """后台线程定时采样目标线程的调用栈，按 collapsed stack 计数"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.idle_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            if frame.f_code.co_name in IDLE_FUNCTIONS and frame.f_code.co_filename.endswith("selectors.py"):
+                self.idle_samples += 1
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def write(self, path: str):
+        """写出 collapsed stack 文件"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# ==================== 每轮计时 ====================
+
+@dataclass
+class TurnProfile:
+    """一轮对话的 CPU 与墙钟时间"""
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    samples: int = 0
+    idle_samples: int = 0
+    path: str | None = None         # 本轮的采样文件（PROFILE=turn 时）
+
+    @property
+    def cpu_share(self) -> float:
+        return self.cpu_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+    def describe(self) -> str:
+        line = (f"[性能分析] {self.name}：墙钟 {self.wall_seconds:.3f}s，CPU {self.cpu_seconds:.3f}s"
+                f"（{self.cpu_share:.1%}），等待 {self.wall_seconds - self.cpu_seconds:.3f}s")
+        if self.path:
+            line += f"，采样 {self.samples} 次（空闲 {self.idle_samples}）→ {self.path}"
+        return line
+
+
+class TurnProfiler:
+    """按轮次或整个测试集采样，并记录每轮 CPU/墙钟时间"""
+
+    def __init__(self, mode: str, directory: str, interval: float):
+        self.mode = mode
+        self.directory = directory
+        self.interval = interval
+        self.turns = []
+        self._suite_sampler = None
+        self._suite_path = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.mode)
+
+    def _sampler(self) -> StackSampler:
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        return sampler
+
+    @contextmanager
+    def suite(self, name: str):
+        """包住整个测试集或交互会话；PROFILE=suite 时结束后写出一个采样文件"""
+        if self.mode != MODE_SUITE:
+            yield
+            return
+        self._suite_sampler = self._sampler()
+        self._suite_path = os.path.join(self.directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        try:
+            yield
+        finally:
+            self._suite_sampler.stop()
+            self._suite_sampler.write(self._suite_path)
+
+    @contextmanager
+    def turn(self, name: str):
+        """包住一轮对话，产出 TurnProfile（退出后填好时间）；未开启时产出 None"""
+        if not self.enabled:
+            yield None
+            return
+        profile = TurnProfile(name)
+        sampler = self._sampler() if self.mode == MODE_TURN else None
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield profile
+        finally:
+            profile.cpu_seconds = time.thread_time() - cpu_start
+            profile.wall_seconds = time.perf_counter() - wall_start
+            if sampler is not None:
+                sampler.stop()
+                profile.path = os.path.join(self.directory, f"{name}-{len(self.turns) + 1:04d}.folded")
+                profile.samples = sampler.samples
+                profile.idle_samples = sampler.idle_samples
+                sampler.write(profile.path)
+            self.turns.append(profile)
+
+    def summary(self) -> list:
+        """全部轮次的 CPU/墙钟汇总"""
+        if not self.turns:
+            return []
+        wall = sum(t.wall_seconds for t in self.turns)
+        cpu = sum(t.cpu_seconds for t in self.turns)
+        lines = [f"性能分析：{len(self.turns)} 轮，墙钟 {wall:.2f}s，CPU {cpu:.2f}s"
+                 f"（{cpu / wall if wall else 0:.1%}），等待模型/网络 {wall - cpu:.2f}s"]
+        if self._suite_path:
+            sampler = self._suite_sampler
+            lines.append(f"采样 {sampler.samples} 次（空闲 {sampler.idle_samples}）→ {self._suite_path}")
+        return lines
+
+
+# 全局性能分析实例
+turn_profiler = TurnProfiler(
+    _profile_mode(),
+    os.getenv("PROFILE_DIR") or "profiles",
+    float(os.getenv("PROFILE_INTERVAL_MS") or 5) / 1000,
+)
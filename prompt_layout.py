@@ -0,0 +1,30 @@
+"""
+前缀缓存友好的提示词布局
+支持自动前缀缓存的模型服务只复用逐字节相同的请求前缀，因此：
+1. 系统提示词只放静态指令，实时数据一律通过工具结果进入对话末尾
+2. 工具（含 handoff）按固定规则排序，与注册顺序无关，保证每轮请求的工具定义逐字节一致
+3. 智能体目录只在此处定义一次，各实现按同一顺序生成 handoff
+"""
+
+# ==================== 智能体目录 ====================
+
+AGENT_DIRECTORY = (
+    ("dispatch_agent", "空压站智能调度智能体", "设备启停、负荷分配、运行优化、用气调度"),
+    ("maintenance_agent", "空压机设备维修助手", "故障诊断、维修指南、备件订购"),
+    ("energy_analysis_agent", "空压站能耗分析智能体", "能耗分析、能效对比、节能报告"),
+    ("health_agent", "空压设备健康智能体", "设备健康评分、预测性维护、实时状态监测"),
+    ("report_agent", "空压站运营报告智能体", "日报/月报生成、优化建议"),
+    ("inspection_agent", "空压站设备巡检智能体", "视觉巡检、异常检测、巡检记录"),
+)
+
+
+# ==================== 工具排序 ====================
+
+def tool_name(tool) -> str:
+    """取工具名：兼容普通函数、AutoGen/OpenAI Agents 的工具对象"""
+    return getattr(tool, "name", None) or tool.__name__
+
+
+def stable_tools(tools) -> list:
+    """按工具名排序，保证工具定义顺序与注册顺序无关"""
+    return sorted(tools, key=tool_name)
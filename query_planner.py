@@ -0,0 +1,201 @@
+"""
+能耗/报告查询规划
+将 period_parser 解析出的 [开始, 结束) 拆成若干段，每段选用能完整覆盖它的最粗粒度数据，尽量少读数据：
+1. 月汇总（report_rollups.monthly，由当月日汇总合并）：整月落在范围内
+2. 日汇总（report_rollups.daily）：整日落在范围内
+3. 原始数据（history_store，按时间索引二分查找）：范围首尾不足一天的部分
+
+日/月汇总由接入管道在进程运行期间增量维护，早于 report_rollups.covered_since 的日/月汇总不完整，改读原始数据；
+当天/当月的汇总只含截至当前的数据，范围结束于当前时间时同样可用
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from equipment import normalize_equipment_id
+from period_parser import Period, parse_period
+from report_rollups import Rollup, report_rollups
+
+# ==================== 查询计划 ====================
+
+MONTH = "month"
+DAY = "day"
+RAW = "raw"
+
+GRANULARITY_LABELS = {MONTH: "月汇总", DAY: "日汇总", RAW: "原始数据"}
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    """计划中的一段：粒度、时间范围与汇总键（月 YYYY-MM / 日 YYYY-MM-DD，原始数据为空）"""
+    granularity: str
+    start: float
+    end: float
+    key: str = ""
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def describe_plan(steps: list) -> str:
+    """计划摘要，如 "月汇总 1 段，日汇总 3 段，原始数据 2 段" """
+    counts = {}
+    for step in steps:
+        counts[step.granularity] = counts.get(step.granularity, 0) + 1
+    return "，".join(f"{GRANULARITY_LABELS[name]} {counts[name]} 段" for name in (MONTH, DAY, RAW) if name in counts)
+
+
+# ==================== 查询规划器 ====================
+
+class QueryPlanner:
+    """按范围选择汇总粒度并执行，工具文本的统一入口"""
+
+    def __init__(self, rollups=report_rollups):
+        self.rollups = rollups
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.steps = {MONTH: 0, DAY: 0, RAW: 0}
+        self.raw_seconds = 0.0      # 读原始数据覆盖的总时长
+
+    def _rollup_usable(self, start: datetime, end: datetime, stop: float, now: float) -> bool:
+        """[start, end) 的汇总可用：汇总开始记录时已在该段之前，且汇总所含数据不超出查询范围"""
+        covered = self.rollups.covered_since
+        return covered is not None and start.timestamp() >= covered and min(end.timestamp(), now) <= stop
+
+    def plan(self, start: float, end: float, now: float | None = None) -> list:
+        """将 [start, end) 拆为 PlanStep 列表：整月用月汇总，整日用日汇总，其余读原始数据（相邻原始段合并）"""
+        now = time.time() if now is None else now
+        cursor, stop = datetime.fromtimestamp(start), datetime.fromtimestamp(end)
+        steps = []
+        while cursor < stop:
+            day_start = _midnight(cursor.date())
+            next_day = day_start + timedelta(days=1)
+            if cursor == day_start:
+                month_end = _midnight(_next_month(cursor.date()))
+                if cursor.day == 1 and self._rollup_usable(cursor, month_end, end, now):
+                    steps.append(PlanStep(MONTH, cursor.timestamp(), min(month_end.timestamp(), end),
+                                          f"{cursor:%Y-%m}"))
+                    cursor = month_end
+                    continue
+                if self._rollup_usable(cursor, next_day, end, now):
+                    steps.append(PlanStep(DAY, cursor.timestamp(), min(next_day.timestamp(), end),
+                                          f"{cursor:%Y-%m-%d}"))
+                    cursor = next_day
+                    continue
+            segment_end = min(next_day, stop)
+            if steps and steps[-1].granularity == RAW and steps[-1].end == cursor.timestamp():
+                steps[-1] = PlanStep(RAW, steps[-1].start, segment_end.timestamp())
+            else:
+                steps.append(PlanStep(RAW, cursor.timestamp(), segment_end.timestamp()))
+            cursor = segment_end
+        return steps
+
+    def execute(self, steps: list, label: str, equipment_ids=None) -> Rollup:
+        """按计划读取各段并合并为一个 Rollup，equipment_ids 为 None 时包含全部设备"""
+        result = Rollup(label)
+        for step in steps:
+            if step.granularity == RAW:
+                # 依赖 numpy，首次调用时才导入
+                from history_store import history_store
+                part = history_store.energy_rollup(label, step.start, step.end, equipment_ids)
+            else:
+                part = self.rollups.monthly(step.key) if step.granularity == MONTH else self.rollups.daily(step.key)
+                if equipment_ids:
+                    part.equipment = {key: totals for key, totals in part.equipment.items() if key in equipment_ids}
+            result.merge(part)
+        with self._lock:
+            self.queries += 1
+            for step in steps:
+                self.steps[step.granularity] += 1
+                if step.granularity == RAW:
+                    self.raw_seconds += step.end - step.start
+        return result
+
+    def query(self, period: Period, equipment_ids=None, now: float | None = None) -> Rollup:
+        """时段内的能耗汇总"""
+        return self.execute(self.plan(period.start, period.end, now), period.label, equipment_ids)
+
+    def describe(self) -> str:
+        return (f"查询规划：{self.queries} 次查询，月汇总 {self.steps[MONTH]} 段，日汇总 {self.steps[DAY]} 段，"
+                f"原始数据 {self.steps[RAW]} 段（共 {self.raw_seconds / 3600:.1f} 小时）")
+
+    # -------------------- 工具文本 --------------------
+
+    @staticmethod
+    def _period(text: str, now: float | None, default: str = "本月") -> tuple:
+        """解析时段，无法识别时按 default 处理，返回 (Period, 提示前缀)"""
+        period = parse_period(text, now) if text and text.strip() else None
+        if period is not None:
+            return period, ""
+        note = f"未能识别时段“{text}”，以下按{default}统计。" if text and text.strip() else ""
+        return parse_period(default, now), note
+
+    def describe_energy(self, period: str, now: float | None = None) -> str:
+        """analyze_energy_consumption 工具的返回文本"""
+        parsed, note = self._period(period, now)
+        return note + self.query(parsed, now=now).describe(f"{parsed.text}能耗分析")
+
+    def describe_efficiency(self, compressor_ids: str, period: str = "本月", now: float | None = None) -> str:
+        """compare_energy_efficiency 工具的返回文本：各设备单位产气能耗"""
+        parsed, note = self._period(period, now)
+        ids = [normalize_equipment_id(part) for part in compressor_ids.replace("，", ",").replace("、", ",").split(",")
+               if part.strip()]
+        rollup = self.query(parsed, ids or None, now)
+        rows = sorted((totals.energy_kwh / totals.air_m3, equipment_id)
+                      for equipment_id, totals in rollup.equipment.items() if totals.air_m3 > 0)
+        if not rows:
+            return f"{note}设备 {compressor_ids} 暂无{parsed.text}（{parsed.label}）的能耗数据，无法对比能效"
+        details = "，".join(
+            f"{equipment_id}号机 {specific:.3f} kWh/m³{'（最优）' if index == 0 and len(rows) > 1 else ''}"
+            for index, (specific, equipment_id) in enumerate(rows)
+        )
+        return f"{note}设备 {compressor_ids} 能效对比（{parsed.label}）：{details}"
+
+    def describe_energy_report(self, now: float | None = None) -> str:
+        """generate_energy_report 工具的返回文本：本月与上月的能耗、单位产气能耗对比"""
+        current = self.query(parse_period("本月", now), now=now).totals()
+        previous = self.query(parse_period("上月", now), now=now).totals()
+        if current.air_m3 <= 0:
+            return "能耗分析报告：本月暂无能耗数据"
+        specific = current.energy_kwh / current.air_m3
+        text = (f"能耗分析报告：本月总能耗 {current.energy_kwh:,.0f} kWh，产气量 {current.air_m3:,.0f} m³，"
+                f"单位产气能耗 {specific:.3f} kWh/m³")
+        if previous.air_m3 <= 0:
+            return f"{text}，上月无数据可供对比"
+        previous_specific = previous.energy_kwh / previous.air_m3
+        change = specific / previous_specific - 1.0
+        return (f"{text}，较上月 {previous_specific:.3f} kWh/m³ {'降低' if change < 0 else '升高'} "
+                f"{abs(change):.1%}（上月总能耗 {previous.energy_kwh:,.0f} kWh）")
+
+    def describe_report(self, kind: str, period: str = "", now: float | None = None) -> str:
+        """generate_daily_report / generate_monthly_report 工具的返回文本
+
+        kind 为 "daily" 或 "monthly"，报告周期取 period 起点所在的日/月（默认今天/本月）；
+        汇总完整覆盖该周期时直接返回 report_rollups 的缓存报告，否则按计划补读原始数据
+        """
+        default = "今天" if kind == "daily" else "本月"
+        parsed, note = self._period(period, now, default)
+        first = datetime.fromtimestamp(parsed.start).date()
+        if kind == "daily":
+            start, end, title = _midnight(first), _midnight(first + timedelta(days=1)), "日报摘要"
+            key, cached = f"{first:%Y-%m-%d}", self.rollups.daily_report
+        else:
+            first = first.replace(day=1)
+            start, end, title = _midnight(first), _midnight(_next_month(first)), "月报摘要"
+            key, cached = f"{first:%Y-%m}", self.rollups.monthly_report
+        current = time.time() if now is None else now
+        steps = self.plan(start.timestamp(), min(end.timestamp(), current), current)
+        if len(steps) == 1 and steps[0].key == key:
+            return note + cached(key)
+        return note + self.execute(steps, key).describe(title)
+
+
+# 全局查询规划器实例，供三种实现的工具共享
+query_planner = QueryPlanner()
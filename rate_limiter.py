@@ -0,0 +1,212 @@
+"""
+模型调用限流
+所有智能体的模型请求共用一个限流器（同一个服务商密钥），在请求策略的每次实际发送前获取许可：
+1. 令牌桶：每分钟请求数（MODEL_RPM）与每分钟 token 数（MODEL_TPM），0 表示不限制
+2. 自适应并发窗口（AIMD）：请求成功且延迟正常时窗口加性增大，遇到 429/5xx 或延迟明显升高时乘性减小
+3. 排队深度：等待并发许可的请求数，作为限流指标对外暴露
+
+token 数在发送前按请求体大小估算，响应返回后按实际用量补扣
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# ==================== 配置 ====================
+
+BURST_SECONDS = 10.0            # 令牌桶容量：允许瞬时用掉多少秒的配额
+BYTES_PER_TOKEN = 4             # 按请求体字节数估算输入 token
+LATENCY_BASELINE_WINDOW = 100   # 延迟基线取该标签最近多少次成功请求的最小值
+LATENCY_TOLERANCE = 2.0         # 平滑延迟超过基线的倍数时视为拥塞（按标签分别比较，路由与专业智能体的延迟不混在一起）
+LATENCY_SMOOTHING = 0.2
+
+
+@dataclass(frozen=True)
+class LimiterConfig:
+    """限流配置"""
+    requests_per_minute: float = 0.0
+    tokens_per_minute: float = 0.0
+    initial_concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 64
+    backoff_factor: float = 0.5         # 429/5xx 时窗口乘以该系数
+    latency_backoff_factor: float = 0.9  # 延迟升高时窗口乘以该系数
+
+    @classmethod
+    def from_env(cls) -> "LimiterConfig":
+        return cls(
+            requests_per_minute=float(os.getenv("MODEL_RPM") or 0),
+            tokens_per_minute=float(os.getenv("MODEL_TPM") or 0),
+            initial_concurrency=int(os.getenv("MODEL_INITIAL_CONCURRENCY") or cls.initial_concurrency),
+            max_concurrency=int(os.getenv("MODEL_MAX_CONCURRENCY") or cls.max_concurrency),
+        )
+
+
+# ==================== 令牌桶 ====================
+
+class TokenBucket:
+    """按每分钟速率匀速补充的令牌桶，余额可被补扣为负数"""
+
+    def __init__(self, per_minute: float, burst_seconds: float = BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def take(self, amount: float) -> float:
+        """取出 amount 个令牌，不足时等待；单次需求超过容量时只需桶满即可。返回等待秒数"""
+        waited = 0.0
+        need = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.level >= need:
+                self.level -= amount
+                return waited
+            delay = (need - self.level) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+    def debit(self, amount: float):
+        """补扣（amount 为负数时返还）"""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+# ==================== 限流器 ====================
+
+class ModelCallLimiter:
+    """令牌桶 + AIMD 自适应并发窗口"""
+
+    def __init__(self, config: LimiterConfig):
+        self.config = config
+        self.requests_bucket = TokenBucket(config.requests_per_minute) if config.requests_per_minute else None
+        self.tokens_bucket = TokenBucket(config.tokens_per_minute) if config.tokens_per_minute else None
+        self.window = float(config.initial_concurrency)
+        self.in_flight = 0
+        self._waiters = deque()
+        self._latencies = {}
+        self._smoothed_latency = {}
+        self._last_decrease = 0.0
+        # 指标
+        self.admitted = 0
+        self.throttled = 0              # 收到 429 的次数
+        self.max_queue_depth = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """等待并发许可的请求数"""
+        return len(self._waiters)
+
+    @property
+    def limit(self) -> int:
+        return max(self.config.min_concurrency, int(self.window))
+
+    @staticmethod
+    def estimate_tokens(body: bytes) -> int:
+        return len(body) // BYTES_PER_TOKEN
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self, estimated_tokens: int = 0):
+        """获取一次模型请求的许可：先排队取得并发名额，再扣减请求数与 token 令牌"""
+        started = time.monotonic()
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # 已分配到名额后被取消：归还名额
+                    self.in_flight -= 1
+                    self._wake()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        try:
+            if self.requests_bucket is not None:
+                await self.requests_bucket.take(1)
+            if self.tokens_bucket is not None:
+                await self.tokens_bucket.take(estimated_tokens)
+        except asyncio.CancelledError:
+            self.in_flight -= 1
+            self._wake()
+            raise
+        self.admitted += 1
+        self.wait_seconds += time.monotonic() - started
+
+    def release(self, latency: float, status_code: int | None, label: str = "",
+                estimated_tokens: int = 0, actual_tokens: int | None = None):
+        """请求结束：归还并发名额，按结果调整窗口，按实际 token 用量补扣
+
+        Args:
+            latency: 本次请求耗时（秒）
+            status_code: 响应状态码，连接错误等无响应时为 None
+            label: 请求标签（智能体名称），延迟基线按标签分别统计
+        """
+        self.in_flight -= 1
+        if self.tokens_bucket is not None and actual_tokens is not None:
+            self.tokens_bucket.debit(actual_tokens - estimated_tokens)
+
+        if status_code == 429:
+            self.throttled += 1
+            self._decrease(self.config.backoff_factor, latency)
+        elif status_code is None or status_code >= 500:
+            self._decrease(self.config.backoff_factor, latency)
+        elif status_code == 200:
+            if self._congested(label, latency):
+                self._decrease(self.config.latency_backoff_factor, latency)
+            else:
+                # 加性增大：每个窗口的请求都成功时窗口约增大 1
+                self.window = min(self.config.max_concurrency, self.window + 1.0 / self.window)
+        self._wake()
+
+    def abandon(self):
+        """请求被取消：只归还并发名额，不作为拥塞信号"""
+        self.in_flight -= 1
+        self._wake()
+
+    def _congested(self, label: str, latency: float) -> bool:
+        """记录延迟样本，平滑延迟明显高于该标签的延迟基线时视为拥塞"""
+        latencies = self._latencies.get(label)
+        if latencies is None:
+            latencies = self._latencies[label] = deque(maxlen=LATENCY_BASELINE_WINDOW)
+        latencies.append(latency)
+        smoothed = self._smoothed_latency.get(label, latency)
+        smoothed += LATENCY_SMOOTHING * (latency - smoothed)
+        self._smoothed_latency[label] = smoothed
+        return len(latencies) >= 10 and smoothed > min(latencies) * LATENCY_TOLERANCE
+
+    def _decrease(self, factor: float, latency: float):
+        # 同一批在途请求的失败只减小一次窗口
+        now = time.monotonic()
+        if now - self._last_decrease < latency:
+            return
+        self._last_decrease = now
+        self.window = max(float(self.config.min_concurrency), self.window * factor)
+
+    def describe(self) -> str:
+        average_wait = self.wait_seconds / self.admitted if self.admitted else 0.0
+        return (f"限流：并发窗口 {self.window:.1f}（在途 {self.in_flight}），排队 {self.queue_depth}"
+                f"（峰值 {self.max_queue_depth}），放行 {self.admitted} 次，平均等待 {average_wait:.3f}s，"
+                f"429 {self.throttled} 次")
+
+
+# 全局限流器：所有智能体的模型请求共用
+model_limiter = ModelCallLimiter(LimiterConfig.from_env())
@@ -0,0 +1,133 @@
+"""
+ReAct 循环预算与指标
+按智能体设置推理迭代次数与 token 预算，简单的状态查询与多步故障诊断不再共用同一个上限
+每轮记录迭代次数、工具调用次数、token 用量与结束原因，用于按真实流量调整预算
+
+预算可通过环境变量覆盖：<AGENT>_MAX_ITERS / <AGENT>_MAX_TOKENS，例如 HEALTH_AGENT_MAX_ITERS=2；
+MAX_TOKENS 为单轮回复内所有模型调用的输入+输出 token 上限，0 表示不限制
+"""
+
+import os
+import threading
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from bench_stats import percentile
+
+# ==================== 预算 ====================
+
+@dataclass(frozen=True)
+class AgentBudget:
+    """单个智能体每轮回复的预算"""
+    max_iters: int
+    max_tokens: int = 0
+
+
+DEFAULT_BUDGETS = {
+    "main_agent": AgentBudget(4, 8000),             # 路由：一次转发，最多协调少数几个智能体
+    "dispatch_agent": AgentBudget(4, 8000),
+    "maintenance_agent": AgentBudget(8, 16000),     # 故障诊断可能需要多步排查
+    "energy_analysis_agent": AgentBudget(5, 10000),
+    "health_agent": AgentBudget(3, 6000),           # 以单项状态查询为主
+    "report_agent": AgentBudget(4, 8000),
+    "inspection_agent": AgentBudget(6, 12000),
+}
+FALLBACK_BUDGET = AgentBudget(10, 0)
+MAX_RECORDED_TURNS = 1000           # 每个智能体保留最近多少轮的指标
+
+
+def load_budget(agent_name: str) -> AgentBudget:
+    """智能体的预算：环境变量优先，其次为默认预算"""
+    budget = DEFAULT_BUDGETS.get(agent_name, FALLBACK_BUDGET)
+    prefix = agent_name.upper()
+    max_iters = os.getenv(f"{prefix}_MAX_ITERS")
+    max_tokens = os.getenv(f"{prefix}_MAX_TOKENS")
+    return AgentBudget(
+        int(max_iters) if max_iters else budget.max_iters,
+        int(max_tokens) if max_tokens else budget.max_tokens,
+    )
+
+
+# ==================== 单轮指标 ====================
+
+# 结束原因
+STOP_ANSWERED = "answered"              # 模型给出文本回复
+STOP_DIRECT_RETURN = "direct_return"    # 工具结果即答案，未再调用模型
+STOP_TOKEN_BUDGET = "token_budget"      # token 预算用尽
+STOP_MAX_ITERS = "max_iters"            # 迭代次数用尽，模型总结后结束
+
+
+@dataclass
+class ReActTurnMetrics:
+    """一个智能体一轮回复的 ReAct 循环指标"""
+    agent_name: str
+    budget: AgentBudget
+    iterations: int = 0
+    model_calls: int = 0
+    tool_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    stop_reason: str = STOP_ANSWERED
+    final_tool_calls: set = field(default_factory=set)   # 工具声明已完整回答问题的调用 id
+
+    @property
+    def tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    @property
+    def over_token_budget(self) -> bool:
+        return bool(self.budget.max_tokens) and self.tokens >= self.budget.max_tokens
+
+    def describe(self) -> str:
+        return (f"{self.agent_name}：迭代 {self.iterations}/{self.budget.max_iters}，"
+                f"模型调用 {self.model_calls} 次，工具调用 {self.tool_calls} 次，"
+                f"tokens {self.tokens}，结束原因 {self.stop_reason}")
+
+
+# 当前正在运行的 ReAct 回复：工具后处理函数通过它标记"已完整回答"的工具调用
+current_react_turn: ContextVar = ContextVar("current_react_turn", default=None)
+
+
+# ==================== 指标汇总 ====================
+
+class ReActMetricsLog:
+    """按智能体保留最近若干轮的指标"""
+
+    def __init__(self):
+        self.turns = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics: ReActTurnMetrics):
+        with self._lock:
+            turns = self.turns.get(metrics.agent_name)
+            if turns is None:
+                turns = self.turns[metrics.agent_name] = deque(maxlen=MAX_RECORDED_TURNS)
+            turns.append(metrics)
+
+    def reset(self):
+        with self._lock:
+            self.turns.clear()
+
+    def summary(self) -> list:
+        """每个智能体一行：轮数、平均/P95/最大迭代次数、平均工具调用、平均/P95 tokens、结束原因分布"""
+        with self._lock:
+            turns = {name: list(items) for name, items in self.turns.items()}
+        lines = []
+        for name, items in turns.items():
+            iterations = [m.iterations for m in items]
+            tokens = [m.tokens for m in items]
+            reasons = Counter(m.stop_reason for m in items)
+            lines.append(
+                f"  {name}: {len(items)} 轮，迭代 平均 {sum(iterations) / len(items):.1f} / "
+                f"P95 {percentile(iterations, 95):.0f} / 最大 {max(iterations)}"
+                f"（预算 {items[-1].budget.max_iters}），"
+                f"工具调用 平均 {sum(m.tool_calls for m in items) / len(items):.1f}，"
+                f"tokens 平均 {sum(tokens) / len(items):.0f} / P95 {percentile(tokens, 95):.0f}，"
+                f"结束原因 {dict(reasons)}"
+            )
+        return lines
+
+
+# 全局指标实例
+react_metrics = ReActMetricsLog()
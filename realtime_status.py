@@ -0,0 +1,79 @@
+"""
+空压机实时状态看板
+保存每台空压机最近一次的传感器读数，get_realtime_status 工具直接读取，O(1)
+数据由 sensor_ingestion 管道批量写入；超过 STALE_SECONDS 未更新时在回复中注明数据时效
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+from equipment import normalize_equipment_id
+
+# ==================== 配置 ====================
+
+STALE_SECONDS = 30.0        # 超过该秒数未更新的读数视为过期
+
+# 回复中展示的通道：(通道名, 名称, 单位, 小数位)
+DISPLAY_CHANNELS = (
+    ("exhaust_temperature", "排气温度", "°C", 1),
+    ("exhaust_pressure", "排气压力", " MPa", 2),
+    ("vibration", "振动", " mm/s", 1),
+    ("current", "电流", "A", 0),
+    ("load_ratio", "负载率", "%", 0),
+)
+
+
+@dataclass
+class StatusSnapshot:
+    """单台设备最近一次读数"""
+    equipment_id: str
+    timestamp: float
+    values: dict = field(default_factory=dict)
+    running: bool = True
+    fault: bool = False
+
+    def describe(self, now: float | None = None) -> str:
+        state = "故障停机" if self.fault else "运行中" if self.running else "停机"
+        readings = "，".join(
+            f"{label} {self.values[name]:.{digits}f}{unit}"
+            for name, label, unit, digits in DISPLAY_CHANNELS if name in self.values
+        )
+        age = (time.time() if now is None else now) - self.timestamp
+        freshness = f"（数据已 {age:.0f} 秒未更新）" if age > STALE_SECONDS else ""
+        return f"设备 {self.equipment_id} 实时状态：{state}，{readings}{freshness}"
+
+
+# ==================== 状态看板 ====================
+
+class RealtimeStatusBoard:
+    """全站最近读数，按设备编号索引"""
+
+    def __init__(self):
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def update(self, equipment_id: str, timestamp: float, values: dict,
+               running: bool = True, fault: bool = False):
+        """写入一次读数，早于已有读数的乱序样本忽略"""
+        key = normalize_equipment_id(equipment_id)
+        with self._lock:
+            current = self._latest.get(key)
+            if current is not None and current.timestamp > timestamp:
+                return
+            self._latest[key] = StatusSnapshot(key, timestamp, dict(values), running, fault)
+
+    def get(self, equipment_id: str) -> StatusSnapshot | None:
+        with self._lock:
+            return self._latest.get(normalize_equipment_id(equipment_id))
+
+    def describe(self, equipment_id: str) -> str:
+        """get_realtime_status 工具的返回文本"""
+        snapshot = self.get(equipment_id)
+        if snapshot is None:
+            return f"设备 {equipment_id} 暂无实时数据，请确认设备编号或数据接入状态"
+        return snapshot.describe()
+
+
+# 全局状态看板实例，供三种实现的工具共享
+realtime_status = RealtimeStatusBoard()
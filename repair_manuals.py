@@ -0,0 +1,410 @@
+"""
+维修手册检索（字符二元组 BM25 倒排索引）
+get_repair_guide 在维修手册段落中检索与故障描述最相关的前 k 段，不需要模型二次"查阅"：
+1. 段落：内置常见故障维修要点 + REPAIR_MANUAL_DIR（默认 ./data/manuals）下的 .txt/.md 手册，
+   按标题与空行切分，单段不超过 PASSAGE_CHARS 字
+2. 分词：NFKC、小写、去除空白与标点后取相邻字符二元组（中文无需分词，英文型号同样适用），
+   二元组编码为 int64（高位前一字符码点、低位后一字符码点），无冲突
+3. 索引：构建时直接算好每个倒排项的 BM25 权重（idf × tf 饱和与长度归一化），查询只需
+   二分查找词项 → 取倒排切片 → bincount 累加 → argpartition 取前 k
+4. 持久化：REPAIR_INDEX_DIR（默认 ./data/repair_index）下的 .npy 数组与段落文本，以 np.load(mmap_mode="r")
+   内存映射加载，只有查询涉及的倒排页会读入内存；meta.json 记录手册指纹，手册变化时首次检索自动重建
+
+命令行：
+    python repair_manuals.py build                  重建索引
+    python repair_manuals.py search 排气温度高 -k 3   检索
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+
+import numpy as np
+
+# ==================== 配置 ====================
+
+DEFAULT_MANUAL_DIR = os.getenv("REPAIR_MANUAL_DIR") or "./data/manuals"
+DEFAULT_INDEX_DIR = os.getenv("REPAIR_INDEX_DIR") or "./data/repair_index"
+TOP_K = int(os.getenv("REPAIR_GUIDE_TOP_K") or 3)
+SCHEMA_VERSION = 1
+PASSAGE_CHARS = 500             # 手册切分时单段的最大字数
+SNIPPET_CHARS = 300             # 工具返回的单段最大字数
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_BOOST = 2                 # 标题在索引文本中重复的次数，标题命中的段落排序靠前
+MANUAL_SUFFIXES = (".txt", ".md")
+BUILTIN_SOURCE = "内置维修要点"
+
+
+@dataclass(frozen=True)
+class Passage:
+    """手册段落"""
+    title: str
+    source: str
+    text: str
+
+
+@dataclass(frozen=True)
+class GuideHit:
+    """检索结果"""
+    passage: Passage
+    score: float
+
+    def snippet(self, limit: int = SNIPPET_CHARS) -> str:
+        text = self.passage.text
+        return text if len(text) <= limit else text[:limit] + "…"
+
+
+# 内置常见故障维修要点（标题, 内容），手册目录为空时同样可用
+BUILTIN_PASSAGES = (
+    ("轴承磨损", "1. 停机断电 2. 拆卸轴承盖 3. 检查轴承状态 4. 更换轴承 5. 重新组装"),
+    ("温度过高", "1. 检查冷却器 2. 清理散热片 3. 检查润滑油位 4. 检查环境通风"),
+    ("振动异常", "1. 检查地脚螺栓 2. 检查转子平衡 3. 检查联轴器对中 4. 检查轴承间隙"),
+    ("排气温度过高", "常见原因：润滑油不足或油品劣化、油冷却器脏堵、温控阀失效、环境温度高、风扇故障。"
+               "1. 检查油位并补油，油品劣化时换油 2. 清洗油冷却器芯体 3. 检查温控阀是否卡在旁通位置 "
+               "4. 检查冷却风扇转向与皮带 5. 改善机房通风，环境温度不超过 40℃"),
+    ("排气压力低", "常见原因：用气量超过排气量、进气阀未全开、空气滤芯堵塞、管路泄漏、压力设定值偏低。"
+              "1. 核对用气需求与机组排气量 2. 检查进气阀开度与伺服气路 3. 检查并更换空气滤芯 "
+              "4. 用检漏仪排查管网泄漏点 5. 核对加载/卸载压力设定"),
+    ("润滑油消耗大", "常见原因：油气分离器滤芯破损、回油管堵塞、油位过高、最小压力阀失效导致油气分离效果差。"
+               "1. 检查回油管视镜是否有油流 2. 清洗回油单向阀与节流孔 3. 更换油气分离器滤芯 "
+               "4. 检查最小压力阀开启压力 5. 将油位调整到正常范围"),
+    ("油气分离器压差大", "常见原因：分离器滤芯使用超期、润滑油劣化积碳。"
+                 "1. 压差超过 0.1 MPa 时更换油气分离器滤芯 2. 同时更换润滑油与油过滤器 3. 检查排气温度是否长期偏高"),
+    ("空气过滤器堵塞", "表现为进气负压增大、排气量下降、电流偏高。"
+                "1. 停机后取出空气滤芯 2. 用低压空气由内向外吹扫 3. 滤芯破损或吹扫后压差仍高时更换 4. 检查进气口周围粉尘源"),
+    ("油过滤器压差大", "1. 压差指示报警时停机泄压 2. 更换油过滤器并在密封圈上涂少量润滑油 3. 检查润滑油是否乳化或劣化 "
+                "4. 开机检查油路无泄漏"),
+    ("润滑油乳化", "常见原因：排气温度长期偏低导致冷凝水进入油中、冷却器内漏（水冷机组）。"
+              "1. 取油样观察，呈乳白色时立即换油 2. 检查温控阀，保证排气温度高于压力露点 3. 水冷机组检查冷却器是否内漏 "
+              "4. 减少机组频繁启停与长时间空载"),
+    ("电机过载跳闸", "常见原因：排气压力过高、电压偏低或缺相、主机卡滞、轴承损坏、热继电器设定偏小。"
+               "1. 检查三相电压与电流是否平衡 2. 核对排气压力设定不超过额定值 3. 断电后手动盘车检查主机是否卡滞 "
+               "4. 检查电机轴承 5. 核对热继电器整定值"),
+    ("无法启动", "1. 检查电源、急停按钮与控制回路保险 2. 查看控制器故障代码 3. 检查相序，相序错误时调换任意两相 "
+             "4. 确认系统内压力已泄放（带压启动保护） 5. 检查启动接触器与星三角转换时间继电器"),
+    ("电机反转", "表现为启动后排气压力不升、噪声异常。1. 立即停机，反转运行不得超过数秒 2. 调换电源任意两相 "
+             "3. 点动确认转向与机体箭头一致 4. 检查相序保护继电器"),
+    ("安全阀起跳", "常见原因：压力开关或传感器失效导致不卸载、进气阀不关闭、安全阀整定值漂移。"
+              "1. 检查卸载压力设定与压力传感器读数 2. 检查进气阀卸载动作与电磁阀 3. 安全阀送检校验，不合格时更换 "
+              "4. 严禁拆除或调高安全阀"),
+    ("频繁加卸载", "常见原因：储气罐容积偏小、加卸载压差设定过小、用气波动大、管网泄漏。"
+              "1. 适当加大加卸载压差 2. 增设或扩容储气罐 3. 排查管网泄漏 4. 多机运行时采用联控或变频机调峰"),
+    ("进气阀卡滞", "表现为不加载或不卸载、排气量不足。1. 检查进气阀伺服气缸与膜片 2. 清洗阀板与阀座积碳 "
+              "3. 检查控制电磁阀通断 4. 更换磨损的密封件"),
+    ("最小压力阀故障", "表现为启动后建压慢、油耗增大或停机后管网气体倒流。1. 拆检阀芯与弹簧 2. 清洗阀座 "
+                "3. 更换失效弹簧与密封圈 4. 校核开启压力（一般约 0.45 MPa）"),
+    ("压力传感器故障", "表现为压力显示跳变、与机械压力表不一致。1. 对比机械压力表读数 2. 检查传感器接线与屏蔽 "
+                "3. 用标准压力源校验 4. 超差时更换传感器"),
+    ("温度传感器故障", "表现为温度显示异常跳变或恒为极值。1. 检查热电阻接线与端子 2. 测量电阻值与温度对照表 "
+                "3. 更换损坏的传感器"),
+    ("冷却风扇故障", "1. 检查风扇电机电源与热保护 2. 检查扇叶是否破损、积灰 3. 检查风扇轴承 4. 核对风扇转向"),
+    ("冷却水温度高", "适用于水冷机组。1. 检查冷却水进水温度（一般不超过 32℃）与流量 2. 清洗冷却器水侧结垢 "
+               "3. 检查冷却塔风机与填料 4. 检查水泵与阀门开度"),
+    ("冷干机露点高", "常见原因：冷媒不足、冷凝器脏堵、进气温度过高、处理气量超过额定值。"
+               "1. 检查冷媒压力，泄漏时补漏后加注 2. 清洗冷凝器 3. 降低进气温度 4. 核对处理气量 5. 检查自动排水器"),
+    ("自动排水阀故障", "表现为储气罐或管路积水、排水阀常排气。1. 检查排水阀滤网与阀芯 2. 清洗排水通道 "
+                "3. 检查电子排水阀定时器设定 4. 更换失效的排水阀"),
+    ("管路泄漏", "1. 用超声波检漏仪或肥皂水排查接头、软管与阀门 2. 标记并分级处理泄漏点 3. 更换老化密封件与软管 "
+             "4. 停用管段加装隔离阀"),
+    ("皮带打滑", "表现为皮带发热、尖叫、排气量下降。1. 停机断电 2. 检查皮带张紧度并调整 3. 皮带磨损或开裂时成组更换 "
+             "4. 检查皮带轮对中"),
+    ("联轴器磨损", "表现为振动增大、弹性体碎屑。1. 停机断电并锁定 2. 检查弹性体磨损 3. 更换弹性体 4. 重新校正电机与主机对中"),
+    ("噪声异常", "1. 区分噪声来源（主机、电机、风扇、阀门） 2. 检查轴承与齿轮 3. 检查紧固件松动 4. 检查进气阀与放空阀是否异常排气"),
+    ("变频器报警", "1. 记录变频器故障代码 2. 过流报警检查电机与负载 3. 过压报警检查减速时间与制动单元 "
+              "4. 过热报警清理散热风道 5. 查阅变频器手册复位"),
+)
+
+
+# ==================== 分词 ====================
+
+_CHAR_SHIFT = 21                # Unicode 码点不超过 21 位
+
+
+def _clean(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(char for char in text if unicodedata.category(char)[0] not in "PZSC")
+
+
+def bigram_keys(text: str) -> np.ndarray:
+    """文本的字符二元组编码（int64，按出现顺序，可重复）"""
+    codes = np.frombuffer(_clean(text).encode("utf-32-le"), dtype="<u4").astype(np.int64)
+    if len(codes) == 1:
+        return codes << _CHAR_SHIFT
+    return (codes[:-1] << _CHAR_SHIFT) | codes[1:]
+
+
+# ==================== 手册段落 ====================
+
+_HEADING = re.compile(r"^\s*#+\s*(.+?)\s*#*\s*$")
+
+
+def split_manual(text: str, title: str, source: str) -> list:
+    """按 Markdown 标题与空行切分手册，同一标题下的相邻段合并到不超过 PASSAGE_CHARS 字"""
+    passages, buffer = [], ""
+
+    def flush():
+        nonlocal buffer
+        if buffer.strip():
+            passages.append(Passage(title, source, buffer.strip()))
+        buffer = ""
+
+    for block in re.split(r"\n\s*\n", text):
+        lines = block.strip().splitlines()
+        if not lines:
+            continue
+        heading = _HEADING.match(lines[0])
+        if heading:
+            flush()
+            title, lines = heading.group(1), lines[1:]
+        paragraph = " ".join(line.strip() for line in lines if line.strip())
+        if not paragraph:
+            continue
+        if buffer and len(buffer) + len(paragraph) > PASSAGE_CHARS:
+            flush()
+        while len(paragraph) > PASSAGE_CHARS:
+            passages.append(Passage(title, source, paragraph[:PASSAGE_CHARS]))
+            paragraph = paragraph[PASSAGE_CHARS:]
+        buffer = f"{buffer} {paragraph}" if buffer else paragraph
+    flush()
+    return passages
+
+
+def manual_files(manual_dir: str) -> list:
+    """手册目录下的 .txt/.md 文件（相对路径，排序）"""
+    if not os.path.isdir(manual_dir):
+        return []
+    paths = []
+    for directory, _, names in os.walk(manual_dir):
+        paths.extend(os.path.relpath(os.path.join(directory, name), manual_dir)
+                     for name in names if name.endswith(MANUAL_SUFFIXES))
+    return sorted(paths)
+
+
+def load_passages(manual_dir: str) -> list:
+    """内置维修要点 + 手册目录下的全部段落"""
+    passages = [Passage(title, BUILTIN_SOURCE, text) for title, text in BUILTIN_PASSAGES]
+    for path in manual_files(manual_dir):
+        with open(os.path.join(manual_dir, path), encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        passages.extend(split_manual(text, os.path.splitext(os.path.basename(path))[0], path))
+    return passages
+
+
+def fingerprint(manual_dir: str) -> str:
+    """索引指纹：格式版本、BM25 参数、内置要点与各手册文件的大小和修改时间"""
+    digest = hashlib.sha1(json.dumps([SCHEMA_VERSION, BM25_K1, BM25_B, TITLE_BOOST, PASSAGE_CHARS, BUILTIN_PASSAGES],
+                                     ensure_ascii=False).encode("utf-8"))
+    for path in manual_files(manual_dir):
+        stat = os.stat(os.path.join(manual_dir, path))
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ==================== 索引构建 ====================
+
+ARRAYS = ("terms", "offsets", "docs", "weights", "text_offsets")
+
+
+def _save(directory: str, name: str, write):
+    """先写临时文件再替换，正在映射旧文件的进程不受影响"""
+    path = os.path.join(directory, name)
+    temp = f"{path}.tmp-{os.getpid()}"
+    with open(temp, "wb") as f:
+        write(f)
+    os.replace(temp, path)
+
+
+def build_index(passages: list, directory: str, source_fingerprint: str) -> dict:
+    """构建倒排索引并写入 directory，返回 meta
+
+    倒排项按 (词项, 段落) 排序，weights 为该项的 BM25 权重；meta.json 最后写入，作为索引完整的标志
+    """
+    keys_per_doc = [bigram_keys(f"{passage.title} " * TITLE_BOOST + passage.text) for passage in passages]
+    lengths = np.array([len(keys) for keys in keys_per_doc], dtype=np.float64)
+    count = len(passages)
+    average_length = float(lengths.mean()) if count else 0.0
+
+    all_keys = np.concatenate(keys_per_doc) if count else np.zeros(0, dtype=np.int64)
+    all_docs = np.repeat(np.arange(count, dtype=np.int32), lengths.astype(np.int64))
+    order = np.lexsort((all_docs, all_keys))
+    all_keys, all_docs = all_keys[order], all_docs[order]
+    # 相同 (词项, 段落) 的连续区间即一个倒排项，区间长度为词频
+    starts = np.flatnonzero(np.r_[True, (all_keys[1:] != all_keys[:-1]) | (all_docs[1:] != all_docs[:-1])])
+    tf = np.diff(np.r_[starts, len(all_keys)]).astype(np.float64)
+    posting_keys, docs = all_keys[starts], all_docs[starts]
+    terms, term_starts, df = np.unique(posting_keys, return_index=True, return_counts=True)
+
+    idf = np.log1p((count - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / (average_length or 1.0))
+    weights = (np.repeat(idf, df) * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+
+    encoded = [f"{passage.title}\x1f{passage.source}\x1f{passage.text}".encode("utf-8") for passage in passages]
+    text_offsets = np.r_[0, np.cumsum([len(item) for item in encoded], dtype=np.int64)].astype(np.int64)
+
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        "terms": terms.astype(np.int64),
+        "offsets": np.r_[term_starts, len(posting_keys)].astype(np.int64),
+        "docs": docs.astype(np.int32),
+        "weights": weights,
+        "text_offsets": text_offsets,
+    }
+    for name, array in arrays.items():
+        _save(directory, f"{name}.npy", lambda f, array=array: np.save(f, array))
+    _save(directory, "passages.bin", lambda f: f.write(b"".join(encoded)))
+    meta = {
+        "schema": SCHEMA_VERSION,
+        "fingerprint": source_fingerprint,
+        "passages": count,
+        "terms": len(terms),
+        "postings": len(posting_keys),
+        "average_length": average_length,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    _save(directory, "meta.json", lambda f: f.write(json.dumps(meta, ensure_ascii=False, indent=1).encode("utf-8")))
+    return meta
+
+
+# ==================== 检索 ====================
+
+class RepairManualIndex:
+    """维修手册检索：首次检索时加载（指纹不一致时先重建）内存映射索引，之后每次检索为毫秒级"""
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, manual_dir: str = DEFAULT_MANUAL_DIR):
+        self.index_dir = index_dir
+        self.manual_dir = manual_dir
+        self.meta = None
+        self._arrays = {}
+        self._text = None
+        self._lock = threading.Lock()
+        self.load_seconds = 0.0
+        self.build_seconds = 0.0
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    def _load(self) -> bool:
+        """加载与当前手册指纹一致的索引，不存在或不一致时返回 False"""
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("schema") != SCHEMA_VERSION or meta.get("fingerprint") != fingerprint(self.manual_dir):
+            return False
+        try:
+            arrays = {name: np.load(os.path.join(self.index_dir, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        except (OSError, ValueError):
+            return False
+        text_path = os.path.join(self.index_dir, "passages.bin")
+        size = os.path.getsize(text_path) if os.path.exists(text_path) else -1
+        if size != int(arrays["text_offsets"][-1]) or len(arrays["terms"]) != meta["terms"]:
+            return False
+        # 空文件不能映射
+        self._text = np.memmap(text_path, dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+        self._arrays, self.meta = arrays, meta
+        return True
+
+    def ensure_loaded(self):
+        if self.meta is not None:
+            return
+        with self._lock:
+            if self.meta is not None:
+                return
+            started = time.perf_counter()
+            if not self._load():
+                self.rebuild()
+            self.load_seconds = time.perf_counter() - started
+
+    def rebuild(self) -> dict:
+        """从手册重建索引并重新加载"""
+        started = time.perf_counter()
+        build_index(load_passages(self.manual_dir), self.index_dir, fingerprint(self.manual_dir))
+        self.build_seconds = time.perf_counter() - started
+        if not self._load():
+            raise RuntimeError(f"维修手册索引写入后无法加载：{self.index_dir}")
+        return self.meta
+
+    def passage(self, doc: int) -> Passage:
+        offsets = self._arrays["text_offsets"]
+        raw = bytes(self._text[int(offsets[doc]):int(offsets[doc + 1])]).decode("utf-8")
+        return Passage(*raw.split("\x1f", 2))
+
+    def search(self, query: str, k: int = TOP_K) -> list:
+        """检索与 query 最相关的前 k 段，只返回得分大于 0 的段落"""
+        self.ensure_loaded()
+        started = time.perf_counter()
+        keys, counts = np.unique(bigram_keys(query), return_counts=True)
+        terms, offsets = self._arrays["terms"], self._arrays["offsets"]
+        index = np.searchsorted(terms, keys)
+        found = index < len(terms)
+        found[found] = terms[index[found]] == keys[found]
+        docs, weights = [], []
+        for term, repeat in zip(index[found], counts[found]):
+            start, end = int(offsets[term]), int(offsets[term + 1])
+            docs.append(self._arrays["docs"][start:end])
+            weights.append(self._arrays["weights"][start:end] * repeat)
+        hits = []
+        if docs and k > 0:
+            scores = np.bincount(np.concatenate(docs), weights=np.concatenate(weights),
+                                 minlength=self.meta["passages"])
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            hits = [GuideHit(self.passage(int(doc)), float(scores[doc])) for doc in top if scores[doc] > 0]
+        with self._lock:
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - started
+        return hits
+
+    def describe_guide(self, fault_type: str, k: int = TOP_K) -> str:
+        """get_repair_guide 工具的返回文本"""
+        hits = self.search(fault_type, k)
+        if not hits:
+            return f"未找到'{fault_type}'的维修指南，请联系技术支持"
+        lines = [f"“{fault_type}”维修指南（检索到 {len(hits)} 条）："]
+        for index, hit in enumerate(hits, start=1):
+            lines.append(f"{index}. 【{hit.passage.title}】{hit.snippet()}（来源：{hit.passage.source}）")
+        return "\n".join(lines)
+
+    def describe(self) -> str:
+        meta = self.meta or {}
+        average = self.search_seconds / self.searches * 1000 if self.searches else 0.0
+        return (f"维修手册索引：{meta.get('passages', 0)} 段，{meta.get('terms', 0)} 个词项，"
+                f"加载 {self.load_seconds * 1000:.1f}ms（其中重建 {self.build_seconds * 1000:.1f}ms），"
+                f"检索 {self.searches} 次，平均 {average:.2f}ms")
+
+
+# 全局检索实例，供三种实现的 get_repair_guide 共享
+repair_manuals = RepairManualIndex()
+
+
+# ==================== 命令行入口 ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="维修手册检索索引")
+    parser.add_argument("command", choices=("build", "search"))
+    parser.add_argument("query", nargs="?", help="检索文本（search）")
+    parser.add_argument("-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        meta = repair_manuals.rebuild()
+        print(f"已重建：{repair_manuals.index_dir}（手册目录 {repair_manuals.manual_dir}），"
+              f"{meta['passages']} 段，{meta['terms']} 个词项，{meta['postings']} 个倒排项，"
+              f"耗时 {repair_manuals.build_seconds:.2f}s")
+        return
+    if not args.query:
+        parser.error("search 需要检索文本")
+    print(repair_manuals.describe_guide(args.query, args.k))
+    print(repair_manuals.describe())
+
+
+if __name__ == "__main__":
+    main()
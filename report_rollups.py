@@ -0,0 +1,194 @@
+"""
+空压站运营报告物化汇总
+数据到达时增量更新按天的物化汇总，月报由日汇总合并得到，不回扫原始样本
+生成的报告按 (周期, 数据水位) 缓存，新数据到达前相同请求直接返回
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from equipment import normalize_equipment_id
+
+# ==================== 配置 ====================
+
+ELECTRICITY_PRICE = float(os.getenv("ELECTRICITY_PRICE") or 0.7)     # 电价（元/kWh）
+MAX_SAMPLE_GAP_SECONDS = 300.0      # 相邻样本间隔超过该值视为数据中断，不做积分
+
+
+# ==================== 汇总结构 ====================
+
+@dataclass
+class EquipmentTotals:
+    """单台设备在汇总周期内的累计量"""
+    air_m3: float = 0.0
+    energy_kwh: float = 0.0
+    run_seconds: float = 0.0
+    fault_seconds: float = 0.0
+    observed_seconds: float = 0.0
+    load_seconds: float = 0.0       # 负载率 × 运行秒数，用于计算加权平均负载率
+    faults: int = 0
+
+    def merge(self, other: "EquipmentTotals"):
+        self.air_m3 += other.air_m3
+        self.energy_kwh += other.energy_kwh
+        self.run_seconds += other.run_seconds
+        self.fault_seconds += other.fault_seconds
+        self.observed_seconds += other.observed_seconds
+        self.load_seconds += other.load_seconds
+        self.faults += other.faults
+
+
+@dataclass
+class Rollup:
+    """一个汇总周期（日或月）的物化汇总"""
+    period: str
+    equipment: dict = field(default_factory=dict)
+    version: int = 0
+
+    def totals(self) -> EquipmentTotals:
+        total = EquipmentTotals()
+        for totals in self.equipment.values():
+            total.merge(totals)
+        return total
+
+    def merge(self, other: "Rollup"):
+        for equipment_id, totals in other.equipment.items():
+            self.equipment.setdefault(equipment_id, EquipmentTotals()).merge(totals)
+        self.version += other.version
+
+    def describe(self, title: str) -> str:
+        total = self.totals()
+        if total.observed_seconds <= 0:
+            return f"{title}：{self.period} 暂无运行数据"
+        load = total.load_seconds / total.run_seconds if total.run_seconds else 0.0
+        availability = 1.0 - total.fault_seconds / total.observed_seconds
+        specific = total.energy_kwh / total.air_m3 if total.air_m3 else 0.0
+        fault_text = f"故障 {total.faults} 次" if total.faults else "无重大故障"
+        return (f"{title}（{self.period}）：产气量 {total.air_m3:,.0f} m³，总能耗 {total.energy_kwh:,.0f} kWh，"
+                f"单位产气能耗 {specific:.3f} kWh/m³，设备平均负载率 {load:.0%}，"
+                f"能耗成本 ¥{total.energy_kwh * ELECTRICITY_PRICE:,.0f}，设备可用率 {availability:.1%}，"
+                f"{fault_text}（{len(self.equipment)} 台设备）")
+
+
+# ==================== 汇总存储 ====================
+
+class RollupStore:
+    """日汇总增量维护 + 月报由日汇总合并 + 报告缓存"""
+
+    def __init__(self):
+        self._daily = {}
+        self._month_versions = {}
+        self._last_sample = {}
+        self._report_cache = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.covered_since = None       # 最早写入的样本时间，此前的日/月汇总不完整（见 query_planner）
+        self.version = 0                # 每写入一个样本加 1，供答案缓存判断数据是否变化
+
+    @staticmethod
+    def day_key(timestamp: float) -> str:
+        return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+    @staticmethod
+    def month_key(timestamp: float) -> str:
+        return time.strftime("%Y-%m", time.localtime(timestamp))
+
+    def ingest(self, equipment_id: str, timestamp: float, flow_m3_per_min: float,
+               power_kw: float, load_ratio: float, running: bool, fault: bool = False):
+        """写入一个运行样本，按与上一个样本的时间间隔积分到当天汇总，O(1)
+
+        load_ratio 取值 0-1
+        """
+        key = normalize_equipment_id(equipment_id)
+        with self._lock:
+            self.version += 1
+            if self.covered_since is None or timestamp < self.covered_since:
+                self.covered_since = timestamp
+            previous = self._last_sample.get(key)
+            self._last_sample[key] = (timestamp, fault)
+            if previous is None:
+                return
+            last_timestamp, last_fault = previous
+            dt = timestamp - last_timestamp
+            if dt <= 0 or dt > MAX_SAMPLE_GAP_SECONDS:
+                return
+
+            day = self.day_key(timestamp)
+            rollup = self._daily.get(day)
+            if rollup is None:
+                rollup = self._daily[day] = Rollup(day)
+            totals = rollup.equipment.get(key)
+            if totals is None:
+                totals = rollup.equipment[key] = EquipmentTotals()
+
+            totals.observed_seconds += dt
+            if running:
+                totals.run_seconds += dt
+                totals.load_seconds += load_ratio * dt
+                totals.air_m3 += flow_m3_per_min * dt / 60.0
+            totals.energy_kwh += power_kw * dt / 3600.0
+            if fault:
+                totals.fault_seconds += dt
+                if not last_fault:
+                    totals.faults += 1
+
+            rollup.version += 1
+            month = day[:7]
+            self._month_versions[month] = self._month_versions.get(month, 0) + 1
+
+    def watermark(self, period: str) -> int:
+        """周期的数据水位：日为日汇总版本号，月为当月所有日汇总版本号之和"""
+        with self._lock:
+            if len(period) == 7:
+                return self._month_versions.get(period, 0)
+            rollup = self._daily.get(period)
+            return rollup.version if rollup else 0
+
+    def daily(self, day: str) -> Rollup:
+        """指定日期（YYYY-MM-DD）的日汇总快照"""
+        with self._lock:
+            snapshot = Rollup(day)
+            rollup = self._daily.get(day)
+            if rollup is not None:
+                snapshot.merge(rollup)
+            return snapshot
+
+    def monthly(self, month: str) -> Rollup:
+        """指定月份（YYYY-MM）的月汇总，由当月日汇总合并得到"""
+        with self._lock:
+            result = Rollup(month)
+            for day, rollup in self._daily.items():
+                if day.startswith(month):
+                    result.merge(rollup)
+            return result
+
+    def _cached_report(self, kind: str, period: str, build) -> str:
+        watermark = self.watermark(period)
+        key = (kind, period)
+        with self._lock:
+            cached = self._report_cache.get(key)
+            if cached is not None and cached[0] == watermark:
+                self.cache_hits += 1
+                return cached[1]
+            self.cache_misses += 1
+        text = build()
+        with self._lock:
+            self._report_cache[key] = (watermark, text)
+        return text
+
+    def daily_report(self, day: str | None = None) -> str:
+        """generate_daily_report 工具的返回文本，默认今天"""
+        day = day or self.day_key(time.time())
+        return self._cached_report("daily", day, lambda: self.daily(day).describe("日报摘要"))
+
+    def monthly_report(self, month: str | None = None) -> str:
+        """generate_monthly_report 工具的返回文本，默认本月"""
+        month = month or self.month_key(time.time())
+        return self._cached_report("monthly", month, lambda: self.monthly(month).describe("月报摘要"))
+
+
+# 全局汇总存储实例，供三种实现的工具共享
+report_rollups = RollupStore()
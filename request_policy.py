@@ -0,0 +1,257 @@
+"""
+模型请求策略
+在 httpx 传输层统一实现重试、抖动退避、截止时间与对冲请求，三种实现的模型客户端共用：
+1. 重试：连接错误、超时与 408/409/429/5xx 响应按指数退避 + 全抖动重试，遵守 Retry-After
+2. 截止时间：单次模型请求（含重试与对冲）不超过 MODEL_REQUEST_DEADLINE 秒，剩余时间不足时不再重试
+3. 对冲：开启 MODEL_HEDGING=1 后，请求超过该智能体近期延迟的 P95 仍未返回时发送一个副本，先返回者胜出
+4. 限流：每次实际发送（含重试与对冲副本）前向共享限流器获取许可（见 rate_limiter.py）
+5. 熔断：熔断器断开时不发送请求，直接抛出 CircuitOpenError；每个请求的最终结果计入熔断统计（见 circuit_breaker.py），
+   最终仍为 409/429 的请求不计入
+
+由于重试在此统一处理，各模型客户端需关闭 SDK 自带的重试（max_retries=0）
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import httpx
+
+from bench_stats import percentile
+from circuit_breaker import CircuitBreaker, CircuitOpenError, model_breaker
+from rate_limiter import ModelCallLimiter, model_limiter
+from token_usage import parse_usage
+
+# ==================== 配置 ====================
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+# 限流（429）与冲突（409）是服务正常拒绝，由重试与限流器处理，不计入熔断统计（避免自身的突发流量触发熔断）
+BREAKER_NEUTRAL_STATUS = frozenset({409, 429})
+LATENCY_WINDOW = 200        # 每个标签保留最近多少次成功请求的延迟用于估计 P95
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """单次模型请求的重试、截止时间与对冲策略"""
+    max_retries: int = 2
+    base_delay: float = 0.5             # 退避基数（秒），第 n 次重试的退避上限为 base_delay * 2^n
+    max_delay: float = 8.0              # 退避上限（秒）
+    deadline: float = 120.0             # 含重试与对冲的总时限（秒）
+    hedging: bool = False
+    hedge_quantile: float = 95.0
+    hedge_min_samples: int = 20         # 延迟样本不足时使用 hedge_initial_delay
+    hedge_initial_delay: float = 5.0
+    hedge_min_delay: float = 0.05
+
+    @classmethod
+    def from_env(cls) -> "RequestPolicy":
+        return cls(
+            max_retries=int(os.getenv("MODEL_MAX_RETRIES") or cls.max_retries),
+            base_delay=_env_float("MODEL_RETRY_BASE_DELAY", cls.base_delay),
+            max_delay=_env_float("MODEL_RETRY_MAX_DELAY", cls.max_delay),
+            deadline=_env_float("MODEL_REQUEST_DEADLINE", cls.deadline),
+            hedging=os.getenv("MODEL_HEDGING") == "1",
+            hedge_quantile=_env_float("MODEL_HEDGE_QUANTILE", cls.hedge_quantile),
+            hedge_initial_delay=_env_float("MODEL_HEDGE_INITIAL_DELAY", cls.hedge_initial_delay),
+        )
+
+    def backoff(self, retry: int, response: httpx.Response | None = None) -> float:
+        """第 retry 次重试前的等待时间：全抖动指数退避，响应带 Retry-After 时至少等待该时长"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("retry-after", 0)))
+            except ValueError:
+                pass
+        return delay
+
+
+# ==================== 统计 ====================
+
+@dataclass
+class PolicyStats:
+    """请求策略统计"""
+    requests: int = 0
+    retries: int = 0
+    hedges: int = 0             # 发出的对冲副本数
+    hedge_wins: int = 0         # 对冲副本先于原请求返回的次数
+    deadline_exceeded: int = 0
+    failures: int = 0           # 重试用尽仍失败（异常或可重试状态码）
+    latencies: dict = field(default_factory=dict)
+
+    def observe(self, label: str, seconds: float):
+        window = self.latencies.get(label)
+        if window is None:
+            window = self.latencies[label] = deque(maxlen=LATENCY_WINDOW)
+        window.append(seconds)
+
+    def quantile(self, label: str, q: float, min_samples: int) -> float | None:
+        """标签近期成功请求延迟的分位数，样本不足时返回 None"""
+        window = self.latencies.get(label)
+        if window is None or len(window) < min_samples:
+            return None
+        return percentile(list(window), q)
+
+    def describe(self) -> str:
+        return (f"请求策略：请求 {self.requests} 次，重试 {self.retries} 次，"
+                f"对冲 {self.hedges} 次（副本胜出 {self.hedge_wins} 次），"
+                f"超过截止时间 {self.deadline_exceeded} 次，最终失败 {self.failures} 次")
+
+
+# 全局统计实例
+policy_stats = PolicyStats()
+
+
+# ==================== 传输层 ====================
+
+class PolicyTransport(httpx.AsyncBaseTransport):
+    """按 RequestPolicy 包装底层传输：每次尝试完整读取响应体后再判定成败"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, policy: RequestPolicy,
+                 label: str = "", stats: PolicyStats = policy_stats,
+                 limiter: ModelCallLimiter | None = model_limiter,
+                 breaker: CircuitBreaker | None = model_breaker):
+        self.transport = transport
+        self.policy = policy
+        self.label = label
+        self.stats = stats
+        self.limiter = limiter
+        self.breaker = breaker
+
+    async def _attempt(self, request: httpx.Request) -> httpx.Response:
+        if self.limiter is None:
+            return await self._send(request)
+        estimated = self.limiter.estimate_tokens(request.content)
+        await self.limiter.acquire(estimated)
+        started = time.perf_counter()
+        try:
+            response = await self._send(request)
+        except asyncio.CancelledError:
+            # 被取消（对冲落败、截止时间）不代表服务端拥塞，只归还名额
+            self.limiter.abandon()
+            raise
+        except BaseException:
+            self.limiter.release(time.perf_counter() - started, None, self.label, estimated)
+            raise
+        actual = self._total_tokens(response) if self.limiter.tokens_bucket is not None else None
+        self.limiter.release(time.perf_counter() - started, response.status_code, self.label, estimated, actual)
+        return response
+
+    @staticmethod
+    def _total_tokens(response: httpx.Response) -> int | None:
+        try:
+            usage = parse_usage(json.loads(response.read()))
+        except (ValueError, AttributeError, httpx.DecodingError):
+            return None
+        return usage.input_tokens + usage.output_tokens if usage else None
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        try:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+        if response.status_code == 200:
+            self.stats.observe(self.label, time.perf_counter() - started)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(raw),
+            request=request,
+            extensions=response.extensions,
+        )
+
+    def _hedge_delay(self) -> float:
+        observed = self.stats.quantile(self.label, self.policy.hedge_quantile, self.policy.hedge_min_samples)
+        if observed is None:
+            return self.policy.hedge_initial_delay
+        return max(self.policy.hedge_min_delay, observed)
+
+    async def _hedged_attempt(self, request: httpx.Request) -> httpx.Response:
+        """原请求超过延迟 P95 仍未返回时发送副本，返回先成功（非可重试状态）的响应"""
+        primary = asyncio.create_task(self._attempt(request))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay())
+            if not done:
+                self.stats.hedges += 1
+                tasks.add(asyncio.create_task(self._attempt(request)))
+            result = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS:
+                        if task is not primary:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    result = task
+            # 全部失败：返回最后一个结果，由外层按普通失败处理
+            return result.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.breaker is None:
+            return await self._handle(request)
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("模型服务熔断中，请求未发送", request=request)
+        started = time.monotonic()
+        try:
+            response = await self._handle(request)
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+        except Exception:
+            self.breaker.record(time.monotonic() - started, failed=True)
+            raise
+        if response.status_code in BREAKER_NEUTRAL_STATUS:
+            self.breaker.abandon()
+            return response
+        failed = response.status_code in RETRYABLE_STATUS or response.status_code >= 500
+        self.breaker.record(time.monotonic() - started, failed)
+        return response
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        """重试与截止时间循环"""
+        self.stats.requests += 1
+        deadline = time.monotonic() + self.policy.deadline
+        retry = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            error = None
+            response = None
+            try:
+                attempt = self._hedged_attempt(request) if self.policy.hedging else self._attempt(request)
+                response = await asyncio.wait_for(attempt, remaining)
+            except asyncio.TimeoutError:
+                self.stats.deadline_exceeded += 1
+                self.stats.failures += 1
+                raise httpx.ReadTimeout("模型请求超过截止时间", request=request) from None
+            except httpx.TransportError as exc:
+                error = exc
+
+            if response is not None and response.status_code not in RETRYABLE_STATUS:
+                return response
+            delay = self.policy.backoff(retry, response)
+            if retry >= self.policy.max_retries or delay >= deadline - time.monotonic():
+                self.stats.failures += 1
+                if response is not None:
+                    return response
+                raise error
+            retry += 1
+            self.stats.retries += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,272 @@
+"""
+空压机剩余使用寿命（RUL）在线估计引擎
+基于振动、排气温度、运行小时、润滑油品质等流式信号，增量维护每台空压机的退化状态
+每个样本 O(1) 更新，predict_maintenance 工具直接读取当前状态，无需回扫历史数据
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from equipment import normalize_equipment_id
+
+# ==================== 信号定义 ====================
+
+@dataclass(frozen=True)
+class SignalSpec:
+    """退化信号定义：正常值、维护阈值及越限后的维护动作"""
+    name: str
+    label: str
+    unit: str
+    nominal: float
+    limit: float
+    action: str
+
+    @property
+    def increasing(self) -> bool:
+        """信号是否随退化上升（润滑油品质随退化下降）"""
+        return self.limit > self.nominal
+
+
+SIGNAL_SPECS = (
+    SignalSpec("vibration", "振动", "mm/s", 1.8, 7.1, "检查轴承"),
+    SignalSpec("temperature", "排气温度", "°C", 85.0, 110.0, "检查冷却系统"),
+    SignalSpec("oil_quality", "润滑油品质", "%", 100.0, 60.0, "更换润滑油"),
+)
+
+SERVICE_INTERVAL_HOURS = 2000.0     # 例行保养周期（运行小时）
+TREND_TAU_HOURS = 168.0             # 趋势拟合的遗忘时间常数（运行小时）
+LEVEL_ALPHA = 0.05                  # 当前水平 EWMA 平滑系数
+UTILIZATION_ALPHA = 0.01            # 日均运行小时 EWMA 平滑系数
+MIN_SAMPLES = 30                    # 给出趋势预测所需的最少样本数
+MIN_SPAN_HOURS = 0.5                # 给出趋势预测所需的最短运行跨度
+MAX_HORIZON_DAYS = 365.0            # 超过该天数视为暂无维护需求
+
+
+@dataclass
+class SensorSample:
+    """单个传感器样本"""
+    vibration: float
+    temperature: float
+    runtime_hours: float
+    oil_quality: float
+    timestamp: float | None = None
+
+
+# ==================== 增量统计 ====================
+
+class OnlineTrend:
+    """带指数遗忘的加权在线线性回归（信号值 ~ 运行小时），每次更新 O(1)
+
+    采用 West 加权增量算法维护均值与协方差，避免 Σx² - (Σx)² 的数值抵消
+    """
+
+    __slots__ = ("weight", "mean_x", "mean_y", "cxx", "cxy", "last_x")
+
+    def __init__(self):
+        self.weight = 0.0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.cxx = 0.0
+        self.cxy = 0.0
+        self.last_x = None
+
+    def update(self, x: float, y: float, tau: float = TREND_TAU_HOURS):
+        # 按运行小时的推进量衰减历史权重，停机期间不衰减
+        if self.last_x is not None and x > self.last_x:
+            decay = math.exp(-(x - self.last_x) / tau)
+            self.weight *= decay
+            self.cxx *= decay
+            self.cxy *= decay
+        self.last_x = x
+
+        self.weight += 1.0
+        dx = x - self.mean_x
+        self.mean_x += dx / self.weight
+        self.mean_y += (y - self.mean_y) / self.weight
+        self.cxx += dx * (x - self.mean_x)
+        self.cxy += dx * (y - self.mean_y)
+
+    @property
+    def slope(self) -> float:
+        """趋势斜率（信号单位 / 运行小时）"""
+        if self.cxx <= 1e-12:
+            return 0.0
+        return self.cxy / self.cxx
+
+
+class SignalState:
+    """单个信号的退化状态：EWMA 当前水平 + 趋势拟合"""
+
+    __slots__ = ("level", "trend")
+
+    def __init__(self):
+        self.level = None
+        self.trend = OnlineTrend()
+
+    def update(self, runtime_hours: float, value: float):
+        if self.level is None:
+            self.level = value
+        else:
+            self.level += LEVEL_ALPHA * (value - self.level)
+        self.trend.update(runtime_hours, value)
+
+
+class DegradationState:
+    """单台空压机的退化状态"""
+
+    def __init__(self):
+        self.signals = {spec.name: SignalState() for spec in SIGNAL_SPECS}
+        self.samples = 0
+        self.first_runtime_hours = None
+        self.runtime_hours = 0.0
+        self.last_timestamp = None
+        self.hours_per_day = None
+
+    def update(self, sample: SensorSample):
+        timestamp = sample.timestamp if sample.timestamp is not None else time.time()
+
+        # 根据运行小时与墙钟时间的推进比例估计日均运行小时，用于将 RUL 换算为天数
+        if self.last_timestamp is not None and timestamp > self.last_timestamp:
+            elapsed_hours = (timestamp - self.last_timestamp) / 3600.0
+            ratio = min(max((sample.runtime_hours - self.runtime_hours) / elapsed_hours, 0.0), 1.0)
+            if self.hours_per_day is None:
+                self.hours_per_day = ratio * 24.0
+            else:
+                self.hours_per_day += UTILIZATION_ALPHA * (ratio * 24.0 - self.hours_per_day)
+        self.last_timestamp = timestamp
+
+        if self.first_runtime_hours is None:
+            self.first_runtime_hours = sample.runtime_hours
+        self.runtime_hours = sample.runtime_hours
+        self.samples += 1
+
+        for spec in SIGNAL_SPECS:
+            self.signals[spec.name].update(sample.runtime_hours, getattr(sample, spec.name))
+
+
+# ==================== 预测结果 ====================
+
+@dataclass
+class MaintenanceItem:
+    """单项维护预测"""
+    action: str
+    days: float
+    reason: str
+
+
+@dataclass
+class MaintenancePrediction:
+    """设备维护预测结果"""
+    equipment_id: str
+    samples: int
+    degradation: float
+    items: list
+
+    def describe(self) -> str:
+        """格式化为工具返回文本"""
+        if not self.items:
+            return (f"设备 {self.equipment_id} 预测性维护建议：各项指标暂无明显劣化趋势，"
+                    f"当前退化指数 {self.degradation:.2f}，按计划例行保养即可")
+        advices = "；".join(
+            f"{'已需要' if item.days <= 0 else f'预计{item.days:.0f}天后需要'}{item.action}（{item.reason}）"
+            for item in self.items
+        )
+        return (f"设备 {self.equipment_id} 预测性维护建议：{advices}；"
+                f"当前退化指数 {self.degradation:.2f}（基于 {self.samples} 个样本）")
+
+
+# ==================== 估计引擎 ====================
+
+class RULEstimator:
+    """全站空压机剩余寿命在线估计器
+
+    update() 每个样本 O(1) 更新对应设备的退化状态；predict() 只读取状态，与历史长度无关
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+        self.version = 0                # 每写入一个样本加 1，供答案缓存判断数据是否变化
+
+    def update(self, equipment_id: str, sample: SensorSample):
+        """写入一个样本"""
+        key = normalize_equipment_id(equipment_id)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = DegradationState()
+            state.update(sample)
+            self.version += 1
+
+    def equipment_ids(self) -> list:
+        """已有数据的设备编号"""
+        with self._lock:
+            return sorted(self._states)
+
+    def predict(self, equipment_id: str) -> MaintenancePrediction | None:
+        """预测指定设备的维护需求，无数据时返回 None"""
+        key = normalize_equipment_id(equipment_id)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return None
+            return self._predict(key, state)
+
+    def _predict(self, equipment_id: str, state: DegradationState) -> MaintenancePrediction:
+        hours_per_day = state.hours_per_day or 24.0
+        trend_ready = (
+            state.samples >= MIN_SAMPLES
+            and state.runtime_hours - state.first_runtime_hours >= MIN_SPAN_HOURS
+        )
+
+        items = []
+        degradation = 0.0
+        for spec in SIGNAL_SPECS:
+            signal = state.signals[spec.name]
+            span = spec.limit - spec.nominal
+            progress = (signal.level - spec.nominal) / span
+            degradation = max(degradation, min(max(progress, 0.0), 1.0))
+
+            remaining = spec.limit - signal.level
+            if remaining * span <= 0:
+                items.append(MaintenanceItem(
+                    spec.action, 0.0,
+                    f"{spec.label} {signal.level:.1f}{spec.unit} 已越过阈值 {spec.limit:g}{spec.unit}",
+                ))
+                continue
+            if not trend_ready:
+                continue
+
+            slope = signal.trend.slope
+            if slope * span <= 0:
+                continue
+            days = remaining / slope / hours_per_day
+            if days <= MAX_HORIZON_DAYS:
+                items.append(MaintenanceItem(
+                    spec.action, days,
+                    f"{spec.label} {signal.level:.1f}{spec.unit}，趋势 {slope:+.3f}{spec.unit}/h",
+                ))
+
+        service_hours = SERVICE_INTERVAL_HOURS - state.runtime_hours % SERVICE_INTERVAL_HOURS
+        service_days = service_hours / hours_per_day
+        if service_days <= MAX_HORIZON_DAYS:
+            items.append(MaintenanceItem(
+                "例行保养", service_days,
+                f"累计运行 {state.runtime_hours:.0f}h，保养周期 {SERVICE_INTERVAL_HOURS:.0f}h",
+            ))
+
+        items.sort(key=lambda item: item.days)
+        return MaintenancePrediction(equipment_id, state.samples, degradation, items)
+
+    def describe(self, equipment_id: str) -> str:
+        """predict_maintenance 工具的返回文本"""
+        prediction = self.predict(equipment_id)
+        if prediction is None:
+            return f"设备 {equipment_id} 暂无运行数据，无法给出预测性维护建议，请确认设备编号或数据接入状态"
+        return prediction.describe()
+
+
+# 全局估计器实例，供三种实现的工具共享
+rul_estimator = RULEstimator()
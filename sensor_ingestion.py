@@ -0,0 +1,478 @@
+"""
+空压站传感器数据接入管道
+数据源（Modbus 轮询、MQTT 订阅等）产生的读数经有界队列汇入批处理，每批依次分发给各子系统：
+实时状态（realtime_status）、健康/剩余寿命（rul_estimator）、异常检测（anomaly_detector）、
+能耗与报告汇总（report_rollups）、时序历史库（history_store）
+
+1. 管道在独立线程的事件循环中运行，工具调用只读取各子系统的内存状态，不等待接入
+2. 背压：队列满时数据源的 put 挂起，轮询类数据源随之放慢；推送类数据源（MQTT QoS 0）在接收端丢弃并计数
+3. 接入延迟：每批分发完成时批内最早读数的时间差，按最近窗口输出 P50/P95，作为指标对外暴露
+
+数据源只需提供 name 属性与 readings() 异步迭代器，产出 SensorReading；内置模拟 Modbus/MQTT 数据源用于测试
+
+开关（环境变量）：INGESTION_SOURCES=modbus,mqtt（未设置时不启动）、INGESTION_EQUIPMENT（模拟设备数，默认 3）、
+INGESTION_INTERVAL（每台设备采样间隔秒数，默认 1）、INGESTION_BATCH_SIZE、INGESTION_BATCH_SECONDS、
+INGESTION_QUEUE_SIZE、INGESTION_FAULT_RATE（模拟故障概率）
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from bench_stats import percentile
+from equipment import normalize_equipment_id
+from realtime_status import realtime_status
+from report_rollups import report_rollups
+from rul_estimator import SensorSample, rul_estimator
+
+# ==================== 配置 ====================
+
+LAG_WINDOW = 1000               # 接入延迟分位数取最近多少批
+SOURCE_RETRY_SECONDS = 1.0      # 数据源异常退出后的重连间隔
+STOP_TIMEOUT = 5.0              # 停止时等待队列排空的最长秒数
+
+
+@dataclass(frozen=True)
+class IngestionConfig:
+    """接入管道配置"""
+    sources: tuple = ()             # 启用的内置数据源名称
+    equipment: int = 3              # 模拟设备数，按轮转分配给各数据源
+    interval: float = 1.0           # 每台设备的采样间隔（秒）
+    batch_size: int = 256           # 每批最多读数
+    batch_seconds: float = 0.2      # 凑批最长等待（秒）
+    queue_size: int = 1024          # 有界队列容量（读数）
+    fault_rate: float = 0.0         # 模拟数据源每次采样进入故障的概率
+
+    @classmethod
+    def from_env(cls) -> "IngestionConfig":
+        sources = tuple(name.strip().lower() for name in (os.getenv("INGESTION_SOURCES") or "").split(",")
+                        if name.strip())
+        return cls(
+            sources=sources,
+            equipment=int(os.getenv("INGESTION_EQUIPMENT") or cls.equipment),
+            interval=float(os.getenv("INGESTION_INTERVAL") or cls.interval),
+            batch_size=int(os.getenv("INGESTION_BATCH_SIZE") or cls.batch_size),
+            batch_seconds=float(os.getenv("INGESTION_BATCH_SECONDS") or cls.batch_seconds),
+            queue_size=int(os.getenv("INGESTION_QUEUE_SIZE") or cls.queue_size),
+            fault_rate=float(os.getenv("INGESTION_FAULT_RATE") or cls.fault_rate),
+        )
+
+
+@dataclass
+class SensorReading:
+    """一台设备一次采样的全部通道读数，values 以通道名为键（通道定义见 anomaly_detector.DEFAULT_CHANNELS）"""
+    equipment_id: str
+    timestamp: float
+    values: dict = field(default_factory=dict)
+    running: bool = True
+    fault: bool = False
+    source: str = ""
+
+
+# ==================== 模拟设备 ====================
+
+class CompressorSimulator:
+    """单台空压机的读数模拟：负载随机游走，各通道随负载变化并叠加噪声，振动与润滑油品质缓慢劣化"""
+
+    # 通道名 -> (空载值, 满载增量, 噪声标准差)
+    PROFILE = {
+        "exhaust_temperature": (80.0, 15.0, 0.8),
+        "exhaust_pressure": (0.70, 0.0, 0.01),
+        "vibration": (1.8, 0.6, 0.1),
+        "current": (30.0, 70.0, 1.0),
+        "oil_temperature": (70.0, 12.0, 0.5),
+        "oil_pressure": (0.35, 0.0, 0.01),
+        "oil_quality": (100.0, 0.0, 0.2),
+        "inlet_temperature": (25.0, 0.0, 0.3),
+        "inlet_filter_dp": (2.0, 0.5, 0.05),
+        "oil_filter_dp": (60.0, 10.0, 1.0),
+        "separator_dp": (40.0, 8.0, 0.8),
+        "cooler_outlet_temperature": (35.0, 5.0, 0.4),
+        "motor_winding_temperature": (80.0, 25.0, 0.8),
+        "motor_bearing_temperature": (55.0, 10.0, 0.5),
+        "airend_bearing_temperature": (60.0, 12.0, 0.5),
+        "power": (60.0, 180.0, 2.0),
+        "flow": (5.0, 35.0, 0.3),
+        "speed": (1500.0, 1400.0, 10.0),
+        "dew_point": (3.0, 0.0, 0.2),
+        "load_ratio": (0.0, 100.0, 0.0),
+    }
+    VIBRATION_WEAR_PER_HOUR = 0.0005    # 振动劣化速率（mm/s / 运行小时）
+    OIL_WEAR_PER_HOUR = 0.01            # 润滑油品质劣化速率（% / 运行小时）
+    FAULT_SECONDS = 30.0                # 模拟故障持续时长
+
+    def __init__(self, equipment_id: str, fault_rate: float = 0.0, seed: int | None = None):
+        self.equipment_id = equipment_id
+        self.fault_rate = fault_rate
+        self.rng = random.Random(seed)
+        self.load = self.rng.uniform(0.5, 0.9)
+        self.runtime_hours = self.rng.uniform(100.0, 1900.0)
+        self.fault_until = 0.0
+        self._last = None
+
+    def sample(self, now: float) -> SensorReading:
+        if self._last is not None:
+            self.runtime_hours += max(now - self._last, 0.0) / 3600.0
+        self._last = now
+        self.load = min(max(self.load + self.rng.gauss(0.0, 0.02), 0.4), 0.95)
+        if now >= self.fault_until and self.rng.random() < self.fault_rate:
+            self.fault_until = now + self.FAULT_SECONDS
+        fault = now < self.fault_until
+
+        values = {}
+        for name, (base, per_load, noise) in self.PROFILE.items():
+            values[name] = base + per_load * self.load + self.rng.gauss(0.0, noise)
+        values["vibration"] += self.VIBRATION_WEAR_PER_HOUR * self.runtime_hours
+        values["oil_quality"] -= self.OIL_WEAR_PER_HOUR * self.runtime_hours
+        if fault:
+            values["exhaust_temperature"] += 25.0
+            values["oil_pressure"] -= 0.15
+        values["runtime_hours"] = self.runtime_hours
+        return SensorReading(self.equipment_id, now, values, running=True, fault=fault)
+
+
+# ==================== 数据源 ====================
+
+class SimulatedModbusSource:
+    """模拟 Modbus TCP 轮询：按间隔依次读取每台设备的保持寄存器（16 位无符号整数，按比例缩放）"""
+
+    name = "modbus"
+    # 寄存器比例：读数 × 比例取整后写入寄存器，未列出的通道比例为 10
+    REGISTER_SCALES = {"exhaust_pressure": 1000, "oil_pressure": 1000, "vibration": 100, "speed": 1}
+
+    def __init__(self, equipment_ids: list, interval: float, fault_rate: float = 0.0):
+        self.interval = interval
+        self.devices = [CompressorSimulator(equipment_id, fault_rate) for equipment_id in equipment_ids]
+
+    def _registers(self, reading: SensorReading) -> dict:
+        return {name: min(max(round(value * self.REGISTER_SCALES.get(name, 10)), 0), 0xFFFF)
+                for name, value in reading.values.items() if name != "runtime_hours"}
+
+    async def readings(self):
+        while True:
+            started = time.monotonic()
+            for device in self.devices:
+                reading = device.sample(time.time())
+                registers = self._registers(reading)
+                reading.values.update({name: raw / self.REGISTER_SCALES.get(name, 10)
+                                       for name, raw in registers.items()})
+                reading.source = self.name
+                yield reading
+            await asyncio.sleep(max(self.interval - (time.monotonic() - started), 0.0))
+
+
+class SimulatedMQTTSource:
+    """模拟 MQTT 订阅：每台设备独立按抖动间隔发布 JSON 遥测到 plant/compressors/<编号>/telemetry
+
+    推送类数据源无法让发布端放慢，接收缓冲区满时按 QoS 0 语义丢弃并计数
+    """
+
+    name = "mqtt"
+    TOPIC = "plant/compressors/{}/telemetry"
+
+    def __init__(self, equipment_ids: list, interval: float, fault_rate: float = 0.0, buffer_size: int = 1024):
+        self.interval = interval
+        self.devices = [CompressorSimulator(equipment_id, fault_rate) for equipment_id in equipment_ids]
+        self.buffer_size = buffer_size
+        self.dropped = 0
+
+    async def _publish(self, device: CompressorSimulator, inbox: asyncio.Queue):
+        while True:
+            await asyncio.sleep(self.interval * device.rng.uniform(0.8, 1.2))
+            reading = device.sample(time.time())
+            payload = json.dumps({"ts": reading.timestamp, "running": reading.running,
+                                  "fault": reading.fault, "values": reading.values})
+            try:
+                inbox.put_nowait((self.TOPIC.format(device.equipment_id), payload))
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    @classmethod
+    def decode(cls, topic: str, payload: str) -> SensorReading:
+        message = json.loads(payload)
+        equipment_id = topic.split("/")[2]
+        return SensorReading(equipment_id, message["ts"], message["values"],
+                             message["running"], message["fault"], cls.name)
+
+    async def readings(self):
+        inbox = asyncio.Queue(self.buffer_size)
+        publishers = [asyncio.create_task(self._publish(device, inbox)) for device in self.devices]
+        try:
+            while True:
+                yield self.decode(*await inbox.get())
+        finally:
+            for publisher in publishers:
+                publisher.cancel()
+
+
+SOURCES = {
+    SimulatedModbusSource.name: SimulatedModbusSource,
+    SimulatedMQTTSource.name: SimulatedMQTTSource,
+}
+
+
+def build_sources(config: IngestionConfig) -> list:
+    """按配置创建内置数据源，模拟设备按轮转分配给各数据源（同一设备只由一个数据源上报）"""
+    unknown = [name for name in config.sources if name not in SOURCES]
+    if unknown:
+        raise ValueError(f"未知的数据源：{', '.join(unknown)}（可选：{', '.join(SOURCES)}）")
+    equipment_ids = [str(index) for index in range(1, config.equipment + 1)]
+    return [
+        SOURCES[name](equipment_ids[position::len(config.sources)], config.interval, config.fault_rate)
+        for position, name in enumerate(config.sources)
+    ]
+
+
+# ==================== 子系统分发 ====================
+
+def status_sink(batch: list):
+    for reading in batch:
+        realtime_status.update(reading.equipment_id, reading.timestamp, reading.values,
+                               reading.running, reading.fault)
+
+
+def health_sink(batch: list):
+    for reading in batch:
+        values = reading.values
+        if "runtime_hours" not in values:
+            continue
+        rul_estimator.update(reading.equipment_id, SensorSample(
+            vibration=values["vibration"],
+            temperature=values["exhaust_temperature"],
+            runtime_hours=values["runtime_hours"],
+            oil_quality=values["oil_quality"],
+            timestamp=reading.timestamp,
+        ))
+
+
+def anomaly_sink(batch: list):
+    import numpy as np
+    from anomaly_detector import anomaly_detector  # 依赖 numpy，首次写入时才导入
+
+    # 检测器按行号整体更新状态，同一台设备在一批中出现多次时拆成多轮，保证每个读数都被吸收
+    rounds = []
+    seen = Counter()
+    for reading in batch:
+        key = normalize_equipment_id(reading.equipment_id)
+        if seen[key] == len(rounds):
+            rounds.append([])
+        rounds[seen[key]].append(reading)
+        seen[key] += 1
+
+    names = [spec.name for spec in anomaly_detector.channels]
+    for readings in rounds:
+        values = np.array([[reading.values.get(name, np.nan) for name in names] for reading in readings],
+                          dtype=np.float32)
+        anomaly_detector.process_batch([reading.equipment_id for reading in readings], values,
+                                       max(reading.timestamp for reading in readings))
+
+
+def energy_sink(batch: list):
+    for reading in batch:
+        values = reading.values
+        report_rollups.ingest(reading.equipment_id, reading.timestamp, values.get("flow", 0.0),
+                              values.get("power", 0.0), values.get("load_ratio", 0.0) / 100.0,
+                              reading.running, reading.fault)
+
+
+def history_sink(batch: list):
+    from history_store import history_store  # 依赖 numpy，首次写入时才导入
+
+    by_equipment = {}
+    for reading in batch:
+        by_equipment.setdefault(normalize_equipment_id(reading.equipment_id), []).append(reading)
+    for equipment_id, readings in by_equipment.items():
+        channels = dict.fromkeys(name for reading in readings for name in reading.values)
+        columns = {name: [reading.values.get(name, float("nan")) for reading in readings] for name in channels}
+        columns["running"] = [float(reading.running) for reading in readings]
+        columns["fault"] = [float(reading.fault) for reading in readings]
+        history_store.append(equipment_id, [reading.timestamp for reading in readings], columns)
+
+
+DEFAULT_SINKS = (
+    ("status", status_sink),
+    ("health", health_sink),
+    ("anomaly", anomaly_sink),
+    ("energy", energy_sink),
+    ("history", history_sink),
+)
+
+
+# ==================== 指标 ====================
+
+class IngestionStats:
+    """接入指标：读数/批次计数、背压等待、分发失败与接入延迟"""
+
+    def __init__(self):
+        self.received = Counter()           # 数据源 -> 读数数
+        self.batches = 0
+        self.applied = 0
+        self.backpressure_waits = 0
+        self.backpressure_seconds = 0.0
+        self.max_queue_depth = 0
+        self.source_errors = Counter()
+        self.sink_errors = Counter()
+        self.newest_applied = None          # 已分发的最新读数时间戳
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self._lock = threading.Lock()
+
+    def record_batch(self, batch: list, queue_depth: int):
+        now = time.time()
+        with self._lock:
+            self.batches += 1
+            self.applied += len(batch)
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+            self._lags.append(now - min(reading.timestamp for reading in batch))
+            newest = max(reading.timestamp for reading in batch)
+            self.newest_applied = max(self.newest_applied or newest, newest)
+
+    def lag_percentile(self, q: float) -> float:
+        with self._lock:
+            return percentile(self._lags, q)
+
+    def freshness(self) -> float | None:
+        """距最新已分发读数的秒数，尚无数据时为 None"""
+        return None if self.newest_applied is None else time.time() - self.newest_applied
+
+    def describe(self) -> str:
+        sources = "，".join(f"{name} {count}" for name, count in sorted(self.received.items())) or "无"
+        freshness = self.freshness()
+        line = (f"数据接入：读数 {sum(self.received.values())}（{sources}），分发 {self.applied}（{self.batches} 批），"
+                f"接入延迟 P50 {self.lag_percentile(50):.3f}s / P95 {self.lag_percentile(95):.3f}s，"
+                f"数据新鲜度 {'-' if freshness is None else f'{freshness:.1f}s'}，"
+                f"队列峰值 {self.max_queue_depth}，背压等待 {self.backpressure_waits} 次"
+                f"（{self.backpressure_seconds:.2f}s）")
+        errors = self.source_errors + self.sink_errors
+        if errors:
+            line += "，错误 " + "，".join(f"{name} {count}" for name, count in sorted(errors.items()))
+        return line
+
+
+# ==================== 接入管道 ====================
+
+class IngestionPipeline:
+    """数据源 -> 有界队列 -> 批处理 -> 子系统分发，在后台线程的事件循环中运行"""
+
+    def __init__(self, config: IngestionConfig, sinks=DEFAULT_SINKS):
+        self.config = config
+        self.sinks = tuple(sinks)
+        self.sources = []
+        self.stats = IngestionStats()
+        self._thread = None
+        self._loop = None
+        self._queue = None
+        self._stopping = None
+        self._ready = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def add_source(self, source):
+        """添加自定义数据源（需在 start 之前）"""
+        self.sources.append(source)
+
+    def start(self) -> bool:
+        """启动后台接入线程；未配置任何数据源时不启动，返回是否已在运行"""
+        if self.running:
+            return True
+        if self.config.sources:
+            self.sources.extend(build_sources(self.config))
+        if not self.sources:
+            return False
+        self._ready.clear()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), name="sensor-ingestion",
+                                        daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return True
+
+    def stop(self):
+        """停止数据源，排空队列后退出后台线程"""
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(STOP_TIMEOUT)
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.config.queue_size)
+        self._stopping = asyncio.Event()
+        pumps = [asyncio.create_task(self._pump(source)) for source in self.sources]
+        batcher = asyncio.create_task(self._batch_loop())
+        self._ready.set()
+
+        await self._stopping.wait()
+        for pump in pumps:
+            pump.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+        await self._queue.put(None)
+        await asyncio.wait_for(batcher, STOP_TIMEOUT)
+
+    async def _pump(self, source):
+        """从数据源读取并入队；队列满时挂起（背压），数据源异常时间隔重连"""
+        while True:
+            try:
+                async for reading in source.readings():
+                    if self._queue.full():
+                        started = time.perf_counter()
+                        await self._queue.put(reading)
+                        self.stats.backpressure_waits += 1
+                        self.stats.backpressure_seconds += time.perf_counter() - started
+                    else:
+                        self._queue.put_nowait(reading)
+                    self.stats.received[source.name] += 1
+            except Exception:
+                self.stats.source_errors[source.name] += 1
+            await asyncio.sleep(SOURCE_RETRY_SECONDS)
+
+    async def _batch_loop(self):
+        """凑满 batch_size 或等待 batch_seconds 后分发一批；收到 None 时分发剩余读数并退出"""
+        loop = asyncio.get_running_loop()
+        while True:
+            reading = await self._queue.get()
+            if reading is None:
+                return
+            batch = [reading]
+            deadline = loop.time() + self.config.batch_seconds
+            while len(batch) < self.config.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    reading = await asyncio.wait_for(self._queue.get(), timeout)
+                except TimeoutError:
+                    break
+                if reading is None:
+                    self._fan_out(batch)
+                    return
+                batch.append(reading)
+            self._fan_out(batch)
+
+    def _fan_out(self, batch: list):
+        """依次写入各子系统（在接入线程中同步执行，分发期间队列积压即形成背压），单个子系统失败不影响其他"""
+        depth = self._queue.qsize()
+        for name, sink in self.sinks:
+            try:
+                sink(batch)
+            except Exception:
+                self.stats.sink_errors[name] += 1
+        self.stats.record_batch(batch, depth)
+
+    def describe(self) -> str:
+        line = self.stats.describe()
+        dropped = sum(getattr(source, "dropped", 0) for source in self.sources)
+        return f"{line}，推送丢弃 {dropped}" if dropped else line
+
+
+# 全局接入管道实例，三种实现的入口在启动时调用 start()
+sensor_ingestion = IngestionPipeline(IngestionConfig.from_env())
@@ -0,0 +1,220 @@
+"""
+长时间运行内存基准
+在同一个会话中连续运行数千轮对话（AgentScope 的 InMemoryMemory、AutoGen Swarm 的消息线程、
+OpenAI Agents SDK 的 SQLiteSession 都随轮次累积），每隔若干轮采样：
+1. 进程 RSS
+2. tracemalloc 当前占用，结束时列出相对基线增长最多的分配位置
+3. 每轮延迟与每次模型调用的平均输入 tokens（提示词大小）
+
+首个采样窗口为基线，RSS 增长、延迟增长倍数或提示词增长倍数超过阈值时以退出码 1 结束
+（默认在首次超过阈值的采样处提前结束，--no-fail-fast 跑完全部轮次）。
+模拟模型服务在单独的进程中运行，其内存不计入被测进程
+
+用法：python soak_bench.py --impl openai --turns 2000 --sample-every 100
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+from bench_stats import percentile
+from load_test import IMPLEMENTATIONS, ROOT
+from test_cases import TEST_CASES
+from token_usage import usage_tracker
+
+# ==================== 被测实现 ====================
+
+def load_session_runner(impl: str, db_path: str):
+    """导入实现模块，返回在同一个会话中运行一轮对话的 async run(question)"""
+    directory, module_name, _ = IMPLEMENTATIONS[impl]
+    sys.path.insert(0, os.path.join(ROOT, directory))
+    module = importlib.import_module(module_name)
+
+    if impl == "agentscope":
+        for agent in (module.main_agent, *module.SUB_AGENTS.values()):
+            agent.set_console_output_enabled(False)
+        return module.run_turn
+
+    if impl == "autogen":
+        return lambda question: module.run_turn(question, console=False)
+
+    from agents import SQLiteSession
+    session = SQLiteSession(session_id="soak", db_path=db_path)
+    return lambda question: module.run_turn(question, session)
+
+
+def start_mock_process(delay: float) -> tuple:
+    """在子进程中启动模拟模型服务，返回 (进程, 接口地址)"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "mock_llm.py"), "--port", "0", "--delay", str(delay)],
+        stdout=subprocess.PIPE, text=True, env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    line = process.stdout.readline()
+    return process, line.strip().rsplit("：", 1)[-1]
+
+
+# ==================== 采样 ====================
+
+def current_rss_bytes() -> int:
+    """当前进程 RSS（Linux 读 /proc，其他平台退化为峰值 RSS）"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class SoakSample:
+    """一个采样窗口"""
+    turn: int
+    rss_bytes: int
+    traced_bytes: int
+    latency_p50: float
+    latency_p95: float
+    prompt_tokens: float        # 窗口内每次模型调用的平均输入 tokens
+    errors: int
+
+    def describe(self) -> str:
+        return (f"第 {self.turn:6d} 轮：RSS {self.rss_bytes / 2 ** 20:8.1f} MB，"
+                f"tracemalloc {self.traced_bytes / 2 ** 20:8.1f} MB，"
+                f"延迟 P50 {self.latency_p50:.3f}s / P95 {self.latency_p95:.3f}s，"
+                f"提示词 {self.prompt_tokens:8.0f} tokens/调用，错误 {self.errors}")
+
+
+async def soak(run, turns: int, sample_every: int, should_stop=None) -> tuple:
+    """连续运行 turns 轮，每 sample_every 轮采样一次；should_stop(samples) 为真时提前结束
+
+    Returns:
+        (采样列表, 首次 tracemalloc 快照, 末次快照)
+    """
+    samples = []
+    latencies = []
+    errors = 0
+    first_snapshot = None
+    usage_before = usage_tracker.snapshot()
+    for turn in range(1, turns + 1):
+        question = TEST_CASES[(turn - 1) % len(TEST_CASES)]["question"]
+        started = time.perf_counter()
+        try:
+            await run(question)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+        if turn % sample_every == 0 or turn == turns:
+            usage = usage_tracker.snapshot().minus(usage_before)
+            sample = SoakSample(
+                turn=turn,
+                rss_bytes=current_rss_bytes(),
+                traced_bytes=tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0,
+                latency_p50=percentile(latencies, 50),
+                latency_p95=percentile(latencies, 95),
+                prompt_tokens=usage.input_tokens / usage.calls if usage.calls else 0.0,
+                errors=errors,
+            )
+            samples.append(sample)
+            print(sample.describe(), flush=True)
+            if tracemalloc.is_tracing() and first_snapshot is None:
+                first_snapshot = tracemalloc.take_snapshot()
+            latencies = []
+            errors = 0
+            usage_before = usage_tracker.snapshot()
+            if should_stop is not None and should_stop(samples):
+                print(f"第 {turn} 轮已超过阈值，提前结束")
+                break
+    last_snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+    return samples, first_snapshot, last_snapshot
+
+
+# ==================== 判定 ====================
+
+def growth_ratio(first: float, last: float) -> float:
+    return last / first if first else 0.0
+
+
+def check_growth(samples: list, max_rss_mb: float, max_latency_ratio: float,
+                 max_prompt_ratio: float) -> list:
+    """以首个采样为基线检查增长，返回未通过的原因列表"""
+    baseline, last = samples[0], samples[-1]
+    failures = []
+    rss_growth = (last.rss_bytes - baseline.rss_bytes) / 2 ** 20
+    if max_rss_mb and rss_growth > max_rss_mb:
+        failures.append(f"RSS 增长 {rss_growth:.1f} MB，超过阈值 {max_rss_mb:.0f} MB")
+    latency_ratio = growth_ratio(baseline.latency_p50, last.latency_p50)
+    if max_latency_ratio and latency_ratio > max_latency_ratio:
+        failures.append(f"延迟 P50 增长到基线的 {latency_ratio:.2f} 倍，超过阈值 {max_latency_ratio} 倍")
+    prompt_ratio = growth_ratio(baseline.prompt_tokens, last.prompt_tokens)
+    if max_prompt_ratio and prompt_ratio > max_prompt_ratio:
+        failures.append(f"提示词增长到基线的 {prompt_ratio:.2f} 倍，超过阈值 {max_prompt_ratio} 倍")
+    return failures
+
+
+def print_top_allocators(first_snapshot, last_snapshot, top: int):
+    """tracemalloc：相对基线增长最多的分配位置"""
+    if first_snapshot is None or last_snapshot is None:
+        return
+    own = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    first_snapshot, last_snapshot = first_snapshot.filter_traces(own), last_snapshot.filter_traces(own)
+    print(f"tracemalloc 增长前 {top} 的分配位置：")
+    for stat in last_snapshot.compare_to(first_snapshot, "lineno")[:top]:
+        print(f"  {stat.size_diff / 2 ** 20:+8.2f} MB  {stat.count_diff:+8d} 个  {stat.traceback[0]}")
+
+
+# ==================== 命令行入口 ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="长时间运行内存基准")
+    parser.add_argument("--impl", choices=sorted(IMPLEMENTATIONS), default="openai")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--sample-every", type=int, default=100, help="每隔多少轮采样一次，首个采样为基线")
+    parser.add_argument("--mock-delay", type=float, default=0.0, help="模拟服务每个请求的延迟（秒）")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="关闭 tracemalloc（其开销会拉高延迟）")
+    parser.add_argument("--top", type=int, default=10, help="输出增长最多的分配位置数")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=256.0, help="RSS 增长阈值（MB），0 表示不检查")
+    parser.add_argument("--max-latency-growth", type=float, default=3.0, help="延迟 P50 增长倍数阈值，0 表示不检查")
+    parser.add_argument("--max-prompt-growth", type=float, default=4.0, help="提示词增长倍数阈值，0 表示不检查")
+    parser.add_argument("--no-fail-fast", action="store_true", help="超过阈值后仍跑完全部轮次")
+    args = parser.parse_args()
+
+    def exceeded(samples: list) -> bool:
+        return bool(check_growth(samples, args.max_rss_growth_mb, args.max_latency_growth, args.max_prompt_growth))
+
+    mock, base_url = start_mock_process(args.mock_delay)
+    os.environ.update(OPENAI_BASE_URL=base_url, OPENAI_API_KEY="mock", OPENAI_MODEL_NAME="mock")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            run = load_session_runner(args.impl, os.path.join(directory, "soak.db"))
+            if not args.no_tracemalloc:
+                tracemalloc.start()
+            print(f"长时间运行基准：实现 {args.impl}，{args.turns} 轮，每 {args.sample_every} 轮采样")
+            samples, first_snapshot, last_snapshot = asyncio.run(soak(
+                run, args.turns, args.sample_every, None if args.no_fail_fast else exceeded))
+    finally:
+        mock.terminate()
+
+    print()
+    print_top_allocators(first_snapshot, last_snapshot, args.top)
+    failures = check_growth(samples, args.max_rss_growth_mb, args.max_latency_growth, args.max_prompt_growth)
+    if failures:
+        print("未通过：")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("通过：增长均在阈值内")
+
+
+if __name__ == "__main__":
+    main()
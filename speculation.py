@@ -0,0 +1,176 @@
+"""
+投机执行专业智能体
+本地关键词路由预测最可能的专业智能体，与主调度智能体的路由调用并行启动；
+路由结果一致时直接采用投机结果，不一致时取消，从而隐藏大部分路由耗时
+
+默认关闭，设置 SPECULATIVE_ROUTING=1 开启；预测置信度低于 SPECULATIVE_MIN_CONFIDENCE 时不投机
+投机运行的模型请求以 "<agent_name>:speculative" 标记，未被采用时其用量计为浪费
+投机运行中有副作用的工具（启停、调负荷、订购备件、记录巡检）在投机结果被采用前挂起，未被采用时随任务取消，
+不会因为预测错误而改变设备状态或下单
+"""
+
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from keyword_router import predict_agent
+from token_usage import UsageTotals, usage_tracker
+
+# ==================== 配置 ====================
+
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING") == "1"
+MIN_CONFIDENCE = float(os.getenv("SPECULATIVE_MIN_CONFIDENCE") or 0.6)
+
+# 有副作用的工具：投机运行中须等待投机结果被采用后才执行
+SIDE_EFFECT_TOOLS = frozenset({
+    "start_compressor",
+    "stop_compressor",
+    "adjust_load",
+    "order_spare_parts",
+    "record_inspection_result",
+})
+
+
+def speculative_label(agent_name: str) -> str:
+    """投机运行使用的用量统计标签"""
+    return f"{agent_name}:speculative"
+
+
+# ==================== 统计 ====================
+
+@dataclass
+class SpeculationStats:
+    """投机执行统计"""
+    attempts: int = 0
+    hits: int = 0
+    misses: int = 0
+    skipped: int = 0                # 预测置信度不足，未投机
+    held: int = 0                   # 等待采用的有副作用工具调用
+    saved_seconds: float = 0.0      # 命中时节省的等待时间
+    wasted: UsageTotals = field(default_factory=UsageTotals)   # 未命中的投机运行消耗的用量
+
+    @property
+    def hit_rate(self) -> float:
+        settled = self.hits + self.misses
+        return self.hits / settled if settled else 0.0
+
+    @property
+    def wasted_tokens(self) -> int:
+        return self.wasted.input_tokens + self.wasted.output_tokens
+
+    def describe(self) -> str:
+        return (f"投机执行：{self.attempts} 次（跳过 {self.skipped} 次），命中 {self.hits} 次，"
+                f"未命中 {self.misses} 次，命中率 {self.hit_rate:.1%}，挂起有副作用的工具调用 {self.held} 次，"
+                f"节省等待 {self.saved_seconds:.2f}s，浪费 tokens {self.wasted_tokens}")
+
+
+# ==================== 单轮投机 ====================
+
+class Speculation:
+    """一轮对话中与路由并行运行的投机任务"""
+
+    def __init__(self, agent_name: str, coro, stats: SpeculationStats):
+        self.agent_name = agent_name
+        self.stats = stats
+        self.started = time.perf_counter()
+        self.settled = False
+        self._usage_before = usage_tracker.snapshot(speculative_label(agent_name))
+        self._adopted = asyncio.Event()
+        self._task = asyncio.create_task(self._run(coro))
+
+    async def _run(self, coro):
+        # 只在投机任务自己的上下文中设置，工具据此判断是否处于投机运行
+        speculative_run.set(self)
+        return await coro
+
+    def matches(self, agent_name: str) -> bool:
+        return not self.settled and agent_name == self.agent_name
+
+    async def adopt(self):
+        """路由选择了预测的智能体：等待并返回投机结果
+
+        节省时间为 min(路由决策耗时, 投机运行耗时)，即专业智能体提前开始的那一段
+        """
+        self.settled = True
+        self._adopted.set()
+        routed_at = time.perf_counter()
+        try:
+            result = await self._task
+        except Exception:
+            self.stats.misses += 1
+            raise
+        finished = time.perf_counter()
+        self.stats.hits += 1
+        self.stats.saved_seconds += min(routed_at, finished) - self.started
+        return result
+
+    async def discard(self):
+        """路由选择了其他智能体（或未移交）：取消投机任务并记录浪费的用量"""
+        if self.settled:
+            return
+        self.settled = True
+        self._task.cancel()
+        try:
+            await self._task
+        except BaseException:
+            pass
+        self.stats.misses += 1
+        self.stats.wasted.add(
+            usage_tracker.snapshot(speculative_label(self.agent_name)).minus(self._usage_before)
+        )
+
+
+    async def hold(self, tool_name: str):
+        """投机运行调用有副作用的工具前：等待投机结果被采用，未被采用时随任务取消"""
+        if tool_name not in SIDE_EFFECT_TOOLS or self._adopted.is_set():
+            return
+        self.stats.held += 1
+        await self._adopted.wait()
+
+
+# 当前轮次的投机任务：路由决策发生在框架内部调用栈深处时（如 AgentScope 的转发工具）通过它取得
+current_speculation: ContextVar = ContextVar("current_speculation", default=None)
+# 投机任务内部的上下文：正在投机运行的 Speculation，供工具调用前挂起有副作用的操作
+speculative_run: ContextVar = ContextVar("speculative_run", default=None)
+
+
+async def hold_side_effects(tool_name: str):
+    """工具执行前调用：处于尚未采用的投机运行中且工具有副作用时，等待投机结果被采用"""
+    speculation = speculative_run.get()
+    if speculation is not None:
+        await speculation.hold(tool_name)
+
+
+# ==================== 投机调度 ====================
+
+class SpeculativeRouter:
+    """按预测结果启动投机任务并累计统计"""
+
+    def __init__(self, enabled: bool = SPECULATIVE_ROUTING, min_confidence: float = MIN_CONFIDENCE,
+                 predictor=predict_agent):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.predictor = predictor
+        self.stats = SpeculationStats()
+
+    def start(self, question: str, run_specialist) -> Speculation | None:
+        """预测并启动投机任务，未开启或置信度不足时返回 None
+
+        Args:
+            question: 用户问题
+            run_specialist: 接收智能体名称、返回该专业智能体运行协程的函数
+        """
+        if not self.enabled:
+            return None
+        agent_name, confidence = self.predictor(question)
+        if agent_name is None or confidence < self.min_confidence:
+            self.stats.skipped += 1
+            return None
+        self.stats.attempts += 1
+        return Speculation(agent_name, run_specialist(agent_name), self.stats)
+
+
+# 全局投机调度实例
+speculative_router = SpeculativeRouter()
@@ -0,0 +1,166 @@
+"""
+启动耗时基准
+对每个入口分别测量：
+1. 导入耗时：子进程内 import 入口模块（含智能体构造）的墙钟时间，并按 -X importtime 输出列出
+   入口模块直接导入的耗时最多的模块，以及入口模块自身代码（智能体、模型客户端构造）的耗时
+2. 首次提示耗时：启动交互入口脚本到输出 "User:" 提示符的时间（之后发送 quit 退出）
+
+每项重复 --repeat 次取中位数，每次都是新进程（冷启动，但操作系统文件缓存是热的）。
+启动阶段不访问模型服务，未设置 OPENAI_* 环境变量时使用占位值
+
+用法：python startup_bench.py [--impl openai] [--repeat 5] [--top 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+from load_test import IMPLEMENTATIONS, ROOT
+
+PLACEHOLDER_ENV = {
+    "OPENAI_BASE_URL": "http://127.0.0.1:9/v1",
+    "OPENAI_API_KEY": "startup-bench",
+    "OPENAI_MODEL_NAME": "startup-bench",
+}
+PROMPT = "User:"
+
+
+# ==================== 解析 -X importtime ====================
+
+@dataclass
+class ImportEntry:
+    """-X importtime 的一行（时间单位：秒）"""
+    name: str
+    depth: int
+    self_seconds: float
+    cumulative_seconds: float
+
+
+def parse_importtime(stderr: str) -> list:
+    """解析 "import time: self [us] | cumulative | imported package" 行"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip(" ")
+        entries.append(ImportEntry(stripped, (len(name) - len(stripped) - 1) // 2,
+                                   int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return entries
+
+
+def direct_imports(entries: list, module_name: str) -> list:
+    """入口模块直接导入的模块（importtime 按完成顺序输出，子模块排在父模块之前）
+
+    入口模块的子树是紧挨在它前面、深度大于它的连续一段；之前导入的其他模块中同深度的条目不计入
+    """
+    index = next(index for index, entry in enumerate(entries) if entry.name == module_name)
+    depth = entries[index].depth
+    children = []
+    for entry in reversed(entries[:index]):
+        if entry.depth <= depth:
+            break
+        if entry.depth == depth + 1:
+            children.append(entry)
+    children.reverse()
+    return children
+
+
+# ==================== 测量 ====================
+
+def bench_env() -> dict:
+    env = dict(os.environ)
+    for name, value in PLACEHOLDER_ENV.items():
+        env.setdefault(name, value)
+    env["PYTHONUNBUFFERED"] = "1"
+    return env
+
+
+def measure_import(impl: str) -> tuple:
+    """新进程中导入入口模块，返回 (导入墙钟秒数, importtime 条目)"""
+    directory, module_name, _ = IMPLEMENTATIONS[impl]
+    code = (f"import time; started = time.perf_counter(); import {module_name}; "
+            f"print(time.perf_counter() - started)")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.join(ROOT, directory), env=bench_env(), capture_output=True, text=True, check=True,
+    )
+    return float(completed.stdout.strip().splitlines()[-1]), parse_importtime(completed.stderr)
+
+
+def measure_first_prompt(impl: str, timeout: float = 60.0) -> float:
+    """启动交互入口脚本，返回输出提示符所用秒数"""
+    directory, module_name, _ = IMPLEMENTATIONS[impl]
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, f"{module_name}.py"], cwd=os.path.join(ROOT, directory), env=bench_env(),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    output = ""
+    try:
+        while PROMPT not in output:
+            char = process.stdout.read(1)
+            if not char:
+                raise RuntimeError(f"{impl} 入口未输出提示符即退出")
+            output += char
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"{impl} 入口 {timeout:.0f}s 内未输出提示符")
+        elapsed = time.perf_counter() - started
+        process.stdin.write("quit\n")
+        process.stdin.flush()
+        process.wait(timeout=timeout)
+        return elapsed
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+# ==================== 报告 ====================
+
+def report(impl: str, repeat: int, top: int):
+    _, module_name, _ = IMPLEMENTATIONS[impl]
+    import_runs = [measure_import(impl) for _ in range(repeat)]
+    prompt_runs = [measure_first_prompt(impl) for _ in range(repeat)]
+    import_seconds = [seconds for seconds, _ in import_runs]
+
+    # importtime 条目取导入耗时中位数那一次
+    median_run = sorted(import_runs, key=lambda run: run[0])[len(import_runs) // 2]
+    entries = median_run[1]
+    root = next(entry for entry in entries if entry.name == module_name)
+
+    print("=" * 60)
+    print(f"{impl}（{module_name}）")
+    print("=" * 60)
+    print(f"导入+构造：中位数 {statistics.median(import_seconds):.3f}s（{repeat} 次，"
+          f"最小 {min(import_seconds):.3f}s / 最大 {max(import_seconds):.3f}s）")
+    print(f"首次提示：中位数 {statistics.median(prompt_runs):.3f}s"
+          f"（最小 {min(prompt_runs):.3f}s / 最大 {max(prompt_runs):.3f}s）")
+    print(f"入口模块自身代码（智能体与模型客户端构造）：{root.self_seconds:.3f}s")
+    print(f"直接导入耗时前 {top}（累计）：")
+    for entry in sorted(direct_imports(entries, module_name), key=lambda e: -e.cumulative_seconds)[:top]:
+        print(f"  {entry.cumulative_seconds:7.3f}s  {entry.name}")
+    print(f"自身耗时前 {top}（全部模块）：")
+    for entry in sorted(entries, key=lambda e: -e.self_seconds)[:top]:
+        print(f"  {entry.self_seconds:7.3f}s  {entry.name}")
+    print()
+
+
+# ==================== 命令行入口 ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="入口启动耗时基准")
+    parser.add_argument("--impl", choices=sorted(IMPLEMENTATIONS), action="append",
+                        help="要测量的实现，可重复指定，默认全部")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    for impl in args.impl or sorted(IMPLEMENTATIONS):
+        report(impl, args.repeat, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+模型调用 token 用量统计
+通过 httpx 响应钩子解析 OpenAI 兼容接口返回的 usage，三种实现共用
+区分缓存命中与未命中的输入 token，用于评估前缀缓存效果
+"""
+
+import json
+import threading
+from dataclasses import dataclass
+
+# ==================== 用量结构 ====================
+
+@dataclass
+class UsageTotals:
+    """累计用量"""
+    calls: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+    latency_seconds: float = 0.0
+
+    @property
+    def uncached_input_tokens(self) -> int:
+        return self.input_tokens - self.cached_input_tokens
+
+    @property
+    def cache_hit_rate(self) -> float:
+        return self.cached_input_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    @property
+    def average_latency(self) -> float:
+        return self.latency_seconds / self.calls if self.calls else 0.0
+
+    def add(self, other: "UsageTotals"):
+        self.calls += other.calls
+        self.input_tokens += other.input_tokens
+        self.cached_input_tokens += other.cached_input_tokens
+        self.output_tokens += other.output_tokens
+        self.latency_seconds += other.latency_seconds
+
+    def minus(self, other: "UsageTotals") -> "UsageTotals":
+        return UsageTotals(
+            self.calls - other.calls,
+            self.input_tokens - other.input_tokens,
+            self.cached_input_tokens - other.cached_input_tokens,
+            self.output_tokens - other.output_tokens,
+            self.latency_seconds - other.latency_seconds,
+        )
+
+
+def parse_usage(payload: dict) -> UsageTotals | None:
+    """从 chat completions 响应体中解析用量
+
+    兼容 OpenAI 的 prompt_tokens_details.cached_tokens 与
+    DeepSeek 等厂商的 prompt_cache_hit_tokens 字段
+    """
+    usage = payload.get("usage")
+    if not isinstance(usage, dict):
+        return None
+    input_tokens = usage.get("prompt_tokens") or usage.get("input_tokens") or 0
+    details = usage.get("prompt_tokens_details") or usage.get("input_tokens_details") or {}
+    cached = details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0
+    return UsageTotals(1, input_tokens, cached, usage.get("completion_tokens") or usage.get("output_tokens") or 0)
+
+
+# ==================== 统计器 ====================
+
+class UsageTracker:
+    """线程安全的用量累计器，按智能体（HTTP 客户端标签）分别统计"""
+
+    def __init__(self):
+        self.totals = UsageTotals()
+        self.by_agent = {}
+        self._lock = threading.Lock()
+
+    def record(self, label: str, usage: UsageTotals):
+        with self._lock:
+            self.totals.add(usage)
+            self.by_agent.setdefault(label, UsageTotals()).add(usage)
+
+    def snapshot(self, label: str | None = None) -> UsageTotals:
+        """累计用量快照，指定 label 时只返回该智能体的用量"""
+        with self._lock:
+            totals = self.totals if label is None else self.by_agent.get(label, UsageTotals())
+            return UsageTotals(**vars(totals))
+
+    def reset(self):
+        with self._lock:
+            self.totals = UsageTotals()
+            self.by_agent.clear()
+
+    def hook(self, label: str = ""):
+        """创建 httpx 异步响应钩子：读取非流式 JSON 响应体，按 label 记录用量与耗时"""
+
+        async def on_response(response):
+            if response.status_code != 200:
+                return
+            if not response.headers.get("content-type", "").startswith("application/json"):
+                return
+            await response.aread()
+            try:
+                payload = json.loads(response.content)
+            except ValueError:
+                return
+            usage = parse_usage(payload) if isinstance(payload, dict) else None
+            if usage is not None:
+                usage.latency_seconds = response.elapsed.total_seconds()
+                self.record(label, usage)
+
+        return on_response
+
+
+def format_usage(usage: UsageTotals) -> str:
+    """格式化用量摘要"""
+    return (f"模型调用：{usage.calls} 次，输入 tokens：{usage.input_tokens}"
+            f"（缓存命中 {usage.cached_input_tokens}，未命中 {usage.uncached_input_tokens}，"
+            f"命中率 {usage.cache_hit_rate:.1%}），输出 tokens：{usage.output_tokens}")
+
+
+# 全局统计器实例
+usage_tracker = UsageTracker()
@@ -0,0 +1,248 @@
+"""
+工具输出预算
+工具接入真实数据（机组表、历史数据、巡检记录）后，原始输出会原样进入下一次模型调用，并写入会话历史
+（SQLiteSession、InMemoryMemory、Swarm 消息），之后每一轮都要重复携带。本模块在工具输出交给模型之前按工具预算压缩：
+1. 估算 token：中日韩字符按 1 个 token，其余字符按 4 个字符 1 个 token
+2. 超出预算的多行输出保留开头与结尾的若干行，中间注明省略行数；单行长文本截取开头
+3. 完整输出存入旁路存储（有界 LRU），压缩结果末尾给出引用，智能体可调用 fetch_tool_output 按引用分页取回；
+   引用带本进程的随机前缀，会话历史（SQLiteSession）中重启前的引用不会解析到其他输出
+4. 直接返回的工具（见 direct_return.py）的输出就是最终回复，之后没有模型步骤能按引用取回，不压缩；
+   输出随数据量增长的列表类工具因此不在默认直接返回列表中
+5. fetch_tool_output 只在旁路存储中有可取回的输出时才提供给模型，避免每次请求都携带其定义
+6. 统计压缩次数与节省的 token
+
+TOOL_OUTPUT_BUDGET：默认预算（估算 token，默认 1000），设为 0 关闭（同时不注册 fetch_tool_output）；
+TOOL_OUTPUT_BUDGETS：按工具覆盖，如 "query_inspection_records=400,get_air_demand=600"；
+TOOL_OUTPUT_STORE_SIZE：旁路存储保留的完整输出条数（默认 256）
+"""
+
+import functools
+import inspect
+import itertools
+import os
+import secrets
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+from direct_return import DIRECT_RETURN_TOOLS
+
+# ==================== 配置 ====================
+
+FETCH_TOOL = "fetch_tool_output"
+NOTE_RESERVE = 60               # 为压缩说明预留的 token
+HEAD_SHARE = 0.6                # 多行输出中分给开头的预算比例
+WIDE_CHAR = "\u2e80"            # 不小于此码点的字符（中日韩文字与全角符号）按 1 个 token 估算
+
+# 列表类输出默认预算较小：条目多时开头与结尾的记录已足够概括，其余按引用取回
+DEFAULT_TOOL_BUDGETS = {
+    "query_inspection_records": 600,
+    "get_abnormal_inspections": 600,
+}
+
+
+def _parse_budgets(raw: str | None) -> dict:
+    budgets = dict(DEFAULT_TOOL_BUDGETS)
+    for item in (raw or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            budgets[name.strip()] = int(value)
+    return budgets
+
+
+@dataclass(frozen=True)
+class ToolBudgetConfig:
+    """工具输出预算配置"""
+    default_tokens: int = 1000
+    tool_tokens: dict = field(default_factory=lambda: dict(DEFAULT_TOOL_BUDGETS))
+    store_size: int = 256
+
+    @classmethod
+    def from_env(cls) -> "ToolBudgetConfig":
+        raw = os.getenv("TOOL_OUTPUT_BUDGET")
+        return cls(
+            default_tokens=cls.default_tokens if raw is None or not raw.strip() else int(raw),
+            tool_tokens=_parse_budgets(os.getenv("TOOL_OUTPUT_BUDGETS")),
+            store_size=int(os.getenv("TOOL_OUTPUT_STORE_SIZE") or cls.store_size),
+        )
+
+    def budget(self, tool_name: str) -> int:
+        return self.tool_tokens.get(tool_name, self.default_tokens)
+
+
+# ==================== token 估算与压缩 ====================
+
+def _char_tokens(char: str) -> float:
+    return 1.0 if char >= WIDE_CHAR else 0.25
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数（中日韩字符 1 个，其余 4 个字符 1 个）"""
+    wide = sum(1 for char in text if char >= WIDE_CHAR)
+    return wide + (len(text) - wide + 3) // 4
+
+
+def _prefix(text: str, tokens: float) -> str:
+    """不超过 tokens 的最长前缀"""
+    used = 0.0
+    for index, char in enumerate(text):
+        used += _char_tokens(char)
+        if used > tokens:
+            return text[:index]
+    return text
+
+
+def compact(text: str, tokens: int) -> str:
+    """将 text 压缩到约 tokens 以内（不含说明）：多行时保留首尾行，单行时截取开头"""
+    lines = text.splitlines()
+    if len(lines) < 3:
+        return _prefix(text, tokens) + "…"
+    head, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > tokens * HEAD_SHARE:
+            break
+        head.append(line)
+        used += cost
+    tail = []
+    for line in reversed(lines[len(head):]):
+        cost = estimate_tokens(line) + 1
+        if used + cost > tokens:
+            break
+        tail.append(line)
+        used += cost
+    if not head:
+        # 首行本身就超出预算
+        head = [_prefix(lines[0], tokens * HEAD_SHARE) + "…"]
+    omitted = len(lines) - len(head) - len(tail)
+    return "\n".join(head + [f"…（省略 {omitted} 行）…"] + tail[::-1])
+
+
+# ==================== 统计 ====================
+
+@dataclass
+class ToolBudgetStats:
+    outputs: int = 0
+    compacted: int = 0
+    tokens_in: int = 0              # 压缩前（仅统计被压缩的输出）
+    tokens_out: int = 0             # 压缩后
+    fetches: int = 0
+    saved_by_tool: Counter = field(default_factory=Counter)
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    def describe(self) -> str:
+        text = (f"工具输出预算：{self.outputs} 次输出，压缩 {self.compacted} 次，"
+                f"约 {self.tokens_in} → {self.tokens_out} tokens（节省 {self.saved_tokens}），"
+                f"按引用取回 {self.fetches} 次")
+        if self.saved_by_tool:
+            text += "；节省最多：" + "，".join(f"{name} {saved}" for name, saved in self.saved_by_tool.most_common(3))
+        return text
+
+
+# ==================== 预算与旁路存储 ====================
+
+class ToolOutputBudget:
+    """按工具预算压缩输出，完整输出存入旁路存储供按引用取回"""
+
+    def __init__(self, config: ToolBudgetConfig):
+        self.config = config
+        self._store = OrderedDict()         # 引用 -> (工具名, 完整输出)
+        self._ids = itertools.count(1)
+        self._run_id = secrets.token_hex(3)  # 引用前缀，区分不同进程产生的引用
+        self._lock = threading.Lock()
+        self.stats = ToolBudgetStats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.default_tokens > 0
+
+    @property
+    def has_outputs(self) -> bool:
+        """旁路存储中是否有可按引用取回的输出（决定是否向模型提供 fetch_tool_output）"""
+        return bool(self._store)
+
+    def apply(self, tool_name: str, text) -> str:
+        """工具输出交给模型前调用：未超出预算时原样返回，否则返回压缩结果与引用说明"""
+        if (not self.enabled or not isinstance(text, str) or tool_name == FETCH_TOOL
+                or tool_name in DIRECT_RETURN_TOOLS):
+            return text
+        budget = self.config.budget(tool_name)
+        with self._lock:
+            self.stats.outputs += 1
+        # 每个字符至多 1 个 token，字符数不超过预算时无需逐字估算
+        if len(text) <= budget:
+            return text
+        tokens = estimate_tokens(text)
+        if tokens <= budget:
+            return text
+        ref = self._put(tool_name, text)
+        body = compact(text, max(budget - NOTE_RESERVE, budget // 2))
+        result = (f"{body}\n[输出过长已压缩：约 {tokens} tokens、{len(text.splitlines())} 行；"
+                  f"完整结果引用 {ref}，可调用 {FETCH_TOOL}(ref=\"{ref}\", page=1) 分页查看]")
+        compacted = estimate_tokens(result)
+        with self._lock:
+            self.stats.compacted += 1
+            self.stats.tokens_in += tokens
+            self.stats.tokens_out += compacted
+            self.stats.saved_by_tool[tool_name] += tokens - compacted
+        return result
+
+    def _put(self, tool_name: str, text: str) -> str:
+        with self._lock:
+            ref = f"{tool_name}#{self._run_id}-{next(self._ids)}"
+            self._store[ref] = (tool_name, text)
+            while len(self._store) > self.config.store_size:
+                self._store.popitem(last=False)
+        return ref
+
+    def get(self, ref: str) -> str | None:
+        with self._lock:
+            item = self._store.get(ref)
+            if item is None:
+                return None
+            self._store.move_to_end(ref)
+            return item[1]
+
+    def fetch(self, ref: str, page: int = 1) -> str:
+        """fetch_tool_output 工具的返回文本：按默认预算分页返回完整输出"""
+        text = self.get(ref.strip())
+        if text is None:
+            return f"未找到引用 {ref} 的工具输出（可能已过期），请重新调用原工具"
+        with self._lock:
+            self.stats.fetches += 1
+        size = max(self.config.default_tokens - NOTE_RESERVE, 1)
+        bounds, used = [0], 0.0
+        for index, char in enumerate(text):
+            cost = _char_tokens(char)
+            if used + cost > size:
+                bounds.append(index)
+                used = 0.0
+            used += cost
+        bounds.append(len(text))
+        pages = len(bounds) - 1
+        if not 1 <= page <= pages:
+            return f"引用 {ref} 共 {pages} 页，页码 {page} 超出范围"
+        return f"{text[bounds[page - 1]:bounds[page]]}\n[引用 {ref} 第 {page}/{pages} 页]"
+
+
+# ==================== 普通函数工具 ====================
+
+def budgeted(func):
+    """包装返回文本的普通函数工具（同步或异步），保留函数名、签名与文档字符串"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            return tool_budget.apply(func.__name__, await func(*args, **kwargs))
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return tool_budget.apply(func.__name__, func(*args, **kwargs))
+    return wrapper
+
+
+# 全局工具输出预算实例，供三种实现的工具共享
+tool_budget = ToolOutputBudget(ToolBudgetConfig.from_env())
@@ -0,0 +1,393 @@
+"""
+空压站视觉巡检流水线（CPU 边缘盒）
+一轮巡检的相机帧在线程池中解码、缩放后直接写入内存映射帧缓冲区，按批次做 CPU 推理
+推理结果按帧内容哈希缓存，重复提问或相同画面不会重复推理
+
+巡检工具调用时对全站相机取帧执行一轮批量巡检（未变化的画面命中缓存）；未接入真实相机时使用内置模拟相机，
+按设备生成固定机位的合成画面，并按故障概率叠加油渍或锈蚀
+
+开关（环境变量）：VISUAL_INSPECTION_SOURCE（simulated，默认；设为空字符串则不接入相机）、
+VISUAL_INSPECTION_EQUIPMENT（相机覆盖的设备数，默认同 FLEET_EQUIPMENT 或 3）、
+VISUAL_INSPECTION_FAULT_RATE（模拟画面出现异常的概率，默认 0.1）
+"""
+
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+
+import numpy as np
+
+from equipment import normalize_equipment_id
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖，缺失时只接受已解码的 ndarray 帧
+    Image = None
+
+# ==================== 配置 ====================
+
+FRAME_HEIGHT = 224
+FRAME_WIDTH = 224
+BUFFER_SLOTS = 64           # 帧缓冲区槽位数，超过时一轮巡检分块处理
+BATCH_SIZE = 16             # 单次推理批大小
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+CACHE_SIZE = 1024           # 帧哈希结果缓存条数
+INSPECTION_WINDOW_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class FrameSourceConfig:
+    """相机接入配置"""
+    source: str = "simulated"
+    equipment: int = 3
+    fault_rate: float = 0.1
+
+    @classmethod
+    def from_env(cls) -> "FrameSourceConfig":
+        source = os.getenv("VISUAL_INSPECTION_SOURCE")
+        return cls(
+            source=cls.source if source is None else source.strip().lower(),
+            equipment=int(os.getenv("VISUAL_INSPECTION_EQUIPMENT") or os.getenv("FLEET_EQUIPMENT") or cls.equipment),
+            fault_rate=float(os.getenv("VISUAL_INSPECTION_FAULT_RATE") or cls.fault_rate),
+        )
+
+
+# ==================== 推理模型 ====================
+
+@dataclass
+class InspectionFinding:
+    """单帧巡检结论"""
+    findings: list
+    scores: dict
+
+    @property
+    def normal(self) -> bool:
+        return not self.findings
+
+
+class HeuristicInspectionModel:
+    """基于颜色统计的轻量巡检模型，整批向量化计算，作为默认 CPU 推理实现
+
+    可替换为任何实现了 predict(batch) 的模型（如 ONNX Runtime CPU 会话），
+    batch 为形状 (N, H, W, 3) 的 uint8 数组
+    """
+
+    OIL_STAIN_RATIO = 0.08      # 底部区域深色像素占比阈值
+    RUST_RATIO = 0.05           # 红褐色像素占比阈值
+    DARK_FRAME_MEAN = 20.0      # 画面平均亮度低于该值视为遮挡/无信号
+
+    def predict(self, batch: np.ndarray) -> list:
+        # 直接在 uint8 批次视图上计算，不把整批转换为浮点副本：
+        # 亮度用三通道之和（uint16 不溢出）代替均值，r > 1.4g 改写为 5r > 7g
+        r, g, b = batch[..., 0], batch[..., 1], batch[..., 2]
+        brightness = batch.sum(axis=-1, dtype=np.uint16)
+
+        lower = brightness[:, brightness.shape[1] * 2 // 3:, :]
+        oil_ratio = (lower < 150).mean(axis=(1, 2))
+        reddish = np.multiply(r, 5, dtype=np.uint16) > np.multiply(g, 7, dtype=np.uint16)
+        rust_ratio = ((r > 100) & reddish & (g > b)).mean(axis=(1, 2))
+        frame_mean = brightness.mean(axis=(1, 2)) / 3.0
+
+        results = []
+        for i in range(batch.shape[0]):
+            findings = []
+            if frame_mean[i] < self.DARK_FRAME_MEAN:
+                findings.append("画面过暗，镜头可能被遮挡")
+            else:
+                if oil_ratio[i] > self.OIL_STAIN_RATIO:
+                    findings.append(f"底部疑似油渍/泄漏（占比 {oil_ratio[i]:.0%}）")
+                if rust_ratio[i] > self.RUST_RATIO:
+                    findings.append(f"疑似锈蚀（占比 {rust_ratio[i]:.0%}）")
+            results.append(InspectionFinding(findings, {
+                "oil_ratio": float(oil_ratio[i]),
+                "rust_ratio": float(rust_ratio[i]),
+                "brightness": float(frame_mean[i]),
+            }))
+        return results
+
+
+# ==================== 内存映射帧缓冲区 ====================
+
+class FrameBuffer:
+    """内存映射帧缓冲区，解码线程直接写入槽位，推理时按连续槽位切片得到零拷贝批次视图"""
+
+    def __init__(self, slots: int = BUFFER_SLOTS, height: int = FRAME_HEIGHT,
+                 width: int = FRAME_WIDTH, path: str | None = None):
+        self._temporary = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="inspection_frames_", suffix=".mmap")
+            os.close(fd)
+        self.path = path
+        self.frames = np.memmap(path, dtype=np.uint8, mode="w+", shape=(slots, height, width, 3))
+
+    def close(self):
+        del self.frames
+        if self._temporary:
+            os.unlink(self.path)
+
+    @property
+    def slots(self) -> int:
+        return self.frames.shape[0]
+
+
+def decode_into(frame, out: np.ndarray):
+    """将一帧解码并缩放写入 out（形状 (H, W, 3) 的缓冲区视图）
+
+    frame 可以是 JPEG/PNG 等编码字节，或已解码的 (h, w, 3) uint8 数组
+    """
+    height, width = out.shape[:2]
+    if isinstance(frame, np.ndarray):
+        if frame.shape[:2] == (height, width):
+            out[...] = frame
+            return
+        if Image is None:
+            # 无 Pillow 时用最近邻采样缩放
+            rows = np.arange(height) * frame.shape[0] // height
+            cols = np.arange(width) * frame.shape[1] // width
+            out[...] = frame[rows][:, cols]
+            return
+        image = Image.fromarray(frame)
+    else:
+        if Image is None:
+            raise RuntimeError("解码编码图像需要安装 Pillow")
+        image = Image.open(BytesIO(frame))
+        # JPEG 草稿模式在解码阶段直接按 1/2、1/4、1/8 降采样，大幅减少 CPU 开销
+        image.draft("RGB", (width, height))
+    image = image.convert("RGB")
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.BILINEAR)
+    out[...] = np.asarray(image)
+
+
+def frame_digest(frame) -> str:
+    """帧内容哈希，用作推理结果缓存键"""
+    if isinstance(frame, np.ndarray):
+        frame = np.ascontiguousarray(frame).data
+    return hashlib.blake2b(frame, digest_size=16).hexdigest()
+
+
+# ==================== 模拟相机 ====================
+
+class SimulatedCamera:
+    """模拟相机：每台设备一个固定机位，画面为背景、机身与底座；按故障概率叠加底部油渍或机身锈蚀
+
+    同一设备在同一巡检窗口内画面不变（重复巡检命中帧哈希缓存），跨窗口重新抽样
+    """
+
+    def __init__(self, equipment_ids, fault_rate: float = 0.1, height: int = 480, width: int = 640,
+                 period: float = INSPECTION_WINDOW_SECONDS, seed: int = 0):
+        self.equipment_ids = tuple(normalize_equipment_id(equipment_id) for equipment_id in equipment_ids)
+        self.fault_rate = fault_rate
+        self.height = height
+        self.width = width
+        self.period = period
+        self.seed = seed
+
+    def __call__(self, equipment_id: str) -> np.ndarray | None:
+        equipment_id = normalize_equipment_id(equipment_id)
+        if equipment_id not in self.equipment_ids:
+            return None
+        window = int(time.time() // self.period)
+        rng = random.Random(f"{self.seed}:{equipment_id}:{window}")
+        height, width = self.height, self.width
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[...] = (118, 122, 126)                                        # 背景墙面
+        frame[height * 4 // 5:] = (96, 96, 92)                              # 地面
+        top, bottom = height // 6, height * 5 // 6
+        left, right = width // 5, width * 4 // 5
+        frame[top:bottom, left:right] = (60, 110, 165)                      # 机身
+        frame[bottom - height // 20:bottom, left:right] = (150, 150, 150)   # 底座
+        frame += rng.randrange(0, 8)                                        # 光照差异
+        if rng.random() < self.fault_rate:
+            if rng.random() < 0.5:
+                # 底部油渍：底座下方深色区域
+                stain_left = rng.randrange(left, right - width // 4)
+                frame[height * 3 // 4:, stain_left:stain_left + width // 3] = (28, 26, 22)
+            else:
+                # 机身锈蚀：红褐色斑块
+                rust_top = rng.randrange(top, bottom - height // 4)
+                frame[rust_top:rust_top + height // 4, left:left + width // 3] = (150, 84, 48)
+        return frame
+
+
+# ==================== 巡检流水线 ====================
+
+@dataclass
+class InspectionRecord:
+    """单台设备最近一次视觉巡检结果"""
+    equipment_id: str
+    result: InspectionFinding
+    timestamp: float
+    cached: bool
+
+
+@dataclass
+class RoundReport:
+    """一轮巡检的耗时统计"""
+    frames: int = 0
+    cache_hits: int = 0
+    decode_seconds: float = 0.0
+    infer_seconds: float = 0.0
+    total_seconds: float = 0.0
+    within_window: bool = True
+    records: dict = field(default_factory=dict)
+
+
+class VisualInspectionPipeline:
+    """批量 CPU 视觉巡检流水线"""
+
+    def __init__(self, model=None, buffer: FrameBuffer | None = None,
+                 batch_size: int = BATCH_SIZE, workers: int = DECODE_WORKERS,
+                 cache_size: int = CACHE_SIZE, window_seconds: float = INSPECTION_WINDOW_SECONDS):
+        self.model = model or HeuristicInspectionModel()
+        self._buffer = buffer
+        self.batch_size = batch_size
+        self.window_seconds = window_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-decode")
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._latest = {}
+        self._frame_source = None
+        self._equipment_ids = ()
+        self._round_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    @property
+    def buffer(self) -> FrameBuffer:
+        # 首次使用时才创建内存映射文件
+        if self._buffer is None:
+            self._buffer = FrameBuffer()
+        return self._buffer
+
+    def set_frame_source(self, source, equipment_ids=()):
+        """设置相机取帧函数 source(equipment_id) -> 编码字节、ndarray 或 None
+
+        工具调用时对 equipment_ids（全站相机）与被询问的设备取帧，作为一轮批量巡检
+        """
+        self._frame_source = source
+        self._equipment_ids = tuple(normalize_equipment_id(equipment_id) for equipment_id in equipment_ids)
+
+    def capture_round(self, equipment_id: str | None = None) -> RoundReport | None:
+        """从相机对全站设备（及 equipment_id）取帧并执行一轮巡检，未接入相机时返回 None"""
+        if self._frame_source is None:
+            return None
+        ids = list(self._equipment_ids)
+        if equipment_id is not None and normalize_equipment_id(equipment_id) not in ids:
+            ids.append(normalize_equipment_id(equipment_id))
+        frames = {}
+        for camera_id in ids:
+            frame = self._frame_source(camera_id)
+            if frame is not None:
+                frames[camera_id] = frame
+        return self.run_round(frames) if frames else None
+
+    def _cache_get(self, digest: str):
+        with self._lock:
+            result = self._cache.get(digest)
+            if result is not None:
+                self._cache.move_to_end(digest)
+            return result
+
+    def _cache_put(self, digest: str, result: InspectionFinding):
+        with self._lock:
+            self._cache[digest] = result
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def run_round(self, frames: dict) -> RoundReport:
+        """执行一轮巡检
+
+        Args:
+            frames: {设备编号: 帧} 字典，帧为编码字节或 ndarray
+        """
+        report = RoundReport(frames=len(frames))
+        start = time.perf_counter()
+        now = time.time()
+
+        # 先按帧哈希查缓存，只有未命中的帧才解码推理
+        pending = []
+        for raw_id, frame in frames.items():
+            equipment_id = normalize_equipment_id(raw_id)
+            digest = frame_digest(frame)
+            cached = self._cache_get(digest)
+            if cached is not None:
+                report.cache_hits += 1
+                report.records[equipment_id] = InspectionRecord(equipment_id, cached, now, True)
+            else:
+                pending.append((equipment_id, digest, frame))
+
+        with self._round_lock:
+            buffer = self.buffer
+            for offset in range(0, len(pending), buffer.slots):
+                chunk = pending[offset:offset + buffer.slots]
+
+                decode_start = time.perf_counter()
+                futures = [
+                    self._executor.submit(decode_into, frame, buffer.frames[slot])
+                    for slot, (_, _, frame) in enumerate(chunk)
+                ]
+                for future in futures:
+                    future.result()
+                report.decode_seconds += time.perf_counter() - decode_start
+
+                infer_start = time.perf_counter()
+                for batch_start in range(0, len(chunk), self.batch_size):
+                    batch_end = min(batch_start + self.batch_size, len(chunk))
+                    results = self.model.predict(buffer.frames[batch_start:batch_end])
+                    for (equipment_id, digest, _), result in zip(chunk[batch_start:batch_end], results):
+                        self._cache_put(digest, result)
+                        report.records[equipment_id] = InspectionRecord(equipment_id, result, now, False)
+                report.infer_seconds += time.perf_counter() - infer_start
+
+        with self._lock:
+            self._latest.update(report.records)
+        report.total_seconds = time.perf_counter() - start
+        report.within_window = report.total_seconds <= self.window_seconds
+        return report
+
+    def latest(self, equipment_id: str) -> InspectionRecord | None:
+        with self._lock:
+            return self._latest.get(normalize_equipment_id(equipment_id))
+
+    def describe(self, equipment_id: str) -> str:
+        """perform_visual_inspection 工具的返回文本"""
+        self.capture_round(equipment_id)
+
+        record = self.latest(equipment_id)
+        if record is None:
+            return f"设备 {equipment_id} 暂无巡检图像，无法进行视觉巡检，请确认相机接入状态"
+        captured = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.timestamp))
+        if record.result.normal:
+            conclusion = "外观正常，未发现泄漏、锈蚀等异常"
+        else:
+            conclusion = "发现异常：" + "；".join(record.result.findings)
+        return f"设备 {equipment_id} 视觉巡检结果（{captured}）：{conclusion}"
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+
+def build_frame_source(config: FrameSourceConfig):
+    """按配置创建相机取帧函数，返回 (source, 设备编号列表)；未配置时返回 (None, ())"""
+    if not config.source:
+        return None, ()
+    if config.source != "simulated":
+        raise ValueError(f"未知的相机数据源：{config.source}（可选：simulated）")
+    equipment_ids = [str(index) for index in range(1, config.equipment + 1)]
+    return SimulatedCamera(equipment_ids, config.fault_rate), equipment_ids
+
+
+# 全局巡检流水线实例，供三种实现的工具共享
+visual_inspection = VisualInspectionPipeline()
+visual_inspection.set_frame_source(*build_frame_source(FrameSourceConfig.from_env()))